@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+ClipHistory - бенчмарк пути захвата демона (ClipboardMonitor) на Xvfb
+
+Запускает отдельный Xvfb, становится владельцем CLIPBOARD через
+SelectionOwner демона и с заданной частотой подменяет содержимое.
+ClipboardMonitor работает в этом же процессе с временным cache_dir.
+
+Сценарии: короткий текст, текст 1 МБ, PNG-скриншоты, пачки (burst).
+Для каждого бэкенда захвата и сценария:
+  latency     - от смены владельца до появления элемента в хранилище (p50/p95/p99)
+  missed      - элементы, так и не попавшие в хранилище
+  cpu_per_capture_ms - CPU потока мониторинга + дочерних xclip на захват
+  db_growth   - прирост хранилища и каталогов блобов
+
+Хранилище (cliphistory_storage) - "storage" из config.json или --storage.
+
+Результат: JSON (--output), для сравнения прогонов между собой.
+
+Требуется: Xvfb, xclip, python-xlib.
+Запуск:
+    python3 benchmarks/bench_capture.py [--scenarios short_text,burst] [--output out.json]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from cliphistory_storage import storage_backend  # noqa: E402
+
+# Бэкенды захвата: имя -> переопределения config для ClipboardMonitor
+BACKENDS = {
+    'poll-adaptive': {},
+    'poll-fixed': {'poll_max_interval': 0.3},
+}
+
+# Сценарии: количество элементов, частота (элементов/сек), генератор
+SCENARIOS = {
+    'short_text': {'count': 100, 'rate': 5.0, 'kind': 'text', 'size': 80},
+    'text_1mb': {'count': 10, 'rate': 1.0, 'kind': 'text', 'size': 1024 * 1024},
+    'png': {'count': 10, 'rate': 1.0, 'kind': 'png', 'size': (1920, 1080)},
+    'burst': {'count': 50, 'rate': 50.0, 'kind': 'text', 'size': 80},
+}
+
+CAPTURE_TIMEOUT = 5.0
+
+
+def start_xvfb():
+    """Запустить Xvfb на свободном дисплее; вернуть (процесс, ':N')"""
+    if not shutil.which('Xvfb'):
+        sys.exit("❌ Xvfb не найден: sudo apt install xvfb")
+    if not shutil.which('xclip'):
+        sys.exit("❌ xclip не найден: sudo apt install xclip")
+
+    read_fd, write_fd = os.pipe()
+    process = subprocess.Popen(
+        ['Xvfb', '-displayfd', str(write_fd), '-screen', '0', '1920x1080x24', '-nolisten', 'tcp'],
+        pass_fds=(write_fd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        number = f.readline().strip()
+    if not number:
+        process.kill()
+        sys.exit("❌ Xvfb не запустился")
+    return process, f':{number}'
+
+
+def make_text(index, size):
+    """Уникальный текст заданного размера (байт)"""
+    head = f'ClipHistory bench #{index} {time.time_ns()}\n'
+    body = 'lorem ipsum dolor sit amet ' * (size // 27 + 1)
+    return (head + body)[:max(size, len(head))].encode('utf-8')
+
+
+def make_png(index, width, height):
+    """Уникальный PNG (градиент со сдвигом по номеру), без зависимостей"""
+    row_pattern = bytes((x + index * 7) % 256 for x in range(width * 3))
+    raw = b''.join(b'\x00' + row_pattern[y % 3:] + row_pattern[:y % 3] for y in range(height))
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) +
+            chunk(b'IDAT', zlib.compress(raw, 6)) + chunk(b'IEND', b''))
+
+
+def make_items(scenario):
+    items = []
+    for index in range(scenario['count']):
+        if scenario['kind'] == 'png':
+            items.append(('image/png', make_png(index, *scenario['size'])))
+        else:
+            items.append(('UTF8_STRING', make_text(index, scenario['size'])))
+    return items
+
+
+def storage_size(cache_dir):
+    """Суммарный размер БД (с WAL) и блобов"""
+    total = 0
+    for path in cache_dir.rglob('*'):
+        if path.is_file():
+            total += path.stat().st_size
+    return total
+
+
+def committed_hashes(storage):
+    return {item.hash for item in storage.iterate()}
+
+
+def percentiles(samples):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    return {
+        'p50_ms': round(pick(50) * 1000, 2),
+        'p95_ms': round(pick(95) * 1000, 2),
+        'p99_ms': round(pick(99) * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2),
+        'mean_ms': round(statistics.mean(ordered) * 1000, 2),
+    }
+
+
+def run_scenario(backend, scenario_name, producer, base_config):
+    """Один прогон: бэкенд x сценарий"""
+    from cliphistory_new import ClipboardMonitor
+
+    scenario = SCENARIOS[scenario_name]
+    items = make_items(scenario)
+    config = dict(base_config, **BACKENDS[backend])
+
+    with tempfile.TemporaryDirectory(prefix='cliphistory-bench-') as cache_dir:
+        cache_dir = Path(cache_dir)
+        monitor = ClipboardMonitor(config, cache_dir=cache_dir)
+        size_before = storage_size(cache_dir)
+
+        thread = threading.Thread(target=monitor.monitor_loop, name='monitor', daemon=True)
+        thread.start()
+        cpu_clock = time.pthread_getcpuclockid(thread.ident)
+        cpu_before = time.clock_gettime(cpu_clock)
+        children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+        latencies = []
+        pending = {}  # hash -> время смены владельца
+        interval = 1.0 / scenario['rate']
+        next_at = time.monotonic()
+
+        def collect():
+            """Отметить элементы, уже попавшие в БД"""
+            if not pending:
+                return
+            now = time.monotonic()
+            for content_hash in committed_hashes(monitor.storage) & pending.keys():
+                latencies.append(now - pending.pop(content_hash))
+
+        for mime_type, content in items:
+            content_hash = hashlib.md5(content).hexdigest()
+            # Ждём момента отправки, попутно собирая захваты
+            while time.monotonic() < next_at:
+                collect()
+                time.sleep(0.002)
+            pending[content_hash] = time.monotonic()
+            producer.serve(mime_type, content, content_hash)
+            next_at += interval
+
+        deadline = time.monotonic() + CAPTURE_TIMEOUT
+        while pending and time.monotonic() < deadline:
+            collect()
+            time.sleep(0.002)
+
+        # CPU-часы потока недоступны после его завершения - читаем до остановки
+        thread_cpu = time.clock_gettime(cpu_clock) - cpu_before
+        monitor.stop()
+        thread.join(timeout=5)
+        children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        children_cpu = ((children_after.ru_utime + children_after.ru_stime) -
+                        (children_before.ru_utime + children_before.ru_stime))
+
+        captures = len(latencies)
+        return {
+            'backend': backend,
+            'scenario': scenario_name,
+            'items': len(items),
+            'rate_per_s': scenario['rate'],
+            'captured': captures,
+            'missed': len(pending),
+            'latency': percentiles(latencies),
+            'polls': monitor.poller.polls,
+            'monitor_cpu_s': round(thread_cpu, 3),
+            'xclip_cpu_s': round(children_cpu, 3),
+            'cpu_per_capture_ms': round((thread_cpu + children_cpu) / captures * 1000, 2) if captures else None,
+            'db_growth_bytes': storage_size(cache_dir) - size_before,
+        }
+
+
+def configured_storage():
+    try:
+        with open(ROOT / 'config.json') as f:
+            return storage_backend(json.load(f))
+    except (OSError, ValueError):
+        return 'sqlite'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк захвата буфера ClipHistory на Xvfb')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"через запятую: {', '.join(SCENARIOS)}")
+    parser.add_argument('--backends', default=','.join(BACKENDS),
+                        help=f"через запятую: {', '.join(BACKENDS)}")
+    parser.add_argument('--storage', choices=('sqlite', 'log'), default=configured_storage(),
+                        help='хранилище истории (по умолчанию из config.json)')
+    parser.add_argument('--output', help='JSON с результатами (по умолчанию benchmarks/results/)')
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(',')
+    backends = args.backends.split(',')
+    for name in scenarios:
+        if name not in SCENARIOS:
+            parser.error(f'неизвестный сценарий: {name}')
+    for name in backends:
+        if name not in BACKENDS:
+            parser.error(f'неизвестный бэкенд: {name}')
+
+    xvfb, display_name = start_xvfb()
+    os.environ['DISPLAY'] = display_name
+    try:
+        from cliphistory_new import SelectionOwner
+
+        base_config = {
+            'debug': False,
+            'check_interval': 0.3,
+            'cleanup_days': 365,
+            'max_text_items': 100000,
+            'max_image_items': 100000,
+            'storage': args.storage,
+        }
+        producer = SelectionOwner({'debug': False})
+        if not producer.start():
+            sys.exit("❌ Не удалось стать владельцем CLIPBOARD на Xvfb")
+
+        results = []
+        for backend in backends:
+            for scenario in scenarios:
+                print(f"▶ {backend} / {scenario}...", flush=True)
+                result = run_scenario(backend, scenario, producer, base_config)
+                latency = result['latency'] or {}
+                print(f"  захвачено {result['captured']}/{result['items']}, "
+                      f"p50 {latency.get('p50_ms', '-')} мс, p95 {latency.get('p95_ms', '-')} мс, "
+                      f"CPU/захват {result['cpu_per_capture_ms']} мс, "
+                      f"БД +{result['db_growth_bytes'] / 1024:.0f} КБ")
+                results.append(result)
+    finally:
+        xvfb.terminate()
+        xvfb.wait()
+
+    output = Path(args.output) if args.output else (
+        ROOT / 'benchmarks' / 'results' / f"capture-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'benchmark': 'capture',
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'storage': args.storage,
+            'results': results,
+        }, f, indent=2)
+    print(f"📄 Результаты: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+ClipHistory - бенчмарк сжатия блобов: место на диске против CPU
+
+Для типичного содержимого буфера (логи, JSON, стектрейсы, исходный код,
+HTML и несжимаемый base64 случайных байт) и каждого размера (по умолчанию
+4 КБ, 64 КБ и 1 МБ) замеряются кодеки cliphistory_blobs.compress:
+zlib уровней 1/6/9 и zstd уровней 1/3/9 (если установлен zstandard).
+  ratio          - сжатый размер / исходный (меньше - лучше)
+  compress_mbs   - скорость сжатия, МБ/с исходных данных (медиана --repeat)
+  decompress_mbs - скорость распаковки
+  cpu_ms_per_mb  - процессорное время сжатия на мегабайт
+
+Содержимое генерируется детерминированно (random.Random(seed)), исходный
+код берётся из модулей самого проекта.
+
+Запуск:
+    python3 benchmarks/bench_compression.py [--sizes 4k,64k,1m] [--repeat 5] [--output out.json]
+"""
+
+import argparse
+import base64
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from cliphistory_blobs import ZSTD_AVAILABLE, compress, decompress  # noqa: E402
+
+DEFAULT_SIZES = '4k,64k,1m'
+
+SIZE_UNITS = {'k': 1024, 'm': 1024 * 1024}
+
+LEVELS = {'zlib': (1, 6, 9), 'zstd': (1, 3, 9)}
+
+WORDS = ('connection', 'request', 'timeout', 'user', 'session', 'cache', 'worker',
+         'queue', 'retry', 'backend', 'token', 'config', 'handler', 'payload')
+
+
+def gen_logs(rng, size):
+    levels = ('INFO', 'DEBUG', 'WARN', 'ERROR')
+    lines = []
+    total = 0
+    ts = 1_700_000_000
+    while total < size:
+        ts += rng.randint(0, 3)
+        line = (f"{time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(ts))}.{rng.randint(0, 999):03d} "
+                f"{rng.choice(levels):<5} [{rng.choice(WORDS)}-{rng.randint(1, 8)}] "
+                f"{' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 9)))} "
+                f"id={rng.randint(10000, 99999)} took={rng.random() * 500:.1f}ms\n")
+        lines.append(line)
+        total += len(line)
+    return ''.join(lines)
+
+
+def gen_json(rng, size):
+    records = []
+    total = 0
+    while total < size:
+        record = json.dumps({
+            'id': rng.randint(1, 10 ** 6),
+            'name': f'{rng.choice(WORDS)}_{rng.randint(1, 999)}',
+            'active': rng.random() < 0.5,
+            'score': round(rng.random() * 100, 3),
+            'tags': [rng.choice(WORDS) for _ in range(rng.randint(0, 4))],
+            'owner': {'login': rng.choice(WORDS), 'uid': rng.randint(1000, 5000)},
+        }, indent=2)
+        records.append(record)
+        total += len(record) + 2
+    return '[\n' + ',\n'.join(records) + '\n]'
+
+
+def gen_traces(rng, size):
+    parts = []
+    total = 0
+    while total < size:
+        frames = ['Traceback (most recent call last):\n']
+        for _ in range(rng.randint(4, 15)):
+            module = rng.choice(WORDS)
+            frames.append(f'  File "/usr/lib/python3/dist-packages/{module}/{rng.choice(WORDS)}.py", '
+                          f'line {rng.randint(1, 2000)}, in {rng.choice(WORDS)}_{rng.choice(WORDS)}\n'
+                          f'    return self.{rng.choice(WORDS)}({rng.choice(WORDS)}, **kwargs)\n')
+        frames.append(f'{rng.choice(("ValueError", "KeyError", "TimeoutError"))}: '
+                      f'{rng.choice(WORDS)} {rng.randint(1, 999)}\n\n')
+        part = ''.join(frames)
+        parts.append(part)
+        total += len(part)
+    return ''.join(parts)
+
+
+def gen_source(rng, size):
+    sources = [path.read_text(encoding='utf-8') for path in sorted(ROOT.glob('*.py'))]
+    text = ''
+    while len(text) < size:
+        text += rng.choice(sources)
+    return text
+
+
+def gen_html(rng, size):
+    rows = []
+    total = 0
+    while total < size:
+        row = (f'<tr class="{rng.choice(WORDS)}"><td><a href="/{rng.choice(WORDS)}/{rng.randint(1, 9999)}">'
+               f'{rng.choice(WORDS).title()} {rng.randint(1, 99)}</a></td>'
+               f'<td style="text-align:right">{rng.random() * 1000:.2f}</td>'
+               f'<td><span class="badge">{rng.choice(WORDS)}</span></td></tr>\n')
+        rows.append(row)
+        total += len(row)
+    return '<html><body><table>\n' + ''.join(rows) + '</table></body></html>\n'
+
+
+def gen_random(rng, size):
+    return base64.b64encode(rng.randbytes(size * 3 // 4 + 3)).decode()
+
+
+PAYLOADS = {
+    'logs': gen_logs,
+    'json': gen_json,
+    'traces': gen_traces,
+    'source': gen_source,
+    'html': gen_html,
+    'random_b64': gen_random,
+}
+
+
+def parse_size(value):
+    value = value.strip().lower()
+    if value[-1] in SIZE_UNITS:
+        return int(float(value[:-1]) * SIZE_UNITS[value[-1]])
+    return int(value)
+
+
+def measure(data, codec, level, repeat):
+    """Медианы времени сжатия/распаковки и CPU на сжатие"""
+    compress_times = []
+    decompress_times = []
+    cpu_times = []
+    for _ in range(repeat):
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        packed = compress(data, codec, level)
+        compress_times.append(time.perf_counter() - start)
+        cpu_times.append(time.process_time() - cpu_start)
+
+        start = time.perf_counter()
+        unpacked = decompress(packed, codec)
+        decompress_times.append(time.perf_counter() - start)
+    assert unpacked == data
+
+    mb = len(data) / 1024 / 1024
+    compress_s = statistics.median(compress_times)
+    decompress_s = statistics.median(decompress_times)
+    return {
+        'codec': codec,
+        'level': level,
+        'compressed_bytes': len(packed),
+        'ratio': round(len(packed) / len(data), 4),
+        'compress_mbs': round(mb / compress_s, 1) if compress_s else None,
+        'decompress_mbs': round(mb / decompress_s, 1) if decompress_s else None,
+        'cpu_ms_per_mb': round(statistics.median(cpu_times) * 1000 / mb, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк сжатия блобов ClipHistory')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='размеры через запятую (4k, 64k, 1m)')
+    parser.add_argument('--payloads', default=','.join(PAYLOADS), help='виды содержимого через запятую')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='JSON с результатами (по умолчанию benchmarks/results/)')
+    args = parser.parse_args()
+
+    codecs = ['zlib'] + (['zstd'] if ZSTD_AVAILABLE else [])
+    if not ZSTD_AVAILABLE:
+        print("⚠️  zstandard не установлен - только zlib")
+
+    results = []
+    for payload in args.payloads.split(','):
+        for size in map(parse_size, args.sizes.split(',')):
+            rng = random.Random(args.seed)
+            data = PAYLOADS[payload](rng, size).encode('utf-8')[:size]
+            print(f"{payload} {size // 1024} КБ:")
+            for codec in codecs:
+                for level in LEVELS[codec]:
+                    result = measure(data, codec, level, args.repeat)
+                    result.update(payload=payload, size=len(data))
+                    results.append(result)
+                    print(f"  {codec:<4} -{level}: {result['ratio'] * 100:5.1f}%, "
+                          f"сжатие {result['compress_mbs']} МБ/с, распаковка {result['decompress_mbs']} МБ/с, "
+                          f"CPU {result['cpu_ms_per_mb']} мс/МБ")
+
+    output = Path(args.output) if args.output else (
+        ROOT / 'benchmarks' / 'results' / f"compression-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'benchmark': 'compression',
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'zstd': ZSTD_AVAILABLE,
+            'results': results,
+        }, f, indent=2)
+    print(f"📄 Результаты: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+ClipHistory - бюджет холодного импорта UI (clipshow_qt.py)
+
+По умолчанию замеряет `import clipshow_qt` в свежем интерпретаторе
+(медиана --repeat запусков) и завершается с кодом 1, если медиана больше
+бюджета. Бюджет: --budget-ms или переменная CLIPHISTORY_IMPORT_BUDGET_MS.
+
+--importtime печатает сводку `python -X importtime`: самые дорогие модули
+по суммарному (cumulative) и собственному (self) времени.
+
+Запуск:
+    python3 benchmarks/bench_import.py [--budget-ms 250] [--repeat 5]
+    python3 benchmarks/bench_import.py --importtime [--top 15]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MODULE = 'clipshow_qt'
+DEFAULT_BUDGET_MS = 250
+
+IMPORT_PROBE = f'''
+import sys, time
+sys.path.insert(0, {str(ROOT)!r})
+start = time.perf_counter()
+import {MODULE}
+print((time.perf_counter() - start) * 1000)
+'''
+
+
+def measure_import_ms():
+    """Время импорта модуля UI в свежем интерпретаторе (мс)"""
+    result = subprocess.run([sys.executable, '-c', IMPORT_PROBE],
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def importtime_table():
+    """Разобрать вывод -X importtime: [(self_us, cumulative_us, module)]"""
+    code = f'import sys; sys.path.insert(0, {str(ROOT)!r}); import {MODULE}'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    return rows
+
+
+def print_importtime(top):
+    rows = importtime_table()
+    total = next((cum for _, cum, name in rows if name == MODULE), 0)
+    print(f"import {MODULE}: {total / 1000:.1f} мс, модулей: {len(rows)}")
+
+    print(f"\nПо суммарному времени (top {top}):")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda r: r[1], reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:8.1f} мс  {name}")
+
+    print(f"\nПо собственному времени (top {top}):")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda r: r[0], reverse=True)[:top]:
+        print(f"  {self_us / 1000:8.1f} мс  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бюджет холодного импорта UI ClipHistory')
+    parser.add_argument('--budget-ms', type=float,
+                        default=float(os.environ.get('CLIPHISTORY_IMPORT_BUDGET_MS', DEFAULT_BUDGET_MS)))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--importtime', action='store_true', help='сводка -X importtime')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    if args.importtime:
+        print_importtime(args.top)
+        return
+
+    samples = [measure_import_ms() for _ in range(args.repeat)]
+    median = statistics.median(samples)
+    print(f"import {MODULE}: медиана {median:.1f} мс "
+          f"(мин {min(samples):.1f}, макс {max(samples):.1f}), бюджет {args.budget_ms:.0f} мс")
+
+    if median > args.budget_ms:
+        print(f"❌ Бюджет превышен на {median - args.budget_ms:.1f} мс")
+        sys.exit(1)
+    print("✅ В пределах бюджета")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+ClipHistory - замер старта демона в обычном и --headless режимах
+
+Для каждого режима:
+  import   - время импорта модулей и RSS после него (трей: с QApplication)
+  daemon   - время от запуска cliphistory_new.py до сообщения "ready"
+             и RSS процесса через --settle секунд после готовности
+             (трей загружается уже после "ready")
+
+Демон запускается с временным HOME, чтобы не трогать настоящую историю.
+Без X-сервера (QT_QPA_PLATFORM=offscreen) иконка в трее не создаётся,
+но Qt в обычном режиме всё равно загружается и учитывается в RSS.
+
+Запуск:
+    python3 benchmarks/bench_startup.py [--repeat 5] [--json]
+"""
+
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from cliphistory_ipc import send_command, start_daemon  # noqa: E402
+
+# Код, выполняемый в отдельном интерпретаторе для замера импорта
+IMPORT_PROBE = '''
+import sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import cliphistory_new
+if {tray!r}:
+    from cliphistory_tray import DaemonTray
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv)
+elapsed = time.perf_counter() - start
+rss = open('/proc/self/status').read().split('VmRSS:')[1].split()[0]
+print(elapsed, rss, 'Qt' if 'PyQt5' in sys.modules else '-')
+'''
+
+
+def rss_kb(pid='self'):
+    """VmRSS процесса из /proc (КБ)"""
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def measure_import(tray):
+    """Один замер импорта: (секунды, RSS КБ, загружен ли Qt)"""
+    code = IMPORT_PROBE.format(root=str(ROOT), tray=tray)
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    elapsed, rss, qt = result.stdout.strip().splitlines()[-1].split()
+    return float(elapsed), int(rss), qt == 'Qt'
+
+
+def measure_daemon(headless, home, settle):
+    """Один запуск демона: (секунды до ready, RSS КБ) или None"""
+    command = [sys.executable, str(ROOT / 'cliphistory_new.py')]
+    if headless:
+        command.append('--headless')
+
+    env_home = os.environ.get('HOME')
+    os.environ['HOME'] = home
+    try:
+        start = time.perf_counter()
+        if not start_daemon(command, timeout=10.0):
+            return None
+        elapsed = time.perf_counter() - start
+        pid = send_command('ping')['pid']
+        time.sleep(settle)
+        rss = rss_kb(pid)
+        os.kill(pid, signal.SIGTERM)
+        # Дожидаемся освобождения сокета перед следующим запуском
+        for _ in range(100):
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                break
+            time.sleep(0.02)
+        return elapsed, rss
+    finally:
+        os.environ['HOME'] = env_home
+
+
+def summarize(samples):
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'max': max(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер старта демона ClipHistory')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--settle', type=float, default=1.0,
+                        help='пауза после ready перед замером RSS (сек)')
+    parser.add_argument('--json', action='store_true', help='вывести результат в JSON')
+    args = parser.parse_args()
+
+    results = {}
+    for mode, headless in (('tray', False), ('headless', True)):
+        imports = [measure_import(tray=not headless) for _ in range(args.repeat)]
+        entry = {
+            'import_s': summarize([m[0] for m in imports]),
+            'import_rss_kb': summarize([m[1] for m in imports]),
+            'qt_loaded': imports[0][2],
+        }
+
+        with tempfile.TemporaryDirectory() as home:
+            runs = [measure_daemon(headless, home, args.settle) for _ in range(args.repeat)]
+        runs = [r for r in runs if r]
+        if runs:
+            entry['ready_s'] = summarize([r[0] for r in runs])
+            entry['ready_rss_kb'] = summarize([r[1] for r in runs])
+        results[mode] = entry
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'режим':<10} {'импорт, мс':>11} {'RSS, МБ':>8} {'Qt':>4} {'до ready, мс':>13} {'RSS демона, МБ':>15}")
+    for mode, entry in results.items():
+        ready = entry.get('ready_s', {}).get('median')
+        ready_rss = entry.get('ready_rss_kb', {}).get('median')
+        print(f"{mode:<10} {entry['import_s']['median'] * 1000:>11.1f} "
+              f"{entry['import_rss_kb']['median'] / 1024:>8.1f} "
+              f"{'да' if entry['qt_loaded'] else 'нет':>4} "
+              f"{ready * 1000 if ready else float('nan'):>13.1f} "
+              f"{ready_rss / 1024 if ready_rss else float('nan'):>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+ClipHistory - бенчмарк хранилищ истории (cliphistory_storage) на нагрузке захвата
+
+Для каждого хранилища - sqlite, log и log+fsync ("storage_sync") - в
+отдельном временном каталоге создаётся ClipboardMonitor, и через его
+Storage прогоняется поток захватов, как у демона: put на каждый захват,
+каждые --cleanup-every захватов очистка (stale_items + delete_many с
+лимитами --max-items), каждые --page-every - первая страница окна
+(list_page), а также закрепления и удаления из окна. Строки (и блобы
+длинного текста) готовятся prepare_item заранее и в замер не входят.
+  put            - задержка добавления (p50/p95/p99/max), захватов/с
+  list_page      - первая страница окна (50 строк)
+  pin / delete   - операции окна
+  cleanup        - stale_items + delete_many
+  reopen         - новое хранилище на том же каталоге до первой страницы
+                   (для log - чтение журнала и построение индекса)
+  disk_bytes     - размер хранилища на диске (без блобов)
+  compactions    - сжатий журнала (log)
+
+Запуск:
+    python3 benchmarks/bench_storage.py [--items 5000] [--backends sqlite,log,log+fsync] [--output out.json]
+"""
+
+import argparse
+import hashlib
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from cliphistory_new import ClipboardMonitor  # noqa: E402
+from cliphistory_storage import LogStorage, open_storage  # noqa: E402
+
+BACKENDS = {
+    'sqlite': {'storage': 'sqlite'},
+    'log': {'storage': 'log'},
+    'log+fsync': {'storage': 'log', 'storage_sync': True},
+}
+
+PAGE_SIZE = 50
+
+WORDS = ('connection', 'request', 'timeout', 'user', 'session', 'cache', 'worker',
+         'queue', 'retry', 'backend', 'token', 'config', 'handler', 'payload')
+
+
+def make_content(rng, index):
+    """Содержимое захвата: в основном короткий текст, иногда длинный (блоб)"""
+    if rng.random() < 0.1:
+        text = '\n'.join(' '.join(rng.choice(WORDS) for _ in range(12)) for _ in range(rng.randint(20, 200)))
+    else:
+        text = f'{rng.choice(WORDS)} {rng.choice(WORDS)} {index}'
+    return text.encode('utf-8')
+
+
+def percentiles(samples):
+    """p50/p95/p99/max в миллисекундах"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 3)
+
+    return {'p50': at(0.5), 'p95': at(0.95), 'p99': at(0.99), 'max': round(ordered[-1] * 1000, 3)}
+
+
+def disk_bytes(storage):
+    if isinstance(storage, LogStorage):
+        return storage.disk_bytes()
+    return sum(path.stat().st_size for path in storage.db_path.parent.glob('history.db*'))
+
+
+def run_backend(name, args):
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory(prefix='bench-storage-') as cache_dir:
+        config = dict(BACKENDS[name], debug=False, max_text_items=args.max_items,
+                      max_image_items=args.max_items, cleanup_days=3650)
+        monitor = ClipboardMonitor(config, cache_dir=cache_dir)
+        storage = monitor.storage
+
+        start_ts = time.time() - args.items
+        rows = []
+        for index in range(args.items):
+            content = make_content(rng, index)
+            rows.append(monitor.prepare_item('text/plain', content, hashlib.md5(content).hexdigest(),
+                                             start_ts + index))
+
+        put_times, page_times, pin_times, delete_times, cleanup_times = [], [], [], [], []
+        ids = []
+        started = time.perf_counter()
+        for index, row in enumerate(rows, 1):
+            t0 = time.perf_counter()
+            item_id = storage.put(row)
+            put_times.append(time.perf_counter() - t0)
+            if item_id is not None:
+                ids.append(item_id)
+
+            if index % args.cleanup_every == 0:
+                t0 = time.perf_counter()
+                storage.delete_many([item.id for item in monitor.stale_items()])
+                cleanup_times.append(time.perf_counter() - t0)
+
+            if index % args.page_every == 0:
+                t0 = time.perf_counter()
+                storage.list_page(PAGE_SIZE)
+                page_times.append(time.perf_counter() - t0)
+
+                # Окно: закрепить и открепить свежий элемент, удалить другой
+                t0 = time.perf_counter()
+                storage.pin(ids[-1], 1)
+                storage.pin(ids[-1], 0)
+                pin_times.append((time.perf_counter() - t0) / 2)
+                t0 = time.perf_counter()
+                storage.delete(ids[-2])
+                delete_times.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - started
+
+        t0 = time.perf_counter()
+        reopened = open_storage(config, cache_dir)
+        reopened.list_page(PAGE_SIZE)
+        reopen_s = time.perf_counter() - t0
+        live = sum(1 for _ in reopened.iterate())
+
+        return {
+            'backend': name,
+            'items': args.items,
+            'live_items': live,
+            'captures_per_s': round(args.items / elapsed, 1),
+            'put_ms': percentiles(put_times),
+            'list_page_ms': percentiles(page_times),
+            'pin_ms': percentiles(pin_times),
+            'delete_ms': percentiles(delete_times),
+            'cleanup_ms': percentiles(cleanup_times),
+            'reopen_ms': round(reopen_s * 1000, 2),
+            'disk_bytes': disk_bytes(storage),
+            'compactions': getattr(storage, 'compactions', None),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк хранилищ истории ClipHistory')
+    parser.add_argument('--items', type=int, default=5000, help='захватов на хранилище')
+    parser.add_argument('--backends', default=','.join(BACKENDS), help='хранилища через запятую')
+    parser.add_argument('--max-items', type=int, default=1000, help='лимит истории (max_text_items)')
+    parser.add_argument('--cleanup-every', type=int, default=50, help='очистка каждые N захватов')
+    parser.add_argument('--page-every', type=int, default=100, help='страница окна каждые N захватов')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='JSON с результатами (по умолчанию benchmarks/results/)')
+    args = parser.parse_args()
+
+    results = []
+    for name in args.backends.split(','):
+        result = run_backend(name, args)
+        results.append(result)
+        print(f"{name}: {result['captures_per_s']} захватов/с, put p50 {result['put_ms']['p50']} "
+              f"p99 {result['put_ms']['p99']} мс, страница p50 {result['list_page_ms']['p50']} мс, "
+              f"очистка p50 {result['cleanup_ms']['p50']} мс, переоткрытие {result['reopen_ms']} мс, "
+              f"{result['disk_bytes'] / 1024:.0f} КБ, живых {result['live_items']}"
+              + (f", сжатий {result['compactions']}" if result['compactions'] is not None else ''))
+
+    output = Path(args.output) if args.output else (
+        ROOT / 'benchmarks' / 'results' / f"storage-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'benchmark': 'storage',
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'params': {key: getattr(args, key) for key in ('items', 'max_items', 'cleanup_every', 'page_every')},
+            'results': results,
+        }, f, indent=2)
+    print(f"📄 Результаты: {output}")
+
+
+if __name__ == '__main__':
+    main()
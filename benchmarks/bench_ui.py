@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+ClipHistory - бенчмарк отрисовки окна истории (clipshow_qt.py) offscreen
+
+Для каждого размера истории (по умолчанию 50, 1 000 и 100 000 элементов)
+генерируется history.db со смесью текста разной длины и изображений,
+затем окно открывается в отдельном процессе с QT_QPA_PLATFORM=offscreen
+и временным HOME (демон не запускается):
+  first_paint   - от создания окна до первой отрисовки списка со строками
+  load_history  - до последней порции HistoryLoader (весь список на месте)
+  thumbnails    - до подстановки всех миниатюр (декодирование в фоне)
+  delete / pin  - от delete_item_from_db / toggle_pin_item до конца
+                  sync_history с новой выборкой
+  scroll_frame  - стоимость кадра прокрутки: шаг полосы + repaint() (p50/p95/max)
+  peak_rss      - пиковый RSS процесса окна (ru_maxrss)
+
+Каждый размер прогоняется дважды: с холодным дисковым кэшем миниатюр
+и с тёплым (thumbs/ от предыдущего прогона).
+
+Окно показывает не больше HistoryLoader.limit строк, поэтому большие
+фикстуры нагружают в основном запрос к БД (сортировка по pinned, timestamp).
+
+Запуск:
+    python3 benchmarks/bench_ui.py [--sizes 50,1000,100000] [--image-ratio 0.2] [--output out.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+DEFAULT_SIZES = '50,1000,100000'
+# Уникальных PNG на фикстуру: остальные записи-изображения ссылаются на них
+UNIQUE_IMAGES = 32
+CHILD_TIMEOUT = 300
+WAIT_TIMEOUT = 30.0
+
+TEXT_WORDS = ('lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur',
+              'adipiscing', 'elit', 'sed', 'do', 'eiusmod', 'tempor')
+
+
+def make_text(rng, index):
+    """Текст разной формы: короткий, многострочный, длинный, с отступами"""
+    kind = index % 4
+    words = lambda n: ' '.join(rng.choice(TEXT_WORDS) for _ in range(n))
+    if kind == 0:
+        return f'#{index} {words(6)}'
+    if kind == 1:
+        return '\n'.join(f'{words(8)} {index}' for _ in range(rng.randint(3, 12)))
+    if kind == 2:
+        return f'#{index} ' + words(rng.randint(300, 1500))
+    return f'def item_{index}():\n\t\treturn "{words(4)}"\n\n\n    # {words(10)}\n'
+
+
+def build_fixture(home, size, image_ratio, seed=42):
+    """Создать ~/.cache/cliphistory/history.db с size элементами"""
+    from cliphistory_new import ClipboardMonitor, make_display_preview
+    from bench_capture import make_png
+
+    rng = random.Random(seed)
+    config = {'debug': False, 'text_max_lines': 6}
+    monitor = ClipboardMonitor(config, cache_dir=Path(home) / '.cache' / 'cliphistory')
+
+    image_count = int(size * image_ratio)
+    image_paths = []
+    for index in range(min(UNIQUE_IMAGES, image_count)):
+        width, height = rng.choice(((640, 360), (1280, 720), (1920, 1080), (300, 900)))
+        path = monitor.images_dir / f'bench{index:04d}.png'
+        path.write_bytes(make_png(index, width, height))
+        image_paths.append(str(path))
+
+    now = time.time()
+    image_rows = set(rng.sample(range(size), image_count))
+    # Несколько закреплённых: иначе при LIMIT окна весь первый экран был бы закреплён
+    pinned_rows = set(rng.sample(range(size), min(5, size // 10)))
+    rows = []
+    for index in range(size):
+        timestamp = now - (size - index) * 60
+        pinned = 1 if index in pinned_rows else 0
+        if index in image_rows:
+            path = image_paths[index % len(image_paths)]
+            rows.append((timestamp, 'image/png', path, f'Image {Path(path).name}',
+                         f'img-{index}', pinned, None))
+        else:
+            text = make_text(rng, index)
+            rows.append((timestamp, 'text/plain', None, text, f'text-{index}', pinned,
+                         make_display_preview(text, config['text_max_lines'])))
+
+    conn = sqlite3.connect(monitor.db_path)
+    with conn:
+        conn.executemany('INSERT INTO items (timestamp, mime_type, content_path, preview, hash, pinned, display) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+    conn.close()
+    return monitor.db_path
+
+
+def measure_window():
+    """Замер в дочернем процессе: HOME уже указывает на фикстуру"""
+    import resource
+    from PyQt5.QtCore import QEvent, QObject
+    from PyQt5.QtWidgets import QApplication
+    import clipshow_qt as ui
+
+    app = QApplication(sys.argv)
+
+    # Время завершения последней порции каждой загрузки (sync_history уже отработал)
+    loaded = {}
+
+    class BenchWindow(ui.ClipHistoryWindow):
+        def check_and_start_daemon(self):
+            pass  # Демон для замера не нужен
+
+        def on_rows_loaded(self, generation, rows, final):
+            super().on_rows_loaded(generation, rows, final)
+            if final and generation == self.load_generation:
+                loaded[generation] = time.perf_counter()
+
+    class PaintProbe(QObject):
+        """Момент первой отрисовки области списка со строками"""
+
+        def __init__(self, window):
+            super().__init__()
+            self.window = window
+            self.first_paint = None
+
+        def eventFilter(self, obj, event):
+            if (event.type() == QEvent.Paint and self.first_paint is None
+                    and self.window.list_widget.count() > 0):
+                self.first_paint = time.perf_counter()
+            return False
+
+    def wait_until(predicate, timeout=WAIT_TIMEOUT):
+        deadline = time.perf_counter() + timeout
+        while not predicate():
+            if time.perf_counter() > deadline:
+                raise TimeoutError
+            app.processEvents()
+            time.sleep(0.0005)
+        return time.perf_counter()
+
+    def row_widgets(window):
+        for index in range(window.list_widget.count()):
+            host = window.list_widget.itemWidget(window.list_widget.item(index))
+            if host is not None and host.row is not None:
+                yield host.row
+
+    def thumbnails_ready(window):
+        for row in row_widgets(window):
+            if hasattr(row, 'image_label'):
+                pixmap = row.image_label.pixmap()
+                if pixmap is None or pixmap.isNull():
+                    return False
+        return True
+
+    def ms(seconds):
+        return round(seconds * 1000, 2)
+
+    result = {}
+    start = time.perf_counter()
+    window = BenchWindow()
+    result['construct_ms'] = ms(time.perf_counter() - start)
+    window.refresh_timer.stop()  # Автообновление не должно вмешиваться в замеры
+    probe = PaintProbe(window)
+    window.list_widget.viewport().installEventFilter(probe)
+    window.show()
+
+    wait_until(lambda: probe.first_paint is not None)
+    result['first_paint_ms'] = ms(probe.first_paint - start)
+    generation = window.load_generation
+    wait_until(lambda: generation in loaded)
+    result['load_history_ms'] = ms(loaded[generation] - start)
+    result['rows'] = window.list_widget.count()
+    result['thumbnails_ms'] = ms(wait_until(lambda: thumbnails_ready(window)) - start)
+
+    def refresh(action):
+        """Действие + ожидание sync_history по перечитанной выборке"""
+        begin = time.perf_counter()
+        action()
+        generation = window.load_generation
+        return ms(wait_until(lambda: generation in loaded) - begin)
+
+    rows = window.loading_rows
+    # Удаляем текст: файлы изображений общие для нескольких записей фикстуры
+    unpinned = [row for row in rows if not row[4] and not row[2]]
+    if unpinned:
+        victim = unpinned[len(unpinned) // 2]
+        result['delete_ms'] = refresh(lambda: window.delete_item_from_db(victim[0]))
+        target = [row for row in window.loading_rows if not row[4]][-1]
+        result['pin_ms'] = refresh(lambda: window.toggle_pin_item(target[0], 0))
+        result['unpin_ms'] = refresh(lambda: window.toggle_pin_item(target[0], 1))
+    wait_until(lambda: thumbnails_ready(window))
+
+    # Кадры прокрутки: шаг полосы + синхронная отрисовка области списка
+    scrollbar = window.list_widget.verticalScrollBar()
+    viewport = window.list_widget.viewport()
+    step = max(1, scrollbar.pageStep() // 4)
+    frames = []
+    for direction in (1, -1):
+        while True:
+            value = scrollbar.value()
+            begin = time.perf_counter()
+            scrollbar.setValue(value + step * direction)
+            viewport.repaint()
+            frames.append(time.perf_counter() - begin)
+            app.processEvents()
+            if scrollbar.value() == value or scrollbar.value() in (scrollbar.minimum(), scrollbar.maximum()):
+                break
+    frames.sort()
+    result['scroll_frames'] = len(frames)
+    result['scroll_frame_ms'] = {
+        'p50': ms(frames[len(frames) // 2]),
+        'p95': ms(frames[min(len(frames) - 1, int(len(frames) * 0.95))]),
+        'max': ms(frames[-1]),
+    }
+
+    # ru_maxrss в Linux - КБ
+    result['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    window.close()
+    return result
+
+
+def run_child(home):
+    """Один замер окна в свежем процессе (холодный импорт и кэш Qt)"""
+    env = dict(os.environ, HOME=str(home), QT_QPA_PLATFORM='offscreen')
+    result = subprocess.run([sys.executable, __file__, '--child'], env=env,
+                            capture_output=True, text=True, timeout=CHILD_TIMEOUT)
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк отрисовки окна истории ClipHistory (offscreen)')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='размеры истории через запятую')
+    parser.add_argument('--image-ratio', type=float, default=0.2, help='доля изображений в истории')
+    parser.add_argument('--output', help='JSON с результатами (по умолчанию benchmarks/results/)')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_window()))
+        return
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix='cliphistory-bench-ui-') as home:
+            home = Path(home)
+            started = time.perf_counter()
+            db_path = build_fixture(home, size, args.image_ratio)
+            print(f"▶ {size} элементов (фикстура {time.perf_counter() - started:.1f} с, "
+                  f"БД {db_path.stat().st_size / 1024 / 1024:.1f} МБ)", flush=True)
+
+            thumbs_dir = db_path.parent / 'thumbs'
+            for cache in ('cold', 'warm'):
+                if cache == 'cold':
+                    shutil.rmtree(thumbs_dir, ignore_errors=True)
+                # Удаление/закрепление меняют фикстуру - каждый прогон на копии БД
+                backup = db_path.with_suffix('.bench')
+                shutil.copy(db_path, backup)
+                result = run_child(home)
+                shutil.move(backup, db_path)
+                if result is None:
+                    print(f"  {cache}: ошибка замера")
+                    continue
+                result.update({'items': size, 'image_ratio': args.image_ratio, 'thumbnail_cache': cache})
+                results.append(result)
+                scroll = result['scroll_frame_ms']
+                print(f"  {cache}: первый кадр {result['first_paint_ms']} мс, "
+                      f"загрузка {result['load_history_ms']} мс, миниатюры {result['thumbnails_ms']} мс, "
+                      f"удаление {result.get('delete_ms', '-')} мс, закрепление {result.get('pin_ms', '-')} мс, "
+                      f"кадр прокрутки p50 {scroll['p50']} / p95 {scroll['p95']} мс, "
+                      f"RSS {result['peak_rss_kb'] / 1024:.1f} МБ")
+
+    output = Path(args.output) if args.output else (
+        ROOT / 'benchmarks' / 'results' / f"ui-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'benchmark': 'ui',
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'results': results,
+        }, f, indent=2)
+    print(f"📄 Результаты: {output}")
+
+
+if __name__ == '__main__':
+    main()
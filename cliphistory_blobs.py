@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+ClipHistory - доступ к файлам-блобам (images/, text/, other/)
+
+Блобы отдаются как memoryview поверх mmap: передача в выделение и
+экспорт в файл работают без копирования всего содержимого в bytes.
+
+Сжатые блобы (длинный текст, other/) хранятся с суффиксом кодека
+(<hash>.zst - zstd, <hash>.zz - zlib) и распаковываются по требованию:
+BlobView - целиком в память, export_blob и open_blob - потоком.
+"""
+
+import mmap
+import os
+import shutil
+import zlib
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Кодек -> суффикс файла блоба
+CODEC_SUFFIXES = {'zstd': '.zst', 'zlib': '.zz'}
+_SUFFIX_CODECS = {suffix: codec for codec, suffix in CODEC_SUFFIXES.items()}
+
+# Уровни сжатия по умолчанию: быстрые, захват не должен тормозить
+DEFAULT_LEVELS = {'zstd': 3, 'zlib': 6}
+
+# Сжатие выгодно, только если экономит хотя бы 10%
+COMPRESS_MAX_RATIO = 0.9
+
+CHUNK_SIZE = 256 * 1024
+
+
+def default_codec():
+    """Лучший доступный кодек"""
+    return 'zstd' if ZSTD_AVAILABLE else 'zlib'
+
+
+def blob_codec(path):
+    """Кодек блоба по суффиксу файла (None - не сжат)"""
+    return _SUFFIX_CODECS.get(os.path.splitext(str(path))[1])
+
+
+def compress(data, codec, level=None):
+    """Сжать bytes-подобный объект кодеком codec"""
+    level = DEFAULT_LEVELS[codec] if level is None else level
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return zlib.compress(data, level)
+
+
+def maybe_compress(data, codec, level=None):
+    """(кодек, данные): сжатые, если это выгодно, иначе (None, data)"""
+    packed = compress(data, codec, level)
+    if len(packed) <= len(data) * COMPRESS_MAX_RATIO:
+        return codec, packed
+    return None, data
+
+
+def decompress(data, codec):
+    if codec == 'zstd':
+        # Размер записан во фрейме: распаковка одним буфером
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+class _ZlibReader:
+    """Файловый объект с распаковкой zlib потоком"""
+
+    def __init__(self, f):
+        self.f = f
+        self.decompressor = zlib.decompressobj()
+        self.buffer = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            chunk = self.f.read(CHUNK_SIZE)
+            if not chunk:
+                self.buffer += self.decompressor.flush()
+                break
+            self.buffer += self.decompressor.decompress(chunk)
+        if size < 0:
+            data, self.buffer = self.buffer, b''
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_blob(path):
+    """Открыть блоб на чтение распакованного содержимого потоком"""
+    f = open(path, 'rb')
+    codec = blob_codec(path)
+    if codec == 'zstd':
+        return zstandard.ZstdDecompressor().stream_reader(f, closefd=True)
+    if codec == 'zlib':
+        return _ZlibReader(f)
+    return f
+
+
+class BlobView:
+    """Отображённый в память блоб только для чтения.
+
+    view - memoryview на содержимое (для пустого файла - пустой).
+    Сжатый блоб распаковывается в память, view - поверх bytes.
+    Закрывается через close() или как контекстный менеджер.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mm = None
+        codec = blob_codec(path)
+        with open(path, 'rb') as f:
+            if codec:
+                self.view = memoryview(decompress(f.read(), codec))
+                return
+            if os.fstat(f.fileno()).st_size:
+                self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mm) if self.mm is not None else memoryview(b'')
+
+    def __len__(self):
+        return len(self.view)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.view.release()
+        if self.mm is not None:
+            try:
+                self.mm.close()
+            except BufferError:
+                # Ещё живы срезы view - mmap закроет сборщик мусора
+                pass
+            self.mm = None
+
+
+def export_blob(src, dst):
+    """Скопировать блоб в файл средствами ядра (copy_file_range / sendfile).
+
+    Сжатый блоб распаковывается потоком.
+    """
+    if blob_codec(src):
+        with open_blob(src) as fsrc, open(dst, 'wb') as fdst:
+            shutil.copyfileobj(fsrc, fdst, CHUNK_SIZE)
+        return
+
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        offset = 0
+        copy_file_range = getattr(os, 'copy_file_range', None)
+        try:
+            while offset < size:
+                if copy_file_range:
+                    copied = copy_file_range(fsrc.fileno(), fdst.fileno(), size - offset)
+                else:
+                    copied = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, size - offset)
+                if copied == 0:
+                    break
+                offset += copied
+        except OSError:
+            # Файловая система не поддерживает - обычное копирование с текущей позиции
+            fsrc.seek(offset)
+            fdst.seek(offset)
+            shutil.copyfileobj(fsrc, fdst)
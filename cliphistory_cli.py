@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+ClipHistory - история из командной строки (скрипты, rofi/dmenu)
+
+    cliphistory list [--limit N] [--offset N] [--kind text|image|other] [--since 2h] [-0]
+    cliphistory search ТЕКСТ [те же фильтры]
+    cliphistory get ID        # содержимое элемента в stdout (как есть)
+    cliphistory restore ID    # сделать элемент содержимым буфера (через демон)
+
+list/search печатают "id<TAB>превью" по строке на элемент в порядке окна
+истории (закреплённые, затем новые). Строки выводятся порциями по мере
+чтения из БД, соединение только для чтения. С -0 элементы разделяются
+NUL, а превью сохраняет переводы строк. Когда горячая история исчерпана,
+выборка продолжается по архиву (archive/ГГГГ-ММ.db, см. cliphistory_tiers).
+
+get и restore принимают и строку из list целиком ("42\\tпревью") -
+удобно для `cliphistory list | rofi -dmenu | cliphistory restore`.
+
+Модуль не импортирует Qt, Xlib и демон: запуск напрямую
+(cliphistory_cli.py) - самый быстрый путь для лаунчеров.
+"""
+
+import argparse
+import itertools
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from cliphistory_storage import require_sqlite
+from cliphistory_tiers import cold_content, iter_cold
+
+FETCH_BATCH = 256
+
+# Команды, которые `cliphistory` (cliphistory_new.py) передаёт сюда
+COMMANDS = ('list', 'search', 'get', 'restore')
+
+TEXT_TARGETS = ('UTF8_STRING', 'STRING', 'TEXT')
+
+SINCE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+
+
+def cache_dir():
+    return Path.home() / '.cache' / 'cliphistory'
+
+
+def db_path():
+    return cache_dir() / 'history.db'
+
+
+def connect_readonly():
+    """Соединение только для чтения: не мешает демону и не создаёт БД"""
+    path = db_path()
+    if not path.exists():
+        raise FileNotFoundError(f'история не найдена: {path}')
+    return sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+
+
+def parse_since(value):
+    """'90s', '30m', '2h', '7d', '1w' или дата '2026-01-05' -> unix time"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smhdw])', value)
+    if match:
+        return time.time() - float(match.group(1)) * SINCE_UNITS[match.group(2)]
+    try:
+        return time.mktime(time.strptime(value, '%Y-%m-%d'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'ожидается 30m, 2h, 7d или ГГГГ-ММ-ДД: {value}')
+
+
+def parse_item_id(value):
+    """ID из аргумента: '42' или строка из list ('42\\tпревью')"""
+    match = re.match(r'\s*(\d+)', value)
+    if not match:
+        raise argparse.ArgumentTypeError(f'ожидается ID элемента: {value!r}')
+    return int(match.group(1))
+
+
+def kind_condition(kind):
+    """SQL-условие по виду элемента"""
+    text = f"(mime_type LIKE 'text/%' OR mime_type IN {TEXT_TARGETS})"
+    if kind == 'text':
+        return text
+    if kind == 'image':
+        return "mime_type LIKE 'image/%'"
+    return f"NOT {text} AND mime_type NOT LIKE 'image/%'"
+
+
+def query_items(conn, kind=None, since=None, search=None, limit=None, offset=0):
+    """Строки (id, mime_type, preview) в порядке окна истории, затем из архива"""
+    conditions = []
+    params = []
+    if kind:
+        conditions.append(kind_condition(kind))
+    if since is not None:
+        conditions.append('timestamp >= ?')
+        params.append(since)
+    if search:
+        conditions.append("preview LIKE ? ESCAPE '\\'")
+        escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        params.append(f'%{escaped}%')
+
+    where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+    hot = conn.execute(f'SELECT id, mime_type, preview FROM items{where} ORDER BY pinned DESC, timestamp DESC',
+                       params)
+    # Архивы открываются, только если горячая история исчерпана
+    rows = itertools.chain(hot, iter_cold(cache_dir(), 'id, mime_type, preview', where, params))
+    return itertools.islice(rows, offset, offset + limit if limit else None)
+
+
+def format_entry(item_id, mime_type, preview, multiline):
+    if mime_type.startswith('image/'):
+        text = f'[{mime_type}]'
+    elif multiline:
+        text = (preview or '').replace('\0', '')
+    else:
+        text = ' '.join((preview or '').split())
+    return f'{item_id}\t{text}'
+
+
+def print_items(rows, null_separated):
+    """Печать порциями по мере чтения из БД"""
+    separator = '\0' if null_separated else '\n'
+    out = sys.stdout
+    while True:
+        batch = list(itertools.islice(rows, FETCH_BATCH))
+        if not batch:
+            break
+        out.write(''.join(format_entry(*row, multiline=null_separated) + separator for row in batch))
+        out.flush()
+
+
+def get_item(conn, item_id):
+    """Содержимое элемента в stdout без преобразований"""
+    row = conn.execute('SELECT mime_type, content_path, preview FROM items WHERE id = ?',
+                       (item_id,)).fetchone()
+    out = sys.stdout.buffer
+    if row is None:
+        cold = cold_content(cache_dir(), item_id)
+        if cold is None:
+            raise LookupError(f'элемент {item_id} не найден')
+        out.write(cold[1])
+        out.flush()
+        return
+    mime_type, content_path, preview = row
+    if content_path:
+        from cliphistory_blobs import open_blob
+
+        # Сжатый блоб распаковывается потоком
+        with open_blob(content_path) as f:
+            shutil.copyfileobj(f, out)
+    else:
+        out.write((preview or '').encode('utf-8'))
+    out.flush()
+
+
+def restore_item(item_id):
+    from cliphistory_ipc import send_command
+
+    try:
+        response = send_command('restore', timeout=2.0, id=item_id)
+    except (OSError, ValueError):
+        raise ConnectionError('ClipHistory не запущен')
+    if not response.get('ok'):
+        raise LookupError(f'не удалось восстановить элемент {item_id}')
+
+
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description='ClipHistory - история из командной строки')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument('--limit', type=int, help='не больше N элементов')
+    filters.add_argument('--offset', type=int, default=0, help='пропустить первые N (страницы)')
+    filters.add_argument('--kind', choices=['text', 'image', 'other'])
+    filters.add_argument('--since', type=parse_since, help='не старше: 30m, 2h, 7d или ГГГГ-ММ-ДД')
+    filters.add_argument('-0', '--null', action='store_true', help='разделять элементы NUL')
+
+    sub.add_parser('list', parents=[filters], help='элементы истории')
+    search_parser = sub.add_parser('search', parents=[filters], help='поиск по тексту (без учёта регистра ASCII)')
+    search_parser.add_argument('text')
+    for name, help_text in (('get', 'содержимое элемента в stdout'),
+                            ('restore', 'сделать элемент содержимым буфера')):
+        item_parser = sub.add_parser(name, help=help_text)
+        item_parser.add_argument('id', type=parse_item_id, help='ID или строка из list')
+    return parser
+
+
+def main(argv=None, prog=None):
+    args = build_parser(prog).parse_args(argv)
+    try:
+        if args.command == 'restore':
+            restore_item(args.id)
+            return 0
+
+        require_sqlite(f'cliphistory {args.command}')
+        conn = connect_readonly()
+        try:
+            if args.command == 'get':
+                get_item(conn, args.id)
+            else:
+                search = args.text if args.command == 'search' else None
+                rows = query_items(conn, args.kind, args.since, search, args.limit, args.offset)
+                print_items(rows, args.null)
+        finally:
+            conn.close()
+    except BrokenPipeError:
+        # Читатель (head, rofi) закрыл канал раньше времени - это не ошибка;
+        # stdout перенаправляется, чтобы сброс буфера при выходе не упал снова
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    except (OSError, LookupError, RuntimeError, sqlite3.Error) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+ClipHistory - экспорт истории в архив (резервная копия, перенос)
+
+Согласованный снимок: history.db копируется online backup API SQLite
+во временный файл рядом с ней - демон может писать в это время.
+Из снимка строки потоком пишутся в items.jsonl (временный файл на
+диске), затем архив собирается одним проходом: items.jsonl первым,
+за ним блобы blobs/<hash> прямо из файлов. В памяти ничего целиком
+не держится; сжатие - по расширению (.tar.gz, .tar.xz, .tar), "-" - stdout.
+Сжатые блобы истории (.zst, .zz) распаковываются потоком: в архиве
+содержимое всегда в исходном виде. Помесячные архивы истории
+(archive/ГГГГ-ММ.db, см. cliphistory_tiers) снимаются так же и
+попадают в архив после горячей истории.
+
+--incremental: только элементы с id больше, чем в прошлом экспорте
+(водяной знак в ~/.cache/cliphistory/export-state.json сохраняется
+после успешной записи архива). Инкрементальные архивы импортируются
+по очереди: cliphistory_import.py dump FILE.
+
+Запуск:
+    python3 cliphistory_export.py history.tar.gz
+    python3 cliphistory_export.py --incremental history-$(date +%F).tar.gz
+"""
+
+import argparse
+import io
+import json
+import os
+import sqlite3
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+from cliphistory_blobs import CHUNK_SIZE, blob_codec, decompress, open_blob
+from cliphistory_storage import require_sqlite
+from cliphistory_tiers import archive_paths
+
+DUMP_ITEMS = 'items.jsonl'
+DUMP_BLOBS = 'blobs/'
+
+# Страниц за шаг backup: между шагами демон может писать
+BACKUP_PAGES = 1024
+
+COMPRESSION = {'.gz': 'gz', '.tgz': 'gz', '.xz': 'xz', '.bz2': 'bz2', '.tar': ''}
+
+
+def cache_dir():
+    return Path.home() / '.cache' / 'cliphistory'
+
+
+def state_path():
+    return cache_dir() / 'export-state.json'
+
+
+def load_state():
+    try:
+        with open(state_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state):
+    tmp_path = f'{state_path()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path())
+
+
+def snapshot(db_path, target):
+    """Согласованная копия БД через online backup API"""
+    source = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    dest = sqlite3.connect(target)
+    try:
+        source.backup(dest, pages=BACKUP_PAGES)
+    finally:
+        dest.close()
+        source.close()
+
+
+def write_items(snapshot_path, items_file, since_id=0):
+    """items.jsonl из снимка; вернуть (число элементов, max id, блобы [(имя, путь, размер)])"""
+    conn = sqlite3.connect(snapshot_path)
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(items)')}
+    # БД до миграции сжатия: исходного размера нет, блобы не сжаты
+    orig_size = 'orig_size' if 'orig_size' in columns else 'NULL'
+    blobs = []
+    count = 0
+    max_id = since_id
+    try:
+        cursor = conn.execute(f'''
+            SELECT id, timestamp, mime_type, content_path, preview, hash, COALESCE(pinned, 0), {orig_size}
+            FROM items WHERE id > ? ORDER BY id
+        ''', (since_id,))
+        for item_id, timestamp, mime_type, content_path, preview, content_hash, pinned, size in cursor:
+            record = {'timestamp': timestamp, 'mime_type': mime_type, 'hash': content_hash, 'pinned': pinned}
+            if content_path:
+                name = f'{DUMP_BLOBS}{content_hash}'
+                record['blob'] = name
+                blobs.append((name, content_path, size))
+            else:
+                record['text'] = preview or ''
+            items_file.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+            count += 1
+            max_id = item_id
+    finally:
+        conn.close()
+    return count, max_id, blobs
+
+
+def write_cold_items(snapshot_path, items_file, since_id=0):
+    """Строки снимка архива истории в items.jsonl; вернуть (число элементов, max id)"""
+    conn = sqlite3.connect(snapshot_path)
+    count = 0
+    max_id = since_id
+    try:
+        cursor = conn.execute('''
+            SELECT id, timestamp, mime_type, preview, hash, content IS NOT NULL
+            FROM items WHERE id > ? ORDER BY id
+        ''', (since_id,))
+        for item_id, timestamp, mime_type, preview, content_hash, has_blob in cursor:
+            record = {'timestamp': timestamp, 'mime_type': mime_type, 'hash': content_hash, 'pinned': 0}
+            if has_blob:
+                record['blob'] = f'{DUMP_BLOBS}{content_hash}'
+            else:
+                record['text'] = preview or ''
+            items_file.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+            count += 1
+            max_id = max(max_id, item_id)
+    finally:
+        conn.close()
+    return count, max_id
+
+
+def add_cold_blobs(tar, snapshot_path, since_id=0):
+    """Блобы из снимка архива истории (по одному в памяти); вернуть (число, байт)"""
+    conn = sqlite3.connect(snapshot_path)
+    count = 0
+    total = 0
+    try:
+        cursor = conn.execute('''
+            SELECT hash, codec, content FROM items
+            WHERE id > ? AND content IS NOT NULL ORDER BY id
+        ''', (since_id,))
+        for content_hash, codec, content in cursor:
+            data = decompress(content, codec) if codec else content
+            info = tarfile.TarInfo(f'{DUMP_BLOBS}{content_hash}')
+            info.size = len(data)
+            info.mtime = time.time()
+            tar.addfile(info, io.BytesIO(data))
+            count += 1
+            total += len(data)
+    finally:
+        conn.close()
+    return count, total
+
+
+def open_archive(output):
+    """tarfile в потоковом режиме; сжатие по расширению"""
+    if output == '-':
+        return tarfile.open(fileobj=sys.stdout.buffer, mode='w|gz')
+    compression = COMPRESSION.get(Path(output).suffix, 'gz')
+    return tarfile.open(output, f'w|{compression}')
+
+
+def add_file(tar, name, path, size=None):
+    """Добавить файл потоком; размер берётся у уже открытого файла.
+
+    Сжатый блоб распаковывается на лету, размер в заголовке - исходный
+    (orig_size из БД).
+    """
+    if blob_codec(path):
+        if size is None:
+            # Размер неизвестен - лишний проход распаковки
+            with open_blob(path) as f:
+                size = sum(len(chunk) for chunk in iter(lambda: f.read(CHUNK_SIZE), b''))
+        with open_blob(path) as f:
+            info = tarfile.TarInfo(name)
+            info.size = size
+            info.mtime = os.stat(path).st_mtime
+            tar.addfile(info, f)
+        return size
+
+    with open(path, 'rb') as f:
+        info = tar.gettarinfo(arcname=name, fileobj=f)
+        info.uid = info.gid = 0
+        info.uname = info.gname = ''
+        tar.addfile(info, f)
+    return info.size
+
+
+def export(output, incremental=False, quiet=False):
+    """Экспорт истории в архив; вернуть сводку"""
+    require_sqlite('экспорт')
+    db_path = cache_dir() / 'history.db'
+    if not db_path.exists():
+        raise FileNotFoundError(f'история не найдена: {db_path}')
+
+    state = load_state() if incremental else {}
+    since_id = state.get('last_id', 0)
+    started = time.monotonic()
+    log = (lambda message: None) if quiet or output == '-' else print
+
+    fd, snapshot_path = tempfile.mkstemp(prefix='export-', suffix='.snapshot', dir=db_path.parent)
+    os.close(fd)
+    cold_snapshots = []
+    try:
+        snapshot(db_path, snapshot_path)
+        for path in archive_paths(db_path.parent):
+            fd, cold_path = tempfile.mkstemp(prefix='export-', suffix='.snapshot', dir=db_path.parent)
+            os.close(fd)
+            cold_snapshots.append(cold_path)
+            try:
+                snapshot(path, cold_path)
+            except sqlite3.OperationalError:
+                # Удалён очисткой архивов после листинга
+                os.unlink(cold_path)
+                cold_snapshots.pop()
+        log(f"📸 Снимок БД: {time.monotonic() - started:.2f} с")
+
+        with tempfile.TemporaryFile(dir=db_path.parent) as items_file:
+            count, max_id, blobs = write_items(snapshot_path, items_file, since_id)
+            for cold_path in cold_snapshots:
+                cold_count, cold_max_id = write_cold_items(cold_path, items_file, since_id)
+                count += cold_count
+                max_id = max(max_id, cold_max_id)
+            items_file.seek(0)
+
+            missing = 0
+            blob_bytes = 0
+            with open_archive(output) as tar:
+                info = tarfile.TarInfo(DUMP_ITEMS)
+                info.size = os.fstat(items_file.fileno()).st_size
+                info.mtime = time.time()
+                tar.addfile(info, items_file)
+                for name, path, size in blobs:
+                    try:
+                        blob_bytes += add_file(tar, name, path, size)
+                    except FileNotFoundError:
+                        # Удалён очисткой демона после снимка
+                        missing += 1
+                cold_blobs = 0
+                for cold_path in cold_snapshots:
+                    blob_count, blob_size = add_cold_blobs(tar, cold_path, since_id)
+                    cold_blobs += blob_count
+                    blob_bytes += blob_size
+    finally:
+        os.unlink(snapshot_path)
+        for cold_path in cold_snapshots:
+            os.unlink(cold_path)
+
+    # Водяной знак и после полного экспорта: следующий --incremental продолжит с него
+    save_state({'last_id': max_id, 'exported_at': time.time(),
+                'output': None if output == '-' else str(Path(output).resolve())})
+
+    return {
+        'items': count,
+        'since_id': since_id,
+        'last_id': max_id,
+        'blobs': len(blobs) - missing + cold_blobs,
+        'missing_blobs': missing,
+        'blob_bytes': blob_bytes,
+        'elapsed_s': round(time.monotonic() - started, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ClipHistory - экспорт истории в архив')
+    parser.add_argument('output', help='архив (.tar.gz, .tar.xz, .tar) или "-" для stdout')
+    parser.add_argument('--incremental', action='store_true',
+                        help='только элементы новее прошлого экспорта')
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+
+    try:
+        result = export(args.output, args.incremental, args.quiet)
+    except (OSError, RuntimeError, sqlite3.Error, tarfile.TarError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.quiet or args.output == '-':
+        return
+    since = f" (после id {result['since_id']})" if result['since_id'] else ''
+    print(f"✅ {result['items']} элементов{since}, блобов {result['blobs']} "
+          f"({result['blob_bytes'] / 1024 / 1024:.1f} МБ) за {result['elapsed_s']} с: {args.output}")
+    if result['missing_blobs']:
+        print(f"⚠️  {result['missing_blobs']} блобов удалены демоном после снимка")
+
+
+if __name__ == '__main__':
+    main()
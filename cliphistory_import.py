@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+ClipHistory - импорт истории из других менеджеров буфера и дампов
+
+Источники (читаются потоково, элемент за элементом):
+  dump    - дамп ClipHistory: .tar(.gz) с items.jsonl и blobs/<hash>
+            (cliphistory_export.py) или просто .jsonl
+  copyq   - CopyQ через `copyq eval` (нужен запущенный copyq)
+  gpaste  - GPaste: ~/.local/share/gpaste/history.xml
+  clipman - clipman: ~/.local/share/clipman.json
+
+Строка items.jsonl: {"timestamp": unix, "mime_type": ..., "pinned": 0|1,
+"hash": ..., и одно из "text" (строка), "blob" (член tar), "path" (файл),
+"base64" (данные)}. Без timestamp элементы получают время по порядку
+(первый в источнике - самый новый, кроме clipman).
+
+Запись идёт пачками по --batch элементов в одной транзакции; элементы,
+чей хеш уже есть в истории, пропускаются, файлы-блобы с тем же хешем
+не перезаписываются.
+
+Запуск:
+    python3 cliphistory_import.py dump history.tar.gz
+    python3 cliphistory_import.py gpaste [FILE] | clipman [FILE] | copyq [--tab TAB]
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import subprocess
+import sys
+import tarfile
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from cliphistory_export import DUMP_ITEMS
+from cliphistory_ipc import send_command
+from cliphistory_new import MIME_PRIORITY, ClipboardMonitor
+
+DEFAULT_BATCH = 1000
+PROGRESS_INTERVAL = 0.25
+
+# CopyQ: элементы текущей вкладки, данные в base64 (служебные MIME пропускаются)
+COPYQ_SCRIPT = r'''
+var internal = /^application\/x-copyq-/;
+for (var row = 0; row < size(); ++row) {
+    var item = getItem(row);
+    var data = {};
+    for (var mime in item) {
+        if (!internal.test(mime))
+            data[mime] = str(toBase64(item[mime]));
+    }
+    print(JSON.stringify(data) + "\n");
+}
+'''
+
+
+class ImportEntry:
+    """Элемент источника: данные уже в памяти"""
+
+    __slots__ = ('timestamp', 'mime_type', 'content', 'pinned')
+
+    def __init__(self, timestamp, mime_type, content, pinned=False):
+        self.timestamp = timestamp
+        self.mime_type = mime_type
+        self.content = content
+        self.pinned = pinned
+
+
+def entry_from_record(record, blob=None, base_dir=None):
+    """ImportEntry из строки items.jsonl; None - данных нет"""
+    if blob is not None:
+        content = blob
+    elif 'text' in record:
+        content = record['text'].encode('utf-8')
+    elif 'base64' in record:
+        content = base64.b64decode(record['base64'])
+    elif 'path' in record:
+        path = Path(record['path'])
+        if base_dir and not path.is_absolute():
+            path = base_dir / path
+        try:
+            content = path.read_bytes()
+        except OSError:
+            return None
+    else:
+        return None
+    return ImportEntry(record.get('timestamp'), record.get('mime_type') or 'text/plain',
+                       content, bool(record.get('pinned')))
+
+
+def parse_record(line, index, now):
+    """Строка items.jsonl; без timestamp - время по порядку, первая самая новая"""
+    record = json.loads(line)
+    if record.get('timestamp') is None:
+        record['timestamp'] = now - index
+    return record
+
+
+def read_dump(path):
+    """Дамп ClipHistory: .jsonl или tar с items.jsonl и blobs/.
+
+    В tar items.jsonl идёт первым: текст отдаётся сразу, элементы с
+    блобами ждут своего члена архива (архив читается одним проходом,
+    в том числе из сжатого потока).
+    """
+    path = Path(path)
+    now = time.time()
+    if not tarfile.is_tarfile(path):
+        with open(path, encoding='utf-8') as f:
+            for index, line in enumerate(f):
+                if line.strip():
+                    entry = entry_from_record(parse_record(line, index, now), base_dir=path.parent)
+                    if entry is not None:
+                        yield entry
+        return
+
+    pending = {}  # имя члена архива -> записи items.jsonl
+    with tarfile.open(path, 'r|*') as tar:
+        for member in tar:
+            if member.name == DUMP_ITEMS:
+                for index, line in enumerate(tar.extractfile(member)):
+                    if not line.strip():
+                        continue
+                    record = parse_record(line, index, now)
+                    if 'blob' in record:
+                        pending.setdefault(record['blob'], []).append(record)
+                    else:
+                        entry = entry_from_record(record)
+                        if entry is not None:
+                            yield entry
+            elif member.isfile() and member.name in pending:
+                blob = tar.extractfile(member).read()
+                for record in pending.pop(member.name):
+                    yield entry_from_record(record, blob=blob)
+    if pending:
+        missing = sum(len(records) for records in pending.values())
+        print(f"⚠️  В архиве нет блобов для {missing} элементов из {DUMP_ITEMS}", file=sys.stderr)
+
+
+def read_clipman(path):
+    """clipman: JSON-массив строк, новые в конце"""
+    with open(path, encoding='utf-8') as f:
+        history = json.load(f)
+    now = time.time()
+    for index, text in enumerate(history):
+        yield ImportEntry(now - (len(history) - index), 'text/plain', text.encode('utf-8'))
+
+
+def parse_gpaste_date(value):
+    """Дата GPaste (секунды, мс или мкс с эпохи) -> unix time"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    while number > 1e11:
+        number /= 1000
+    return number
+
+
+def read_gpaste(path):
+    """GPaste history.xml: первый <item> - самый новый; пароли пропускаются"""
+    now = time.time()
+    index = 0
+    for event, element in ET.iterparse(path, events=('end',)):
+        if element.tag != 'item':
+            continue
+        kind = element.get('kind', 'Text')
+        value = element.findtext('value') or ''
+        timestamp = parse_gpaste_date(element.get('date')) or now - index
+        index += 1
+        element.clear()
+
+        if kind == 'Password' or not value:
+            continue
+        if kind == 'Image':
+            try:
+                content = Path(value).read_bytes()
+            except OSError:
+                continue
+            mime_type = 'image/png' if value.lower().endswith('.png') else 'image/jpeg'
+            yield ImportEntry(timestamp, mime_type, content)
+        elif kind == 'Uris':
+            yield ImportEntry(timestamp, 'text/uri-list', value.encode('utf-8'))
+        else:
+            yield ImportEntry(timestamp, 'text/plain', value.encode('utf-8'))
+
+
+def pick_mime(formats):
+    """Лучший MIME элемента с несколькими представлениями"""
+    for mime_type in MIME_PRIORITY:
+        if mime_type in formats:
+            return mime_type
+    for mime_type in formats:
+        if mime_type.startswith('image/'):
+            return mime_type
+    return next(iter(formats), None)
+
+
+def read_copyq(tab=None):
+    """CopyQ: вывод `copyq [tab TAB] eval` построчно, строка 0 - самая новая"""
+    command = ['copyq']
+    if tab:
+        command += ['tab', tab]
+    command += ['eval', COPYQ_SCRIPT]
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE)
+    except FileNotFoundError:
+        raise RuntimeError('copyq не найден')
+
+    now = time.time()
+    try:
+        for index, line in enumerate(process.stdout):
+            formats = json.loads(line)
+            mime_type = pick_mime(formats)
+            if mime_type:
+                yield ImportEntry(now - index, mime_type, base64.b64decode(formats[mime_type]))
+    finally:
+        process.stdout.close()
+        if process.wait() != 0:
+            raise RuntimeError('copyq eval завершился с ошибкой (copyq запущен?)')
+
+
+class HistoryImporter:
+    """Запись элементов в историю пачками"""
+
+    def __init__(self, monitor, batch_size=DEFAULT_BATCH, progress=False):
+        self.monitor = monitor
+        self.batch_size = batch_size
+        self.progress = progress
+        self.stats = {'read': 0, 'imported': 0, 'duplicates': 0, 'empty': 0, 'pinned': 0}
+
+    def run(self, entries):
+        known = {item.hash for item in self.monitor.storage.iterate()}
+        # Элементы из архива (экспорт их содержит) - тоже повторы
+        known.update(content_hash for (content_hash,) in self.monitor.storage.iter_cold('hash'))
+        rows = []
+        pinned = []
+        started = time.monotonic()
+        last_report = started
+
+        for entry in entries:
+            self.stats['read'] += 1
+            if not entry or not entry.content:
+                self.stats['empty'] += 1
+                continue
+            content_hash = hashlib.md5(entry.content).hexdigest()
+            if content_hash in known:
+                self.stats['duplicates'] += 1
+                continue
+            known.add(content_hash)
+
+            rows.append(self.monitor.prepare_item(entry.mime_type, entry.content,
+                                                  content_hash, entry.timestamp))
+            if entry.pinned:
+                pinned.append(content_hash)
+            if len(rows) >= self.batch_size:
+                self._write(rows, pinned)
+                rows, pinned = [], []
+
+            now = time.monotonic()
+            if self.progress and now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                self._report(now - started)
+        self._write(rows, pinned)
+
+        self.stats['elapsed_s'] = round(time.monotonic() - started, 2)
+        if self.progress:
+            self._report(self.stats['elapsed_s'], final=True)
+        return self.stats
+
+    def _write(self, rows, pinned):
+        """Пачка одной записью в хранилище (для sqlite - одна транзакция)"""
+        if not rows:
+            return
+        self.monitor.storage.put_many(rows, pinned)
+        self.stats['imported'] += len(rows)
+        self.stats['pinned'] += len(pinned)
+
+    def _report(self, elapsed, final=False):
+        # Невыписанная пачка тоже считается: прогресс - по прочитанному
+        rate = self.stats['read'] / elapsed if elapsed else 0
+        print(f"\r  прочитано {self.stats['read']}, новых {self.stats['imported']}, "
+              f"повторов {self.stats['duplicates']} ({rate:.0f} эл/с)",
+              end='\n' if final else '', file=sys.stderr, flush=True)
+
+
+def load_config():
+    try:
+        with open(Path(__file__).resolve().parent / 'config.json') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def retention_warning(config, storage):
+    """Предупредить, если очистка демона удалит импортированное"""
+    if config.get('archive_months', 0) > 0:
+        print(f"ℹ️  Что не поместится в горячую историю, демон перенесёт в архив "
+              f"(archive_months = {config['archive_months']}).")
+        return
+    days = config.get('cleanup_days', 7)
+    cutoff = time.time() - days * 86400
+    counts = {}
+    old = 0
+    for item in storage.iterate():
+        if item.pinned:
+            continue
+        if item.mime_type.startswith('text/'):
+            counts['max_text_items'] = counts.get('max_text_items', 0) + 1
+        elif item.mime_type.startswith('image/'):
+            counts['max_image_items'] = counts.get('max_image_items', 0) + 1
+        if item.timestamp < cutoff:
+            old += 1
+
+    for key in ('max_text_items', 'max_image_items'):
+        limit = config.get(key, 50)
+        if counts.get(key, 0) > limit:
+            print(f"⚠️  {key} = {limit}: демон оставит только {limit} из {counts[key]}. "
+                  f"Увеличьте лимит в config.json до перезапуска демона.")
+    if old:
+        print(f"⚠️  {old} элементов старше cleanup_days = {days} будут удалены при очистке.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ClipHistory - импорт истории')
+    parser.add_argument('--batch', type=int, default=DEFAULT_BATCH, help='элементов в транзакции')
+    parser.add_argument('--quiet', action='store_true', help='без строки прогресса')
+    sub = parser.add_subparsers(dest='source', required=True)
+
+    dump_parser = sub.add_parser('dump', help='дамп ClipHistory (.tar, .tar.gz, .jsonl)')
+    dump_parser.add_argument('path')
+    gpaste_parser = sub.add_parser('gpaste', help='GPaste history.xml')
+    gpaste_parser.add_argument('path', nargs='?',
+                               default=str(Path.home() / '.local' / 'share' / 'gpaste' / 'history.xml'))
+    clipman_parser = sub.add_parser('clipman', help='clipman.json')
+    clipman_parser.add_argument('path', nargs='?',
+                                default=str(Path.home() / '.local' / 'share' / 'clipman.json'))
+    copyq_parser = sub.add_parser('copyq', help='CopyQ (через copyq eval)')
+    copyq_parser.add_argument('--tab', help='вкладка CopyQ (по умолчанию текущая)')
+    args = parser.parse_args()
+
+    if args.source == 'copyq':
+        entries = read_copyq(args.tab)
+    else:
+        readers = {'dump': read_dump, 'gpaste': read_gpaste, 'clipman': read_clipman}
+        entries = readers[args.source](args.path)
+
+    config = dict(load_config(), debug=False)
+    monitor = ClipboardMonitor(config)
+    print(f"📥 Импорт {args.source} в {monitor.cache_dir}")
+    try:
+        progress = not args.quiet and sys.stderr.isatty()
+        stats = HistoryImporter(monitor, args.batch, progress=progress).run(entries)
+    except (OSError, ValueError, RuntimeError, tarfile.TarError, ET.ParseError) as e:
+        print(f"\n❌ {e}")
+        sys.exit(1)
+
+    try:
+        # Работающий демон перечитывает первую страницу окна из хранилища
+        send_command('recent', limit=0, reload=True)
+    except (OSError, ValueError):
+        pass
+
+    print(f"✅ Импортировано {stats['imported']} (закреплённых {stats['pinned']}), "
+          f"повторов {stats['duplicates']}, пустых {stats['empty']} за {stats['elapsed_s']} с")
+    retention_warning(config, monitor.storage)
+
+
+if __name__ == '__main__':
+    main()
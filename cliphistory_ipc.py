@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+ClipHistory - управляющий сокет демона
+
+Протокол: клиент подключается к Unix-сокету, отправляет одну строку JSON
+с полем "cmd" и читает одну строку JSON с ответом.
+
+Готовность при запуске: запускающий процесс передаёт демону конец pipe
+(номер дескриптора в CLIPHISTORY_READY_FD), демон пишет в него "ready",
+как только управляющий сокет начал принимать соединения.
+
+Единственный экземпляр UI: живое окно слушает абстрактный Unix-сокет
+"\\0cliphistory-ui-<uid>" (освобождается ядром вместе с процессом),
+повторный запуск или хоткей передают ему команду вместо старта копии.
+"""
+
+import json
+import os
+import select
+import socket
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+READY_FD_ENV = 'CLIPHISTORY_READY_FD'
+
+
+def socket_path():
+    """Путь к управляющему сокету демона"""
+    return Path.home() / '.cache' / 'cliphistory' / 'daemon.sock'
+
+
+def send_command(cmd, timeout=1.0, **params):
+    """Отправить команду демону и вернуть ответ (dict).
+
+    Бросает OSError, если демон не запущен или не ответил.
+    """
+    request = dict(params, cmd=cmd)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(socket_path()))
+        sock.sendall(json.dumps(request).encode() + b'\n')
+
+        reader = sock.makefile('rb')
+        line = reader.readline()
+        if not line:
+            raise ConnectionError('демон закрыл соединение без ответа')
+        return json.loads(line)
+
+
+def ping(timeout=0.3):
+    """True, если демон жив и отвечает на управляющем сокете"""
+    try:
+        return bool(send_command('ping', timeout=timeout).get('ok'))
+    except (OSError, ValueError):
+        return False
+
+
+def start_daemon(command, timeout=3.0):
+    """Запустить демон и дождаться его сообщения о готовности.
+
+    Возвращает True, если демон сообщил "ready" не позже timeout секунд.
+    False - таймаут или демон завершился, не став готовым (например,
+    его уже успел запустить кто-то другой).
+    """
+    read_fd, write_fd = os.pipe()
+    try:
+        subprocess.Popen(
+            command,
+            env=dict(os.environ, **{READY_FD_ENV: str(write_fd)}),
+            pass_fds=(write_fd,),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+    finally:
+        os.close(write_fd)
+
+    try:
+        deadline = time.monotonic() + timeout
+        message = b''
+        while b'\n' not in message:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select([read_fd], [], [], remaining)
+            if not readable:
+                return False
+            chunk = os.read(read_fd, 64)
+            if not chunk:
+                return False  # Демон закрыл pipe, не сообщив о готовности
+            message += chunk
+        return message.startswith(b'ready')
+    finally:
+        os.close(read_fd)
+
+
+def notify_ready():
+    """Сообщить запустившему процессу о готовности (если он ждёт)"""
+    fd = os.environ.pop(READY_FD_ENV, None)
+    if fd is None:
+        return
+    try:
+        fd = int(fd)
+        os.write(fd, b'ready\n')
+        os.close(fd)
+    except (OSError, ValueError):
+        pass
+
+
+class ControlServer:
+    """Сервер управляющего сокета (работает в отдельном потоке).
+
+    handlers: {"cmd": callable(request) -> dict}. Исключение обработчика
+    возвращается клиенту как {"ok": false, "error": ...}.
+    """
+
+    def __init__(self, handlers, debug=False):
+        self.handlers = handlers
+        self.debug = debug
+        self.path = socket_path()
+        self.sock = None
+
+    def start(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(str(self.path))
+        os.chmod(self.path, 0o600)
+        self.sock.listen(8)
+
+        threading.Thread(target=self.serve_forever, name='control', daemon=True).start()
+
+    def serve_forever(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return  # Сокет закрыт
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn):
+        with conn:
+            try:
+                conn.settimeout(5.0)
+                line = conn.makefile('rb').readline()
+                if not line:
+                    return
+                request = json.loads(line)
+                handler = self.handlers.get(request.get('cmd'))
+                if handler is None:
+                    response = {'ok': False, 'error': f"неизвестная команда: {request.get('cmd')}"}
+                else:
+                    response = handler(request)
+            except Exception as e:
+                if self.debug:
+                    print(f"Ошибка управляющего сокета: {e}")
+                response = {'ok': False, 'error': str(e)}
+            try:
+                conn.sendall(json.dumps(response).encode() + b'\n')
+            except OSError:
+                pass
+
+    def stop(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def ui_socket_address():
+    """Абстрактный адрес сокета единственного экземпляра UI"""
+    return f'\0cliphistory-ui-{os.getuid()}'
+
+
+def notify_ui(cmd, timeout=0.2):
+    """Передать команду ("show", "toggle") запущенному UI.
+
+    Возвращает False, если UI не запущен.
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(ui_socket_address())
+            sock.sendall(json.dumps({'cmd': cmd}).encode() + b'\n')
+        return True
+    except OSError:
+        return False
+
+
+class SingleInstance:
+    """Захват сокета единственного экземпляра UI.
+
+    acquire() возвращает False, если адрес уже занят живым экземпляром.
+    Входящие команды читаются через read_command() по готовности fileno().
+    """
+
+    def __init__(self):
+        self.sock = None
+
+    def acquire(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.bind(ui_socket_address())
+        except OSError:
+            sock.close()
+            return False
+        sock.listen(8)
+        self.sock = sock
+        return True
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def read_command(self, timeout=0.2):
+        """Принять одно соединение и вернуть команду (или None)"""
+        try:
+            conn, _ = self.sock.accept()
+        except OSError:
+            return None
+        with conn:
+            try:
+                conn.settimeout(timeout)
+                line = conn.makefile('rb').readline()
+                return json.loads(line).get('cmd')
+            except (OSError, ValueError):
+                return None
+
+    def release(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
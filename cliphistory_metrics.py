@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+ClipHistory - замеры стадий демона
+
+Таймеры на monotonic-часах собираются в логарифмические гистограммы
+(p50/p95/p99 с точностью ~5%) и счётчики. Снимок доступен командой
+`cliphistory stats` (socket-команда "stats") и периодически пишется в
+~/.cache/cliphistory/stats.json.
+
+Выключенные метрики (по умолчанию) - общий пустой контекст-менеджер
+и пустые методы: одна проверка атрибута на стадию.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+
+# Шаг логарифмических корзин гистограммы (границы растут в 1.1 раза)
+BUCKET_GROWTH = 1.1
+_LOG_GROWTH = math.log(BUCKET_GROWTH)
+
+
+class Histogram:
+    """Гистограмма длительностей в логарифмических корзинах (мкс)"""
+
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        us = seconds * 1e6
+        index = int(math.log(us) / _LOG_GROWTH) if us > 1 else 0
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        """Верхняя граница корзины, в которую попал p-й перцентиль (сек)"""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(BUCKET_GROWTH ** (index + 1) / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(50) * 1000, 3),
+            'p95_ms': round(self.percentile(95) * 1000, 3),
+            'p99_ms': round(self.percentile(99) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3),
+        }
+
+
+class _StageTimer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.monotonic() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """Гистограммы стадий и счётчики.
+
+    with metrics.timer('db_insert'): ...
+    metrics.observe('hotkey_to_ui', seconds)
+    metrics.incr('captures')
+    """
+
+    def __init__(self, enabled=False, stats_path=None, flush_interval=60):
+        self.enabled = enabled
+        self.stats_path = stats_path
+        self.flush_interval = flush_interval
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+
+    def timer(self, stage):
+        if not self.enabled:
+            return NULL_TIMER
+        return _StageTimer(self, stage)
+
+    def observe(self, stage, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram()
+            histogram.add(seconds)
+
+    def incr(self, name, n=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'enabled': self.enabled,
+                'uptime_s': round(time.time() - self.started, 1),
+                'counters': dict(self.counters),
+                'stages': {stage: histogram.summary() for stage, histogram in sorted(self.stages.items())},
+            }
+
+    def flush(self):
+        """Атомарно записать снимок в stats.json"""
+        if not (self.enabled and self.stats_path):
+            return
+        tmp_path = f'{self.stats_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, self.stats_path)
+
+    def start_flusher(self):
+        """Поток периодической записи stats.json"""
+        if not (self.enabled and self.stats_path):
+            return
+
+        def flush_loop():
+            while True:
+                time.sleep(self.flush_interval)
+                try:
+                    self.flush()
+                except OSError:
+                    pass
+
+        threading.Thread(target=flush_loop, name='metrics', daemon=True).start()
+
+
+def format_stats(stats):
+    """Текстовая таблица снимка для `cliphistory stats`"""
+    if not stats.get('enabled'):
+        return 'Метрики выключены: "metrics": true в config.json и перезапуск демона'
+
+    lines = [f"Аптайм: {stats['uptime_s']:.0f} с", '']
+    lines.append(f"{'стадия':<16} {'кол-во':>8} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'max, мс':>9}")
+    for stage, s in stats['stages'].items():
+        lines.append(f"{stage:<16} {s['count']:>8} {s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} "
+                     f"{s['p99_ms']:>9.2f} {s['max_ms']:>9.2f}")
+    if stats['counters']:
+        lines.append('')
+        for name, value in sorted(stats['counters'].items()):
+            lines.append(f'{name:<16} {value:>8}')
+    poller = stats.get('poller')
+    if poller:
+        lines.append('')
+        lines.append(f"Опрос: {poller['polls']} опросов, {poller['captures']} захватов, "
+                     f"{poller['polls_per_capture'] or '-'} опросов/захват, интервал {poller['interval']} с")
+    return '\n'.join(lines)
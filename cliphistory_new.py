@@ -4,34 +4,47 @@ ClipHistory - Универсальный менеджер истории буф
 Рефакторенная версия с чёткой архитектурой
 """
 
+import sys
+
+from cliphistory_cli import COMMANDS as CLI_COMMANDS, main as cli_main
+
+# list/search/get/restore - запросы к истории без демона и Qt (cliphistory_cli.py).
+# До импорта Xlib и модулей демона: их предупреждения не должны попасть
+# в вывод, который читают rofi/dmenu, а запуск остаётся быстрым
+if __name__ == '__main__' and len(sys.argv) > 1 and sys.argv[1] in CLI_COMMANDS:
+    sys.exit(cli_main(sys.argv[1:], prog='cliphistory'))
+
+import argparse
 import subprocess
 import time
 import json
-import sqlite3
 import hashlib
+import operator
 import threading
 import signal
-import sys
+import os
+import select
 from pathlib import Path
 from datetime import datetime, timedelta
 
-try:
-    from PyQt5.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QAction
-    from PyQt5.QtGui import QIcon, QPixmap, QPainter
-    from PyQt5.QtCore import Qt, QByteArray
-    from PyQt5.QtSvg import QSvgRenderer
-    PYQT_AVAILABLE = True
-except ImportError:
-    PYQT_AVAILABLE = False
+from cliphistory_blobs import CODEC_SUFFIXES, ZSTD_AVAILABLE, BlobView, default_codec, maybe_compress
+from cliphistory_ipc import ControlServer, notify_ready, notify_ui, ping, send_command
+from cliphistory_metrics import Metrics, format_stats
+from cliphistory_profiling import ProfilingHooks
+from cliphistory_recent import RecentCache
+from cliphistory_storage import item_from_row, open_storage
+from cliphistory_tiers import TierMigrator
+from cliphistory_trace import TraceRecorder, traces_dir
 
 try:
-    from Xlib import X, XK, display
+    from Xlib import X, XK, Xatom, display
     from Xlib.ext import record
     from Xlib.protocol import rq
+    from Xlib.protocol import event as xevent
     XLIB_AVAILABLE = True
 except ImportError:
     XLIB_AVAILABLE = False
-    print("⚠️  python-xlib не установлен: pip3 install python-xlib")
+    print("⚠️  python-xlib не установлен: pip3 install python-xlib", file=sys.stderr)
 
 # Приоритет MIME типов
 MIME_PRIORITY = [
@@ -40,13 +53,122 @@ MIME_PRIORITY = [
     'text/html', 'text/uri-list',
 ]
 
+# Текстовые цели, которые предлагаются вместе с сохранённым MIME текста
+TEXT_TARGETS = ['UTF8_STRING', 'text/plain;charset=utf-8', 'text/plain', 'STRING', 'TEXT']
+
+# Ограничение длины готового к показу превью (символов)
+DISPLAY_MAX_CHARS = 500
+
+# Длина preview в БД; текст длиннее хранится целиком в блобе text/
+PREVIEW_CHARS = 200
+
+# Строка окна истории (как в команде "recent") из Item
+HISTORY_ROW = operator.attrgetter('id', 'mime_type', 'content_path', 'preview', 'pinned', 'timestamp', 'display')
+
+
+def make_display_preview(text, max_lines, max_chars=DISPLAY_MAX_CHARS):
+    """Подготовить текст превью для UI один раз при захвате.
+    
+    Нормализует пробелы (табы и повторы схлопываются, пустые строки по
+    краям убираются, серии пустых строк сводятся к одной) и оставляет
+    не больше max_lines строк. Длинный текст не разбивается целиком:
+    строка режется до нормализации, чтение останавливается на max_chars.
+    """
+    lines = []
+    blank = False
+    start = 0
+    chars = 0
+    length = len(text)
+    while start <= length and len(lines) < max_lines:
+        end = text.find('\n', start)
+        if end == -1:
+            end = length
+        # Длинная строка режется до нормализации: запас на схлопнутые пробелы
+        cut = min(end, start + max_chars * 2)
+        line = ' '.join(text[start:cut].split())
+        start = end + 1
+        
+        if not line:
+            if lines and not blank:
+                lines.append('')
+                chars += 1
+            blank = True
+            continue
+        blank = False
+        lines.append(line)
+        chars += len(line) + 1
+        if chars > max_chars or cut < end:
+            break
+    
+    while lines and not lines[-1]:
+        lines.pop()
+    return '\n'.join(lines)[:max_chars]
+
+
+class AdaptivePoller:
+    """Планировщик опроса буфера через xclip.
+    
+    После активности (захват, хоткей, запуск UI) опрашивает с минимальным
+    интервалом в течение boost_seconds, затем в простое увеличивает
+    интервал в backoff раз до максимума. poke() из любого потока сразу
+    прерывает текущее ожидание.
+    """
+    
+    def __init__(self, min_interval, max_interval, boost_seconds, backoff=1.5):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.boost_seconds = boost_seconds
+        self.backoff = backoff
+        
+        self.interval = min_interval
+        self.boost_until = time.monotonic() + boost_seconds
+        self.wakeup = threading.Event()
+        
+        # Счётчики для настройки энергопотребления
+        self.polls = 0
+        self.captures = 0
+        self.pokes = 0
+    
+    def poke(self):
+        """Активность пользователя: вернуться к частому опросу"""
+        self.pokes += 1
+        self.boost_until = time.monotonic() + self.boost_seconds
+        self.interval = self.min_interval
+        self.wakeup.set()
+    
+    def record_poll(self, captured):
+        """Учесть выполненный опрос; captured - появился новый элемент"""
+        self.polls += 1
+        if captured:
+            self.captures += 1
+            self.boost_until = time.monotonic() + self.boost_seconds
+        
+        if time.monotonic() < self.boost_until:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+    
+    def wait(self):
+        """Спать до следующего опроса (или до poke)"""
+        self.wakeup.wait(self.interval)
+        self.wakeup.clear()
+    
+    def stats(self):
+        return {
+            'polls': self.polls,
+            'captures': self.captures,
+            'pokes': self.pokes,
+            'polls_per_capture': round(self.polls / self.captures, 1) if self.captures else None,
+            'interval': round(self.interval, 3),
+        }
+
 
 class ClipboardMonitor:
     """Мониторинг буфера обмена и сохранение истории"""
     
-    def __init__(self, config):
+    def __init__(self, config, cache_dir=None):
         self.config = config
-        self.cache_dir = Path.home() / '.cache' / 'cliphistory'
+        self.cache_dir = Path(cache_dir) if cache_dir else Path.home() / '.cache' / 'cliphistory'
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         
         self.images_dir = self.cache_dir / 'images'
@@ -55,45 +177,60 @@ class ClipboardMonitor:
         self.other_dir = self.cache_dir / 'other'
         self.other_dir.mkdir(exist_ok=True)
         
+        self.text_dir = self.cache_dir / 'text'
+        self.text_dir.mkdir(exist_ok=True)
+        
+        # Сжатие блобов текста и other/: "auto" - zstd, если установлен, иначе zlib
+        codec = config.get('compression', 'auto')
+        if codec == 'auto' or (codec == 'zstd' and not ZSTD_AVAILABLE):
+            codec = default_codec()
+        self.compression = None if codec == 'none' else codec
+        self.compression_level = config.get('compression_level')
+        self.compress_min_bytes = config.get('compress_min_bytes', 4096)
+        
         self.db_path = self.cache_dir / 'history.db'
+        # Метаданные элементов (cliphistory_storage): "storage" в config.json
+        self.storage = open_storage(config, self.cache_dir)
+        # Начало списка окна в памяти (команда "recent"); 0 - выключено
+        recent_items = config.get('recent_cache_items', 200)
+        self.recent = RecentCache(recent_items) if recent_items > 0 else None
         self.last_content_hash = None
+        self.selection_owner = None
+        self.profiling = None
+        self.metrics = Metrics()  # Демон подставляет включённые метрики
+        self.stopped = False
+        # Перенос в архив (cliphistory_tiers.TierMigrator); None - очистка удаляет
+        self.tiers = None
+        
+        # Запись трассы (cliphistory_trace.TraceRecorder) и цели последнего чтения
+        self.trace = None
+        self.last_targets = []
+        # Часы меток времени и срока хранения; реплей трассы подставляет виртуальные
+        self.clock = time.time
+        
+        min_interval = config.get('poll_min_interval', config.get('check_interval', 0.3))
+        self.poller = AdaptivePoller(
+            min_interval,
+            config.get('poll_max_interval', 2.0),
+            config.get('poll_boost_seconds', 5.0)
+        )
         self.init_db()
     
     def init_db(self):
-        """Инициализация БД с миграцией"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp REAL,
-                mime_type TEXT,
-                content_path TEXT,
-                preview TEXT,
-                hash TEXT UNIQUE
-            )
-        ''')
-        
-        # Миграция: добавляем pinned если нет
-        cursor.execute("PRAGMA table_info(items)")
-        columns = [col[1] for col in cursor.fetchall()]
-        if 'pinned' not in columns:
-            cursor.execute('ALTER TABLE items ADD COLUMN pinned INTEGER DEFAULT 0')
-            if self.config.get('debug'):
-                print("✓ Добавлена колонка 'pinned'")
-        
-        conn.commit()
-        conn.close()
+        """Создание хранилища и миграция старых записей"""
+        max_lines = self.config.get('text_max_lines', 6)
+        self.storage.init(lambda text: make_display_preview(text, max_lines))
     
     def get_clipboard(self):
         """Получить содержимое буфера обмена с определением MIME"""
         try:
-            result = subprocess.run(
-                ['xclip', '-selection', 'clipboard', '-t', 'TARGETS', '-o'],
-                capture_output=True, text=True, timeout=1
-            )
+            with self.metrics.timer('xclip_targets'):
+                result = subprocess.run(
+                    ['xclip', '-selection', 'clipboard', '-t', 'TARGETS', '-o'],
+                    capture_output=True, text=True, timeout=1
+                )
             available_types = result.stdout.strip().split('\n')
+            self.last_targets = available_types
             
             # Выбираем лучший MIME тип
             mime_type = None
@@ -109,10 +246,11 @@ class ClipboardMonitor:
                 return None, None
             
             # Получаем контент
-            result = subprocess.run(
-                ['xclip', '-selection', 'clipboard', '-t', mime_type, '-o'],
-                capture_output=True, timeout=1
-            )
+            with self.metrics.timer('xclip_read'):
+                result = subprocess.run(
+                    ['xclip', '-selection', 'clipboard', '-t', mime_type, '-o'],
+                    capture_output=True, timeout=1
+                )
             
             return mime_type, result.stdout
         except Exception as e:
@@ -126,131 +264,424 @@ class ClipboardMonitor:
             return
         
         # Хеш для дедупликации
-        content_hash = hashlib.md5(content).hexdigest()
+        with self.metrics.timer('hash'):
+            content_hash = hashlib.md5(content).hexdigest()
+        trace = self.trace
+        if trace:
+            trace.capture(self.last_targets, mime_type, len(content), content_hash)
         if content_hash == self.last_content_hash:
+            self.metrics.incr('unchanged')
             return
         
         self.last_content_hash = content_hash
+        self.metrics.incr('captures')
+        self.metrics.incr('captured_bytes', len(content))
         
-        # Обработка по типу
-        if mime_type.startswith('image/'):
-            self._save_image(mime_type, content, content_hash)
-        elif mime_type.startswith('text/'):
-            self._save_text(mime_type, content, content_hash)
-        else:
-            self._save_other(mime_type, content, content_hash)
-    
-    def _save_text(self, mime_type, content, content_hash):
-        """Сохранить текст"""
         try:
-            text = content.decode('utf-8', errors='ignore')
-            preview = text[:200]
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT OR IGNORE INTO items (timestamp, mime_type, content_path, preview, hash)
-                VALUES (?, ?, NULL, ?, ?)
-            ''', (time.time(), mime_type, preview, content_hash))
-            conn.commit()
-            conn.close()
+            row = self.prepare_item(mime_type, content, content_hash)
+            with self.metrics.timer('db_insert'):
+                item_id = self.storage.put(row)
+            if item_id is not None and self.recent:
+                self.recent.update(item_from_row(item_id, row))
         except Exception as e:
             if self.config.get('debug'):
-                print(f"Ошибка сохранения текста: {e}")
+                print(f"Ошибка сохранения ({mime_type}): {e}")
     
-    def _save_image(self, mime_type, content, content_hash):
-        """Сохранить изображение"""
-        try:
+    def prepare_item(self, mime_type, content, content_hash, timestamp=None):
+        """Записать блоб (если нужен) и вернуть строку для Storage.put.
+        
+        Короткий текст хранится в БД, длинный - целиком в text/, изображения
+        и прочие типы - в images/ и other/. Файл с тем же хешем уже есть -
+        не перезаписывается. Используется и при захвате, и импортом
+        (cliphistory_import).
+        """
+        if timestamp is None:
+            timestamp = self.clock()
+        max_lines = self.config.get('text_max_lines', 6)
+        
+        if mime_type.startswith('image/'):
+            # PNG/JPEG уже сжаты - пишем как есть
             ext = '.png' if 'png' in mime_type else '.jpg'
             file_path = self.images_dir / f"{content_hash}{ext}"
-            
-            with open(file_path, 'wb') as f:
-                f.write(content)
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT OR IGNORE INTO items (timestamp, mime_type, content_path, preview, hash)
-                VALUES (?, ?, ?, '', ?)
-            ''', (time.time(), mime_type, str(file_path), content_hash))
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            if self.config.get('debug'):
-                print(f"Ошибка сохранения изображения: {e}")
+            if not file_path.exists():
+                with self.metrics.timer('file_write'):
+                    with open(file_path, 'wb') as f:
+                        f.write(content)
+            return (timestamp, mime_type, str(file_path), '', content_hash, None, None, len(content))
+        
+        if mime_type.startswith('text/'):
+            text = content.decode('utf-8', errors='ignore')
+            preview = text[:PREVIEW_CHARS]
+            display = make_display_preview(text, max_lines)
+            if len(text) <= PREVIEW_CHARS:
+                return (timestamp, mime_type, None, preview, content_hash, display, None, None)
+            directory = self.text_dir
+        else:
+            text = content[:DISPLAY_MAX_CHARS * 4].decode('utf-8', errors='ignore')
+            preview = text[:PREVIEW_CHARS]
+            display = make_display_preview(text, max_lines)
+            directory = self.other_dir
+        
+        file_path, codec = self.write_blob(directory, content_hash, content)
+        return (timestamp, mime_type, str(file_path), preview, content_hash, display, codec, len(content))
     
-    def _save_other(self, mime_type, content, content_hash):
-        """Сохранить другие типы"""
-        try:
-            file_path = self.other_dir / content_hash
+    def write_blob(self, directory, content_hash, content):
+        """Записать блоб, сжимая крупные; вернуть (путь, кодек или None)"""
+        for codec in (None, *CODEC_SUFFIXES):
+            file_path = directory / (content_hash + CODEC_SUFFIXES.get(codec, ''))
+            if file_path.exists():
+                return file_path, codec
+        
+        codec = None
+        data = content
+        if self.compression and len(content) >= self.compress_min_bytes:
+            with self.metrics.timer('compress'):
+                codec, data = maybe_compress(content, self.compression, self.compression_level)
+        
+        file_path = directory / (content_hash + CODEC_SUFFIXES.get(codec, ''))
+        with self.metrics.timer('file_write'):
             with open(file_path, 'wb') as f:
-                f.write(content)
-            
-            preview = content.decode('utf-8', errors='ignore')[:200]
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT OR IGNORE INTO items (timestamp, mime_type, content_path, preview, hash)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (time.time(), mime_type, str(file_path), preview, content_hash))
-            conn.commit()
-            conn.close()
-        except Exception as e:
-            if self.config.get('debug'):
-                print(f"Ошибка сохранения: {e}")
+                f.write(data)
+        return file_path, codec
+    
+    def restore_item(self, item_id):
+        """Восстановить элемент истории в CLIPBOARD через SelectionOwner"""
+        if not (self.selection_owner and self.selection_owner.display):
+            return False
+        
+        item = self.storage.get(item_id)
+        if item is None:
+            # Элемент в архиве: восстановленный снова становится свежим
+            hot_id = self.storage.promote(item_id, timestamp=self.clock())
+            if hot_id is not None:
+                item = self.storage.get(hot_id)
+                if item is not None and self.recent:
+                    self.recent.update(item)
+        if item is None:
+            return False
+        
+        mime_type, content_hash = item.mime_type, item.hash
+        if item.content_path:
+            # Данные отдаются прямо из mmap блоба, без чтения в память
+            content = BlobView(item.content_path)
+        else:
+            content = item.preview.encode('utf-8')
+        
+        # Собственное восстановление не должно попасть в историю как новое
+        self.last_content_hash = content_hash
+        trace = self.trace
+        if trace:
+            trace.restore(mime_type, len(content), content_hash)
+        with self.metrics.timer('restore'):
+            return self.selection_owner.serve(mime_type, content, content_hash)
+    
+    def stale_items(self):
+        """Незакреплённые элементы, вытесняемые из горячей истории: старше
+        cleanup_days или сверх лимитов по типам"""
+        days = self.config.get('cleanup_days', 7)
+        cutoff = self.clock() - (days * 24 * 3600)
+        limits = {'text/': self.config.get('max_text_items', 50),
+                  'image/': self.config.get('max_image_items', 50)}
+        return self.storage.stale_items(cutoff, limits)
+    
+    def recent_page(self, limit, offset=0, reload=False):
+        """Страница окна истории: из памяти, если она есть в кэше"""
+        if self.recent is None:
+            return [list(HISTORY_ROW(item)) for item in self.storage.list_page(limit, offset)], False
+        if reload or not self.recent.loaded:
+            self.recent.load(self.storage)
+        rows = self.recent.page(limit, offset)
+        if rows is None:
+            # Префикс укоротили удаления - перечитываем
+            self.recent.load(self.storage)
+            rows = self.recent.page(limit, offset)
+        if rows is None:
+            # Дальше кэша (offset за его ёмкостью) - прямо из хранилища
+            return [list(HISTORY_ROW(item)) for item in self.storage.list_page(limit, offset)], False
+        return rows, True
+    
+    def delete_item(self, item_id):
+        """Удалить элемент по команде окна; вернуть удалённый Item или None.
+        
+        Закреплённый не удаляется (ValueError). Элемента нет в горячей
+        истории - удаляется из архива.
+        """
+        item = self.storage.get(item_id)
+        if item and item.pinned == 1:
+            raise ValueError(f'элемент {item_id} закреплён')
+        
+        item = self.storage.delete(item_id)
+        if item is None:
+            deleted = self.storage.delete_cold(item_id)
+        else:
+            deleted = True
+            if item.content_path:
+                Path(item.content_path).unlink(missing_ok=True)
+        if deleted and self.recent:
+            self.recent.discard([item_id])
+        return item
+    
+    def pin_item(self, item_id, pinned):
+        """Закрепить/открепить по команде окна; False - элемента нет"""
+        updated = self.storage.pin(item_id, pinned)
+        if not updated and pinned:
+            # Элемент из архива: закреплённые живут в горячей истории
+            item_id = self.storage.promote(item_id, pinned=1)
+            updated = item_id is not None
+        if updated and self.recent:
+            item = self.storage.get(item_id)
+            if item is not None:
+                self.recent.update(item)
+        return updated
     
     def cleanup_old(self):
         """Очистка старых элементов"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            days = self.config.get('cleanup_days', 7)
-            cutoff = time.time() - (days * 24 * 3600)
-            
-            # Удаляем незакрепленные старые элементы
-            cursor.execute('SELECT content_path FROM items WHERE timestamp < ? AND pinned = 0', (cutoff,))
-            for (path,) in cursor.fetchall():
-                if path and Path(path).exists():
-                    Path(path).unlink()
-            
-            cursor.execute('DELETE FROM items WHERE timestamp < ? AND pinned = 0', (cutoff,))
-            
-            # Лимиты по типам
-            for mime_prefix, max_items in [('text/', 'max_text_items'), ('image/', 'max_image_items')]:
-                limit = self.config.get(max_items, 50)
-                cursor.execute(f'''
-                    DELETE FROM items WHERE id IN (
-                        SELECT id FROM items 
-                        WHERE mime_type LIKE ? AND pinned = 0
-                        ORDER BY timestamp DESC 
-                        LIMIT -1 OFFSET ?
-                    )
-                ''', (f'{mime_prefix}%', limit))
-            
-            conn.commit()
-            conn.close()
+            stale = self.stale_items()
+            if self.tiers:
+                # Вытесненные элементы переносит в архив фоновый поток
+                if stale:
+                    self.tiers.wake()
+            else:
+                # Файлы удаляются после удаления записей
+                deleted = self.storage.delete_many([item.id for item in stale])
+                if deleted and self.recent:
+                    self.recent.discard([item.id for item in deleted])
+                for item in deleted:
+                    if item.content_path:
+                        Path(item.content_path).unlink(missing_ok=True)
+                self.remove_thumbnails(item.hash for item in deleted if item.mime_type.startswith('image/'))
         except Exception as e:
             if self.config.get('debug'):
                 print(f"Ошибка очистки: {e}")
     
+    def remove_thumbnails(self, image_hashes):
+        """Миниатюры UI (thumbs/<hash>-WxH@scale.png) удалённых изображений"""
+        thumbs_dir = self.cache_dir / 'thumbs'
+        for image_hash in image_hashes:
+            for thumb in thumbs_dir.glob(f'{image_hash}-*.png'):
+                thumb.unlink(missing_ok=True)
+    
+    def sweep_thumbnails(self):
+        """Полный проход по thumbs/: миниатюры без элемента в истории.
+        
+        Обходит всё хранилище, поэтому только при старте; дальше очистка
+        удаляет миниатюры своих элементов по хешу.
+        """
+        thumbs_dir = self.cache_dir / 'thumbs'
+        if not thumbs_dir.exists():
+            return
+        try:
+            alive = {item.hash for item in self.storage.iterate() if item.content_path}
+            for thumb in thumbs_dir.glob('*.png'):
+                if thumb.name.split('-', 1)[0] not in alive:
+                    thumb.unlink(missing_ok=True)
+        except Exception as e:
+            if self.config.get('debug'):
+                print(f"Ошибка очистки миниатюр: {e}")
+    
     def monitor_loop(self):
         """Основной цикл мониторинга"""
-        interval = self.config.get('check_interval', 0.3)
-        cleanup_counter = 0
+        cleanup_interval = 30
+        next_cleanup = time.monotonic() + cleanup_interval
         
-        while True:
-            mime_type, content = self.get_clipboard()
-            if mime_type and content:
-                self.save_to_history(mime_type, content)
+        while not self.stopped:
+            if self.profiling:
+                self.profiling.checkpoint()
+            
+            captured = False
+            # Пока буфером владеет сам демон (восстановление), читать нечего
+            if not (self.selection_owner and self.selection_owner.is_owner):
+                with self.metrics.timer('poll'):
+                    mime_type, content = self.get_clipboard()
+                    if mime_type and content:
+                        previous_hash = self.last_content_hash
+                        self.save_to_history(mime_type, content)
+                        captured = self.last_content_hash != previous_hash
+            self.poller.record_poll(captured)
             
-            cleanup_counter += 1
-            if cleanup_counter >= 100:  # Каждые 30 секунд
-                self.cleanup_old()
-                cleanup_counter = 0
+            if time.monotonic() >= next_cleanup:
+                with self.metrics.timer('cleanup'):
+                    self.cleanup_old()
+                next_cleanup = time.monotonic() + cleanup_interval
+                if self.config.get('debug'):
+                    print(f"📊 Опрос буфера: {self.poller.stats()}")
             
-            time.sleep(interval)
+            self.poller.wait()
+    
+    def stop(self):
+        """Завершить monitor_loop после текущего опроса"""
+        self.stopped = True
+        self.poller.wakeup.set()
+
+
+class SelectionOwner:
+    """Владение CLIPBOARD самим демоном при восстановлении элемента.
+    
+    Вместо передачи данных в xclip демон сам становится владельцем
+    выделения и отвечает на SelectionRequest сохранённым представлением
+    (большие элементы - по протоколу INCR). Пока демон владеет буфером,
+    ClipboardMonitor не читает и не хеширует его содержимое.
+    """
+    
+    def __init__(self, config):
+        self.config = config
+        self.display = None
+        self.window = None
+        self.requests = []
+        self.profiling = None
+        self.lock = threading.Lock()
+        self.wake_r, self.wake_w = os.pipe()
+        
+        # Текущее содержимое: {target atom: bytes}, и активные INCR-передачи
+        self.targets = {}
+        self.blob = None
+        self.content_hash = None
+        self.owned = threading.Event()
+        self.transfers = {}
+    
+    @property
+    def is_owner(self):
+        return self.owned.is_set()
+    
+    def start(self):
+        """Подключиться к X и запустить поток обработки событий"""
+        if not XLIB_AVAILABLE:
+            return False
+        try:
+            self.display = display.Display()
+            screen = self.display.screen()
+            self.window = screen.root.create_window(0, 0, 1, 1, 0, screen.root_depth,
+                                                    event_mask=X.PropertyChangeMask)
+            self.atom = self.display.intern_atom
+            self.clipboard = self.atom('CLIPBOARD')
+            self.targets_atom = self.atom('TARGETS')
+            self.incr_atom = self.atom('INCR')
+            # Размер одного куска: не больше четверти максимального запроса X
+            max_request = self.display.display.info.max_request_length * 4
+            self.chunk_size = min(256 * 1024, max_request // 4)
+            self.display.flush()
+        except Exception as e:
+            print(f"⚠️  Владение буфером недоступно: {e}")
+            return False
+        
+        threading.Thread(target=self.event_loop, name='selection', daemon=True).start()
+        return True
+    
+    def serve(self, mime_type, content, content_hash, timeout=0.5):
+        """Стать владельцем CLIPBOARD с данным содержимым.
+        
+        content - bytes или BlobView (закрывается при потере владения).
+        Вызывается из других потоков; ждёт, пока X-поток захватит выделение.
+        """
+        self.owned.clear()
+        with self.lock:
+            self.requests.append((mime_type, content, content_hash))
+        os.write(self.wake_w, b'x')
+        return self.owned.wait(timeout)
+    
+    def event_loop(self):
+        while True:
+            if self.profiling:
+                self.profiling.checkpoint()
+            try:
+                readable, _, _ = select.select([self.display.fileno(), self.wake_r], [], [])
+                if self.wake_r in readable:
+                    os.read(self.wake_r, 64)
+                    self._take_ownership()
+                while self.display.pending_events():
+                    self._handle_event(self.display.next_event())
+            except Exception as e:
+                if self.config.get('debug'):
+                    print(f"Ошибка владения буфером: {e}")
+    
+    def _take_ownership(self):
+        with self.lock:
+            if not self.requests:
+                return
+            mime_type, content, content_hash = self.requests.pop()
+            # Вытесненные запросы уже не понадобятся
+            for _, stale, _ in self.requests:
+                if isinstance(stale, BlobView):
+                    stale.close()
+            self.requests.clear()
+        
+        self._release()
+        if isinstance(content, BlobView):
+            self.blob = content
+            data = content.view
+        else:
+            data = content
+        
+        names = [mime_type]
+        if mime_type.startswith('text/') or mime_type in TEXT_TARGETS:
+            names += [name for name in TEXT_TARGETS if name != mime_type]
+        self.targets = {self.atom(name): data for name in names}
+        self.content_hash = content_hash
+        
+        self.window.set_selection_owner(self.clipboard, X.CurrentTime)
+        self.display.flush()
+        if self.display.get_selection_owner(self.clipboard) == self.window:
+            self.owned.set()
+            if self.config.get('debug'):
+                print(f"📋 Демон владеет буфером ({mime_type}, {len(data)} байт)")
+    
+    def _release(self):
+        """Забыть текущее содержимое и закрыть mmap блоба"""
+        self.targets = {}
+        self.transfers.clear()
+        if self.blob is not None:
+            self.blob.close()
+            self.blob = None
+    
+    def _handle_event(self, event):
+        if event.type == X.SelectionRequest:
+            self._handle_request(event)
+        elif event.type == X.SelectionClear:
+            # Буфер забрало другое приложение - снова захватываем его изменения
+            self.owned.clear()
+            self._release()
+        elif event.type == X.PropertyNotify and event.state == X.PropertyDelete:
+            self._continue_incr(event)
+    
+    def _handle_request(self, event):
+        requestor = event.requestor
+        # Устаревшие клиенты передают property = None
+        prop = event.property or event.target
+        
+        if event.target == self.targets_atom:
+            atoms = [self.targets_atom] + list(self.targets)
+            requestor.change_property(prop, Xatom.ATOM, 32, atoms)
+        elif event.target in self.targets:
+            data = self.targets[event.target]
+            if len(data) > self.chunk_size:
+                # INCR: объявляем размер и отдаём куски по PropertyDelete
+                requestor.change_attributes(event_mask=X.PropertyChangeMask)
+                requestor.change_property(prop, self.incr_atom, 32, [len(data)])
+                self.transfers[(requestor.id, prop)] = [requestor, event.target, data, 0]
+            else:
+                requestor.change_property(prop, event.target, 8, bytes(data))
+        else:
+            prop = X.NONE
+        
+        notify = xevent.SelectionNotify(time=event.time, requestor=requestor, selection=event.selection,
+                                        target=event.target, property=prop)
+        requestor.send_event(notify)
+        self.display.flush()
+    
+    def _continue_incr(self, event):
+        transfer = self.transfers.get((event.window.id, event.atom))
+        if transfer is None:
+            return
+        requestor, target, data, offset = transfer
+        chunk = data[offset:offset + self.chunk_size]
+        requestor.change_property(event.atom, target, 8, bytes(chunk))
+        if chunk:
+            transfer[3] = offset + len(chunk)
+        else:
+            # Пустой кусок завершает передачу
+            del self.transfers[(event.window.id, event.atom)]
+        self.display.flush()
 
 
 class HotkeyManager:
@@ -260,49 +691,30 @@ class HotkeyManager:
         self.config = config
         self.script_path = script_path
         self.ui_process = None
+        self.profiling = None
+        self.metrics = Metrics()
+        self.ui_launched_at = None  # monotonic-время последнего запуска UI
         self.display = None
         self.root = None
     
-    def is_ui_running(self):
-        """Проверка запущен ли UI (через lock-файл)"""
-        lock_file = Path.home() / '.cache' / 'cliphistory' / '.ui.lock'
-        
-        if not lock_file.exists():
-            return False
-        
-        # Проверяем что процесс с PID из lock-файла существует
-        try:
-            with open(lock_file) as f:
-                pid = int(f.read().strip())
-            # Проверяем существование процесса
-            import os
-            os.kill(pid, 0)
-            return True  # Процесс существует и окно открыто
-        except (ProcessLookupError, ValueError, FileNotFoundError):
-            # Процесс не существует или файл битый - окно закрыто
-            try:
-                lock_file.unlink()
-            except:
-                pass
-            return False
-        self.keyboards_grabbed = False
-        if self.config.get('debug'):
-            print("🔓 Клавиатуры отпущены")
-    
     def launch_ui(self):
-        """Запустить UI окно"""
-        if self.is_ui_running():
+        """Запустить UI окно (или переключить уже открытое)"""
+        with self.metrics.timer('ui_toggle'):
+            forwarded = notify_ui('toggle')
+        if forwarded:
             if self.config.get('debug'):
-                print("⏭️  UI уже запущен, пропускаем")
+                print("⏭️  UI уже запущен, переключаем")
             return
         
         try:
             ui_script = self.script_path.parent / 'clipshow_qt.py'
-            self.ui_process = subprocess.Popen(
-                ['python3', str(ui_script)],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL
-            )
+            self.ui_launched_at = time.monotonic()
+            with self.metrics.timer('ui_spawn'):
+                self.ui_process = subprocess.Popen(
+                    ['python3', str(ui_script)],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL
+                )
             
             if self.config.get('debug'):
                 print(f"🚀 UI запущен (PID: {self.ui_process.pid})")
@@ -349,6 +761,8 @@ class HotkeyManager:
             print("🎧 Ожидаем нажатия Super+V...")
             while True:
                 event = self.display.next_event()
+                if self.profiling:
+                    self.profiling.checkpoint()
                 
                 # Проверяем статус UI
                 if self.ui_process and self.ui_process.poll() is not None:
@@ -360,8 +774,7 @@ class HotkeyManager:
                     if event.detail == v_keycode and (event.state & X.Mod4Mask):
                         if self.config.get('debug'):
                             print("⌨️  Super+V нажат!")
-                        if not self.is_ui_running():
-                            self.launch_ui()
+                        self.launch_ui()
         
         except Exception as e:
             print(f"❌ Ошибка мониторинга хоткея: {e}")
@@ -445,188 +858,204 @@ class HotkeyManager:
 class ClipHistoryDaemon:
     """Главный класс демона"""
     
-    def __init__(self):
+    def __init__(self, headless=False, trace_path=None):
         self.script_path = Path(__file__).resolve()
         self.config = self.load_config()
+        self.headless = headless
         
         self.clipboard_monitor = ClipboardMonitor(self.config)
         self.hotkey_manager = HotkeyManager(self.config, self.script_path)
+        self.selection_owner = SelectionOwner(self.config)
+        self.metrics = Metrics(
+            enabled=self.config.get('metrics', False),
+            stats_path=self.clipboard_monitor.cache_dir / 'stats.json',
+            flush_interval=self.config.get('metrics_flush_interval', 60)
+        )
+        self.clipboard_monitor.metrics = self.metrics
+        self.hotkey_manager.metrics = self.metrics
+        
+        self.profiling = ProfilingHooks('daemon', debug=self.config.get('debug'))
+        self.clipboard_monitor.profiling = self.profiling
+        self.hotkey_manager.profiling = self.profiling
+        self.selection_owner.profiling = self.profiling
+        
+        self.control_server = ControlServer({
+            'ping': self.handle_ping,
+            'poll_stats': self.handle_poll_stats,
+            'stats': self.handle_stats,
+            'ui_ready': self.handle_ui_ready,
+            'profile': self.handle_profile,
+            'memory': self.handle_memory,
+            'restore': self.handle_restore,
+            'recent': self.handle_recent,
+            'delete': self.handle_delete,
+            'pin': self.handle_pin,
+            'trace': self.handle_trace,
+        }, debug=self.config.get('debug'))
         
-        # Qt приложение для трея
-        self.app = None
-        self.tray_icon = None
-        self.tray_menu = None
+        # Архив вытесненных элементов вместо удаления (archive_months > 0)
+        archive_months = self.config.get('archive_months', 0)
+        if archive_months > 0 and not self.clipboard_monitor.storage.supports_archive:
+            print("⚠️  archive_months работает только с хранилищем sqlite")
+        elif archive_months > 0:
+            self.clipboard_monitor.tiers = TierMigrator(self.clipboard_monitor, archive_months)
+        
+        # Запись трассы событий захвата (--trace или команда "trace")
+        if trace_path:
+            self.clipboard_monitor.trace = TraceRecorder(trace_path)
+        
+        # Иконка в трее (cliphistory_tray, загружается только с Qt)
+        self.tray = None
         
         # Обработчик сигналов для корректного завершения
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
+        self.profiling.install_signals()
+    
+    def handle_ping(self, request):
+        """Команда ping: проверка, что демон жив (UI пингует при запуске)"""
+        self.clipboard_monitor.poller.poke()
+        return {'ok': True, 'pid': os.getpid()}
+    
+    def handle_poll_stats(self, request):
+        """Команда poll_stats: счётчики опроса буфера"""
+        return dict(self.clipboard_monitor.poller.stats(), ok=True)
+    
+    def handle_stats(self, request):
+        """Команда stats: гистограммы стадий, счётчики и опрос буфера"""
+        return dict(self.metrics.snapshot(), poller=self.clipboard_monitor.poller.stats(), ok=True)
+    
+    def handle_ui_ready(self, request):
+        """Команда ui_ready: окно UI отрисовано (startup - сек с запуска процесса UI)"""
+        self.metrics.observe('ui_startup', float(request.get('startup', 0)))
+        launched_at = self.hotkey_manager.ui_launched_at
+        if launched_at is not None:
+            self.hotkey_manager.ui_launched_at = None
+            self.metrics.observe('hotkey_to_ui', time.monotonic() - launched_at)
+        return {'ok': True}
+    
+    def handle_profile(self, request):
+        """Команда profile: action = start | stop | toggle | status"""
+        action = request.get('action', 'toggle')
+        if action not in ('start', 'stop', 'toggle', 'status'):
+            return {'ok': False, 'error': f'неизвестное действие: {action}'}
+        return dict(getattr(self.profiling, action)(), ok=True)
+    
+    def handle_memory(self, request):
+        """Команда memory: снимок tracemalloc (разница с предыдущим)"""
+        return dict(self.profiling.memory_snapshot(), ok=True)
+    
+    def handle_restore(self, request):
+        """Команда restore: сделать элемент содержимым CLIPBOARD"""
+        self.clipboard_monitor.poller.poke()
+        return {'ok': self.clipboard_monitor.restore_item(int(request['id']))}
+    
+    def handle_recent(self, request):
+        """Команда recent: первая страница окна истории из памяти.
+        
+        limit/offset - как у Storage.list_page; reload - перечитать кэш
+        (после записи в историю другим процессом, например импортом).
+        """
+        rows, cached = self.clipboard_monitor.recent_page(int(request.get('limit', 50)),
+                                                           int(request.get('offset', 0)),
+                                                           bool(request.get('reload')))
+        response = {'ok': True, 'items': rows, 'cached': cached}
+        # Без кэша ("recent_cache_items": 0) версии нет: окно сравнивает сигнатуру хранилища
+        if self.clipboard_monitor.recent:
+            response['version'] = self.clipboard_monitor.recent.version
+        return response
+    
+    def handle_delete(self, request):
+        """Команда delete: удалить элемент (окно истории)"""
+        try:
+            item = self.clipboard_monitor.delete_item(int(request['id']))
+        except ValueError as e:
+            return {'ok': False, 'error': str(e)}
+        return {'ok': True, 'content_path': item.content_path if item else None}
+    
+    def handle_pin(self, request):
+        """Команда pin: закрепить (pinned = 1) или открепить элемент"""
+        return {'ok': self.clipboard_monitor.pin_item(int(request['id']), int(request.get('pinned', 1)))}
+    
+    def handle_trace(self, request):
+        """Команда trace: action = start | stop | status, path - файл трассы"""
+        action = request.get('action', 'status')
+        recorder = self.clipboard_monitor.trace
+        if action == 'start':
+            if recorder is None:
+                path = request.get('path') or traces_dir() / f"trace-{time.strftime('%Y%m%d-%H%M%S')}.jsonl.gz"
+                recorder = self.clipboard_monitor.trace = TraceRecorder(path)
+                if self.config.get('debug'):
+                    print(f"🎞️  Запись трассы: {path}")
+        elif action == 'stop':
+            if recorder is not None:
+                self.clipboard_monitor.trace = None
+                recorder.close()
+        elif action != 'status':
+            return {'ok': False, 'error': f'неизвестное действие: {action}'}
+        
+        if recorder is None:
+            return {'ok': True, 'active': False}
+        return dict(recorder.status(), ok=True)
+    
+    def stop_trace(self):
+        """Дописать трассу при завершении"""
+        recorder = self.clipboard_monitor.trace
+        if recorder is not None:
+            self.clipboard_monitor.trace = None
+            recorder.close()
+    
+    def start_services(self):
+        """Запуск владельца выделения и управляющего сокета"""
+        if self.selection_owner.start():
+            self.clipboard_monitor.selection_owner = self.selection_owner
+        self.control_server.start()
+        self.metrics.start_flusher()
+        # Осиротевшие миниатюры - один полный проход в фоне, не в потоке захвата
+        threading.Thread(target=self.clipboard_monitor.sweep_thumbnails, name='thumbs', daemon=True).start()
+        if self.clipboard_monitor.tiers:
+            self.clipboard_monitor.tiers.start()
+        
+        # Сокет принимает соединения - UI, запустивший демон, может продолжать
+        notify_ready()
     
     def _signal_handler(self, signum, frame):
         """Обработка сигналов завершения"""
         print("\n⚠️  Получен сигнал завершения...")
-        if self.app:
-            self.app.quit()
+        self.control_server.stop()
+        self.metrics.flush()
+        self.stop_trace()
+        if self.tray:
+            self.tray.quit()
         sys.exit(0)
     
-    def create_tray_icon(self):
-        """Создать иконку в системном трее"""
-        if not PYQT_AVAILABLE or not QSystemTrayIcon.isSystemTrayAvailable():
-            return False
-        
-        # Определяем тему панели через gsettings
-        is_dark_panel = True  # По умолчанию темная
+    def load_tray(self):
+        """Загрузить трей; Qt импортируется только здесь"""
         try:
-            import subprocess
-            import re
-            result = subprocess.run(
-                ['gsettings', 'get', 'org.cinnamon.desktop.interface', 'gtk-theme'],
-                capture_output=True, text=True, timeout=1
-            )
-            if result.returncode == 0:
-                theme_name = result.stdout.strip().strip("'")
-                theme_path = Path(f'/usr/share/themes/{theme_name}/gtk-3.0/gtk.css')
-                if theme_path.exists():
-                    content = theme_path.read_text()
-                    match = re.search(r'@define-color\s*(?:theme_bg_color|bg_color)\s*#([0-9a-fA-F]{6});', content)
-                    if match:
-                        hex_color = match.group(1)
-                        r, g, b = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-                        is_dark_panel = (r + g + b) / 3 < 128
-        except:
-            pass
-        
-        # Выбираем цвет иконки в зависимости от темы панели
-        icon_color = '#ffffff' if is_dark_panel else '#2b2b2b'
-        
-        # SVG иконка с адаптивным цветом
-        svg_data = f'''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24">
-            <path fill="{icon_color}" d="M19 3H14.82C14.4 1.84 13.3 1 12 1S9.6 1.84 9.18 3H5C3.9 3 3 3.9 3 5V19C3 20.1 3.9 21 5 21H19C20.1 21 21 20.1 21 19V5C21 3.9 20.1 3 19 3M12 3C12.55 3 13 3.45 13 4S12.55 5 12 5 11 4.55 11 4 11.45 3 12 3M7 7H17V5H19V19H5V5H7V7M7 9V11H17V9H7M7 13V15H17V13H7Z" />
-        </svg>'''
-        
-        renderer = QSvgRenderer(QByteArray(svg_data.encode()))
-        pixmap = QPixmap(64, 64)
-        pixmap.fill(Qt.transparent)
-        painter = QPainter(pixmap)
-        renderer.render(painter)
-        painter.end()
-        
-        self.tray_icon = QSystemTrayIcon(QIcon(pixmap))
-        self.tray_icon.setToolTip('ClipHistory - Демон активен')
-        
-        # Меню трея (сохраняем как атрибут!)
-        self.tray_menu = QMenu()
-        
-        # Стиль темного меню
-        self.tray_menu.setStyleSheet("""
-            QMenu {
-                background-color: #2b2b2b;
-                color: #ffffff;
-                border: 1px solid #404040;
-                border-radius: 8px;
-                padding: 8px 0px;
-            }
-            QMenu::item {
-                padding: 8px 32px 8px 16px;
-                background-color: transparent;
-            }
-            QMenu::item:selected {
-                background-color: #0078d4;
-                border-radius: 4px;
-                margin: 0px 4px;
-            }
-            QMenu::item:pressed {
-                background-color: #0063b1;
-            }
-            QMenu::separator {
-                height: 1px;
-                background-color: #404040;
-                margin: 4px 8px;
-            }
-        """)
-        
-        show_action = QAction('Открыть историю', self.tray_menu)
-        show_action.triggered.connect(self.launch_ui)
-        self.tray_menu.addAction(show_action)
-        
-        self.tray_menu.addSeparator()
-        
-        # Подменю масштабирования
-        scale_menu = QMenu('Масштаб интерфейса', self.tray_menu)
-        scale_menu.setStyleSheet(self.tray_menu.styleSheet())
-        
-        # Создаем группу для радио-кнопок (взаимоисключающий выбор)
-        from PyQt5.QtWidgets import QActionGroup
-        scale_group = QActionGroup(scale_menu)
-        scale_group.setExclusive(True)
-        
-        current_scale = self.config.get('ui_scale', 1.5)
-        
-        for scale_value in [1.0, 1.25, 1.5, 2.0]:
-            scale_action = QAction(f'{scale_value}x', scale_menu)
-            scale_action.setCheckable(True)
-            scale_action.setActionGroup(scale_group)  # Добавляем в группу
-            if abs(current_scale - scale_value) < 0.01:
-                scale_action.setChecked(True)
-            scale_action.triggered.connect(lambda checked, s=scale_value: self.change_ui_scale(s))
-            scale_menu.addAction(scale_action)
-        
-        self.tray_menu.addMenu(scale_menu)
-        
-        self.tray_menu.addSeparator()
-        
-        quit_action = QAction('Выход', self.tray_menu)
-        quit_action.triggered.connect(self.quit_daemon)
-        self.tray_menu.addAction(quit_action)
-        
-        self.tray_icon.setContextMenu(self.tray_menu)
-        self.tray_icon.activated.connect(self.on_tray_clicked)
-        self.tray_icon.show()
+            from cliphistory_tray import DaemonTray
+        except ImportError:
+            print("⚠️  PyQt5 не доступен, работаем без трея")
+            return None
         
-        print("📌 Иконка в трее создана")
-        return True
-    
-    def on_tray_clicked(self, reason):
-        """Обработка клика по трею"""
-        if reason == QSystemTrayIcon.Trigger:  # Левый клик
-            self.launch_ui()
+        tray = DaemonTray(self)
+        if not tray.start():
+            print("⚠️  Не удалось создать трей, работаем без него")
+            return None
+        return tray
     
     def launch_ui(self):
         """Запустить UI"""
+        self.clipboard_monitor.poller.poke()
         self.hotkey_manager.launch_ui()
     
-    def change_ui_scale(self, scale):
-        """Изменить масштаб интерфейса"""
-        try:
-            # Обновляем конфигурацию
-            self.config['ui_scale'] = scale
-            
-            # Сохраняем в файл
-            config_path = self.script_path.parent / 'config.json'
-            with open(config_path, 'w') as f:
-                json.dump(self.config, f, indent=2)
-            
-            # Показываем уведомление через трей
-            if self.tray_icon:
-                self.tray_icon.showMessage(
-                    'Масштаб изменен',
-                    f'Масштаб интерфейса установлен на {scale}x.\nИзменения вступят в силу при следующем открытии окна.',
-                    QSystemTrayIcon.Information,
-                    3000
-                )
-            
-            if self.config.get('debug'):
-                print(f"✅ Масштаб изменен на {scale}x")
-        except Exception as e:
-            if self.config.get('debug'):
-                print(f"Ошибка изменения масштаба: {e}")
-    
     def quit_daemon(self):
         """Выход из демона"""
         print("\n👋 Завершение работы через трей...")
-        if self.tray_icon:
-            self.tray_icon.hide()
-        if self.app:
-            self.app.quit()
+        self.control_server.stop()
+        self.metrics.flush()
+        self.stop_trace()
+        if self.tray:
+            self.tray.quit()
         sys.exit(0)
     
     def load_config(self):
@@ -648,59 +1077,74 @@ class ClipHistoryDaemon:
         """Запуск демона"""
         print("🚀 ClipHistory запущен")
         print(f"📁 Кэш: {self.clipboard_monitor.cache_dir}")
-        print(f"⏱️  Проверка каждые {self.config.get('check_interval', 0.3)}s")
+        poller = self.clipboard_monitor.poller
+        print(f"⏱️  Проверка каждые {poller.min_interval}-{poller.max_interval}s")
         print(f"⌨️  Горячая клавиша: {self.config.get('hotkey', 'Super+V')}")
         print("💡 Нажмите Ctrl+C для выхода")
         
-        # Инициализируем Qt приложение для трея
-        if PYQT_AVAILABLE:
-            self.app = QApplication(sys.argv)
-            self.app.setQuitOnLastWindowClosed(False)  # Не закрывать при закрытии окон
-            
-            if self.create_tray_icon():
-                # Запускаем мониторинг буфера в отдельном потоке
-                clipboard_thread = threading.Thread(
-                    target=self.clipboard_monitor.monitor_loop,
-                    daemon=True
-                )
-                clipboard_thread.start()
-                
-                # Запускаем event loop Qt (блокирующий)
-                try:
-                    sys.exit(self.app.exec_())
-                except KeyboardInterrupt:
-                    print("\n👋 Завершение работы...")
-                    self.app.quit()
-            else:
-                print("⚠️  Не удалось создать трей, работаем без него")
-                # Fallback без трея
-                clipboard_thread = threading.Thread(
-                    target=self.clipboard_monitor.monitor_loop,
-                    daemon=True
-                )
-                clipboard_thread.start()
-                
-                # Простой цикл ожидания
-                try:
-                    while True:
-                        time.sleep(1)
-                except KeyboardInterrupt:
-                    print("\n👋 Завершение работы...")
+        self.start_services()
+        
+        # Мониторинг буфера работает в отдельном потоке в любом режиме
+        clipboard_thread = threading.Thread(
+            target=self.clipboard_monitor.monitor_loop,
+            name='monitor',
+            daemon=True
+        )
+        clipboard_thread.start()
+        
+        if self.headless:
+            print("🪶 Режим --headless: без Qt и трея")
         else:
-            print("⚠️  PyQt5 не доступен, работаем без трея")
-            clipboard_thread = threading.Thread(
-                target=self.clipboard_monitor.monitor_loop,
-                daemon=True
-            )
-            clipboard_thread.start()
-            
+            self.tray = self.load_tray()
+        
+        if self.tray:
+            # Запускаем event loop Qt (блокирующий)
+            try:
+                sys.exit(self.tray.exec_())
+            except KeyboardInterrupt:
+                print("\n👋 Завершение работы...")
+                self.tray.quit()
+        else:
+            # Простой цикл ожидания
             try:
                 while True:
                     time.sleep(1)
+                    self.profiling.checkpoint()
             except KeyboardInterrupt:
                 print("\n👋 Завершение работы...")
 
 
 if __name__ == '__main__':
-    daemon = ClipHistoryDaemon()
+    parser = argparse.ArgumentParser(description='ClipHistory - демон истории буфера обмена',
+                                     epilog='Запросы к истории: cliphistory list|search|get|restore --help')
+    parser.add_argument('command', nargs='?', choices=['stats'],
+                        help='stats - задержки стадий и счётчики работающего демона')
+    parser.add_argument('--headless', action='store_true',
+                        help='без трея: Qt не загружается (меньше памяти и быстрее старт)')
+    parser.add_argument('--json', action='store_true', help='для stats: вывод в JSON')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='записывать трассу событий буфера (см. cliphistory_trace.py)')
+    args = parser.parse_args()
+    
+    if args.command == 'stats':
+        try:
+            stats = send_command('stats')
+        except (OSError, ValueError):
+            # Демон не запущен - последний сброшенный снимок
+            stats_path = Path.home() / '.cache' / 'cliphistory' / 'stats.json'
+            if not stats_path.exists():
+                print("ClipHistory не запущен")
+                sys.exit(1)
+            print(f"ClipHistory не запущен, снимок из {stats_path}")
+            with open(stats_path) as f:
+                stats = json.load(f)
+        print(json.dumps(stats, indent=2) if args.json else format_stats(stats))
+        sys.exit(0)
+    
+    # Второй демон перехватил бы сокет и буфер у работающего
+    if ping():
+        print("ClipHistory уже запущен")
+        sys.exit(0)
+    
+    daemon = ClipHistoryDaemon(headless=args.headless, trace_path=args.trace)
     daemon.run()
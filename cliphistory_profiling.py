@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+ClipHistory - профилирование работающего демона и UI по запросу
+
+Сессия профилирования включает сразу два профайлера:
+  - сэмплирующий: отдельный поток раз в interval снимает стеки всех
+    потоков (sys._current_frames) и пишет collapsed stacks
+    ("поток;функция;функция N") для flamegraph.pl / speedscope
+    (время по часам: ждущие в select/sleep потоки тоже попадают в стеки);
+  - cProfile по потокам: cProfile включается только в потоке, который
+    его вызвал, поэтому рабочие циклы (мониторинг, владение буфером,
+    Qt-таймер) вызывают checkpoint() - поток подключается к сессии и
+    сбрасывает свой .pstats при её остановке. С Python 3.12 cProfile
+    построен на sys.monitoring: включённый профайлер в процессе может
+    быть только один, зато он видит все потоки - первый checkpoint()
+    включает общий профиль (process.pstats).
+
+Снимки памяти: первый вызов memory_snapshot() включает tracemalloc,
+следующие пишут разницу с предыдущим снимком (рост по строкам кода).
+
+Сигналы: SIGUSR1 - старт/стоп сессии, SIGUSR2 - снимок памяти.
+Результаты: ~/.cache/cliphistory/profiles/
+"""
+
+import cProfile
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+# cProfile на sys.monitoring: один профайлер на процесс, для всех потоков
+PROCESS_WIDE_PROFILE = sys.version_info >= (3, 12)
+
+
+def profiles_dir():
+    """Каталог с результатами профилирования"""
+    return Path.home() / '.cache' / 'cliphistory' / 'profiles'
+
+
+class ProfilingHooks:
+    """Профилирование процесса по сигналу или команде.
+
+    name - префикс файлов ("daemon", "ui").
+    """
+
+    def __init__(self, name, sample_interval=0.005, debug=False):
+        self.name = name
+        self.sample_interval = sample_interval
+        self.debug = debug
+        self.out_dir = profiles_dir()
+
+        self.lock = threading.Lock()
+        self.active = False
+        self.session = None  # Метка времени сессии для имён файлов
+
+        # Сэмплирующий профайлер
+        self.sampler = None
+        self.sampler_stop = threading.Event()
+        self.samples = Counter()
+        self.sample_count = 0
+
+        # cProfile по потокам: {thread_id: (profile, thread_name)};
+        # на 3.12+ одна запись с ключом None на весь процесс
+        self.thread_profiles = {}
+        # Потоки, где cProfile не включился (занят другим инструментом)
+        self.failed_threads = set()
+        self.written = []
+
+        self.last_snapshot = None
+
+    def install_signals(self):
+        """SIGUSR1 - старт/стоп сессии, SIGUSR2 - снимок памяти.
+
+        Обработчик сигнала может прервать поток, держащий self.lock,
+        поэтому работа выполняется в отдельном потоке.
+        """
+        def run_in_thread(target):
+            return lambda signum, frame: threading.Thread(target=target, daemon=True).start()
+
+        signal.signal(signal.SIGUSR1, run_in_thread(self.toggle))
+        signal.signal(signal.SIGUSR2, run_in_thread(self.memory_snapshot))
+
+    def _path(self, suffix, stamp=None):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        return self.out_dir / f'{self.name}-{stamp or self.session}-{suffix}'
+
+    def toggle(self):
+        return self.stop() if self.active else self.start()
+
+    def start(self):
+        """Начать сессию: сэмплирование всех потоков + cProfile в checkpoint()"""
+        with self.lock:
+            if self.active:
+                return self.status()
+            self.active = True
+            self.session = time.strftime('%Y%m%d-%H%M%S')
+            self.samples.clear()
+            self.sample_count = 0
+            self.written = []
+            self.failed_threads.clear()
+
+            self.sampler_stop.clear()
+            self.sampler = threading.Thread(target=self._sample_loop, name='profiler', daemon=True)
+            self.sampler.start()
+
+        if self.debug:
+            print(f"🔬 Профилирование {self.name} запущено")
+        return self.status()
+
+    def stop(self):
+        """Остановить сессию и записать результаты.
+
+        Потоки, которые ещё не прошли checkpoint() после остановки, допишут
+        свои .pstats позже (поток в select() - при следующем событии).
+        """
+        with self.lock:
+            if not self.active:
+                return self.status()
+            self.active = False
+            self.sampler_stop.set()
+        self.sampler.join()
+
+        path = self._path('sample.folded')
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f'{stack} {count}\n')
+        self.written.append(str(path))
+
+        if self.debug:
+            print(f"🔬 Профилирование {self.name} остановлено: {path}")
+        return self.status()
+
+    def status(self):
+        return {
+            'active': self.active,
+            'samples': self.sample_count,
+            'threads': [name for _, name in self.thread_profiles.values()],
+            'files': list(self.written),
+        }
+
+    def checkpoint(self):
+        """Подключить текущий поток к сессии cProfile или сбросить его профиль.
+
+        Вызывается из рабочих циклов; вне сессии - одна проверка словаря.
+        """
+        if not self.active and not self.thread_profiles:
+            return
+
+        ident = None if PROCESS_WIDE_PROFILE else threading.get_ident()
+        # Ошибка профилирования не должна останавливать рабочий цикл
+        try:
+            with self.lock:
+                entry = self.thread_profiles.get(ident)
+                if self.active and entry is None:
+                    if ident in self.failed_threads:
+                        return
+                    profile = cProfile.Profile()
+                    try:
+                        profile.enable()
+                    except ValueError as e:
+                        # "Another profiling tool is already active"
+                        self.failed_threads.add(ident)
+                        if self.debug:
+                            print(f"⚠️  cProfile не включён: {e}")
+                        return
+                    thread_name = 'process' if ident is None else threading.current_thread().name
+                    self.thread_profiles[ident] = (profile, thread_name)
+                elif not self.active and entry is not None:
+                    profile, thread_name = self.thread_profiles.pop(ident)
+                    profile.disable()
+                    path = self._path(f'{thread_name}.pstats')
+                    profile.dump_stats(path)
+                    self.written.append(str(path))
+        except Exception as e:
+            if self.debug:
+                print(f"⚠️  Ошибка профилирования: {e}")
+
+    def _sample_loop(self):
+        me = threading.get_ident()
+        while not self.sampler_stop.wait(self.sample_interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[';'.join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def memory_snapshot(self, limit=50):
+        """Снимок tracemalloc; начиная со второго - разница с предыдущим"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            self.last_snapshot = tracemalloc.take_snapshot()
+            if self.debug:
+                print("🔬 tracemalloc включён, базовый снимок сделан")
+            return {'tracing': True, 'file': None}
+
+        snapshot = tracemalloc.take_snapshot()
+        path = self._path('memory.txt', time.strftime('%Y%m%d-%H%M%S'))
+        current, peak = tracemalloc.get_traced_memory()
+        with open(path, 'w') as f:
+            f.write(f'traced: {current / 1024:.0f} KiB, peak: {peak / 1024:.0f} KiB\n\n')
+            f.write(f'Рост с предыдущего снимка (top {limit}):\n')
+            for stat in snapshot.compare_to(self.last_snapshot, 'lineno')[:limit]:
+                f.write(f'{stat}\n')
+            f.write(f'\nКрупнейшие выделения (top {limit}):\n')
+            for stat in snapshot.statistics('lineno')[:limit]:
+                f.write(f'{stat}\n')
+        self.last_snapshot = snapshot
+
+        if self.debug:
+            print(f"🔬 Снимок памяти: {path}")
+        return {'tracing': True, 'file': str(path)}
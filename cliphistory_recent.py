@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+ClipHistory - первые строки истории в памяти демона
+
+Демон видит каждую вставку, удаление и закрепление, поэтому держит в
+памяти начало списка окна истории (закреплённые, затем новые) и отдаёт
+первую страницу по команде "recent" без обращения к диску. Окно
+истории берёт из неё первый экран, а удаление и закрепление отправляет
+демону ("delete", "pin"), чтобы кэш оставался согласованным.
+
+Кэш - всегда точный префикс порядка окна: все закреплённые элементы и
+до capacity новейших незакреплённых в кольцевом буфере. Новый элемент
+встаёт в голову кольца, самый старый выпадает; удаление только
+укорачивает префикс. Страницу, которой в префиксе нет (после
+удалений), демон перечитывает из хранилища. Записи других процессов
+(импорт) сбрасывают кэш командой "recent" с reload.
+"""
+
+import threading
+
+
+class RecentEntry:
+    """Строка окна истории: поля как у HistoryLoader.prepare_row"""
+
+    __slots__ = ('id', 'mime_type', 'content_path', 'preview', 'pinned', 'timestamp', 'display')
+
+    def __init__(self, item):
+        self.id = item.id
+        self.mime_type = item.mime_type
+        # Для изображений - путь к оригиналу (миниатюра ищется по его имени)
+        self.content_path = item.content_path
+        self.preview = item.preview or ''
+        self.pinned = item.pinned
+        self.timestamp = item.timestamp
+        self.display = item.display
+
+    @property
+    def kind(self):
+        return self.mime_type.split('/', 1)[0]
+
+    def row(self):
+        return [self.id, self.mime_type, self.content_path, self.preview,
+                self.pinned, self.timestamp, self.display]
+
+
+class RecentRing:
+    """Кольцо фиксированной ёмкости, новые элементы в голове"""
+
+    __slots__ = ('slots', 'start', 'size')
+
+    def __init__(self, capacity):
+        self.slots = [None] * capacity
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _index(self, position):
+        return (self.start + position) % len(self.slots)
+
+    def __getitem__(self, position):
+        return self.slots[self._index(position)]
+
+    def __iter__(self):
+        return (self.slots[self._index(position)] for position in range(self.size))
+
+    def full(self):
+        return self.size == len(self.slots)
+
+    def push_front(self, entry):
+        """Добавить в голову; вернуть False, если вытеснен самый старый"""
+        self.start = (self.start - 1) % len(self.slots)
+        self.slots[self.start] = entry  # При полном кольце - на месте самого старого
+        if self.full():
+            return False
+        self.size += 1
+        return True
+
+    def insert(self, position, entry):
+        """Вставить в середину (восстановление порядка при откреплении)"""
+        if position == 0:
+            return self.push_front(entry)
+        dropped = self.full()
+        if dropped and position >= self.size:
+            return False
+        end = self.size - 1 if dropped else self.size
+        for current in range(end, position, -1):
+            self.slots[self._index(current)] = self.slots[self._index(current - 1)]
+        self.slots[self._index(position)] = entry
+        if not dropped:
+            self.size += 1
+        return not dropped
+
+    def remove(self, position):
+        for current in range(position, self.size - 1):
+            self.slots[self._index(current)] = self.slots[self._index(current + 1)]
+        self.size -= 1
+        self.slots[self._index(self.size)] = None
+
+    def find(self, item_id):
+        for position in range(self.size):
+            if self.slots[self._index(position)].id == item_id:
+                return position
+        return None
+
+
+class RecentCache:
+    """Префикс списка окна истории в памяти демона (потокобезопасный)"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.pinned = []
+        self.ring = RecentRing(capacity)
+        self.loaded = False
+        # В кольце все незакреплённые элементы хранилища
+        self.exhaustive = False
+        # Меняется при каждом изменении: окно сравнивает для автообновления
+        self.version = 0
+
+    def load(self, storage):
+        """Прочитать префикс из хранилища (при первом запросе и после сброса).
+
+        Чтение под блокировкой: вставка, сделанная во время загрузки,
+        применится после неё, а не потеряется.
+        """
+        with self.lock:
+            pinned = []
+            unpinned = []
+            offset = 0
+            while True:
+                page = storage.list_page(self.capacity, offset)
+                for item in page:
+                    if item.pinned:
+                        pinned.append(RecentEntry(item))
+                    elif len(unpinned) < self.capacity:
+                        unpinned.append(RecentEntry(item))
+                offset += len(page)
+                # Закреплённые идут первыми: пока страница из них одних, читаем дальше
+                if len(page) < self.capacity or not page[-1].pinned:
+                    break
+
+            self.pinned = pinned
+            self.ring = RecentRing(self.capacity)
+            for entry in reversed(unpinned):
+                self.ring.push_front(entry)
+            self.exhaustive = len(page) < self.capacity and len(unpinned) < self.capacity
+            self.loaded = True
+            self.version += 1
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded = False
+            self.pinned = []
+            self.ring = RecentRing(self.capacity)
+            self.version += 1
+
+    def page(self, limit, offset=0):
+        """Строки [offset, offset + limit) или None - их нет в префиксе"""
+        with self.lock:
+            if not self.loaded:
+                return None
+            available = len(self.pinned) + len(self.ring)
+            if offset + limit > available and not self.exhaustive:
+                return None
+            rows = [entry.row() for entry in self.pinned[offset:offset + limit]]
+            start = max(0, offset - len(self.pinned))
+            for position in range(start, min(len(self.ring), start + limit - len(rows))):
+                rows.append(self.ring[position].row())
+            return rows
+
+    def update(self, item):
+        """Новый, закреплённый/откреплённый или поднятый из архива элемент"""
+        with self.lock:
+            if not self.loaded:
+                return
+            self._remove(item.id)
+            entry = RecentEntry(item)
+            if entry.pinned:
+                position = next((index for index, other in enumerate(self.pinned)
+                                 if other.timestamp < entry.timestamp), len(self.pinned))
+                self.pinned.insert(position, entry)
+            else:
+                position = next((index for index, other in enumerate(self.ring)
+                                 if other.timestamp <= entry.timestamp), len(self.ring))
+                # Старше всего кольца, а в хранилище есть ещё старше - за пределами префикса
+                if position < len(self.ring) or self.exhaustive:
+                    if not self.ring.insert(position, entry):
+                        self.exhaustive = False
+            self.version += 1
+
+    def discard(self, item_ids):
+        """Удалённые или перенесённые в архив элементы (только действительно удалённые)"""
+        with self.lock:
+            if not self.loaded:
+                return
+            for item_id in item_ids:
+                self._remove(item_id)
+            # Окно показывает и строки за префиксом (и архив): версия меняется
+            # при любом удалении, но не при пустом вызове - иначе окна перечитают
+            # историю без изменений
+            if item_ids:
+                self.version += 1
+
+    def _remove(self, item_id):
+        for index, entry in enumerate(self.pinned):
+            if entry.id == item_id:
+                del self.pinned[index]
+                return
+        position = self.ring.find(item_id)
+        if position is not None:
+            self.ring.remove(position)
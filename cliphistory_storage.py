@@ -0,0 +1,585 @@
+#!/usr/bin/env python3
+"""
+ClipHistory - хранилище элементов истории
+
+Storage - общий интерфейс демона (захват, очистка, восстановление) и окна
+истории (список, удаление, закрепление): put, get, list_page, delete, pin,
+iterate. Блобы (images/, text/, other/) пишет и удаляет вызывающий код,
+хранилище держит только метаданные элемента (Item) с путём к блобу.
+Архив вытесненных элементов (supports_archive, iter_cold, cold_content,
+delete_cold, promote) есть только у sqlite, у остальных методы пустые.
+
+Реализации ("storage" в config.json):
+  sqlite - history.db (по умолчанию). С ней работают и инструменты:
+           cliphistory list/search/get, экспорт, архив
+           (cliphistory_tiers).
+  log    - экспериментальная: журнал только на дозапись (log/seg-NNNNNN.log,
+           строка JSON на операцию) и индекс в памяти. Процессы догоняют
+           чужие записи по смещению в сегменте, запись - под flock.
+           Когда мёртвых записей становится больше живых, журнал сжимается
+           в один сегмент-снимок.
+"""
+
+import fcntl
+import heapq
+import json
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+import cliphistory_tiers as tiers
+
+ITEM_FIELDS = ('id', 'timestamp', 'mime_type', 'content_path', 'preview', 'hash',
+               'pinned', 'display', 'codec', 'orig_size')
+
+Item = namedtuple('Item', ITEM_FIELDS)
+
+# Строка элемента от ClipboardMonitor.prepare_item (без id и pinned)
+ROW_FIELDS = ('timestamp', 'mime_type', 'content_path', 'preview', 'hash', 'display', 'codec', 'orig_size')
+
+INSERT_ITEM_SQL = f'''
+    INSERT OR IGNORE INTO items ({', '.join(ROW_FIELDS)})
+    VALUES ({', '.join('?' * len(ROW_FIELDS))})
+'''
+
+# Колонки Item; pinned в старых записях мог остаться NULL
+SELECT_COLUMNS = ', '.join('COALESCE(pinned, 0)' if field == 'pinned' else field for field in ITEM_FIELDS)
+
+# До миграции демоном колонок display, codec и orig_size нет
+SELECT_COLUMNS_LEGACY = SELECT_COLUMNS.replace('display, codec, orig_size', 'NULL, NULL, NULL')
+
+
+def item_from_row(item_id, row, pinned=0):
+    """Item из строки prepare_item"""
+    timestamp, mime_type, content_path, preview, content_hash, display, codec, orig_size = row
+    return Item(item_id, timestamp, mime_type, content_path, preview, content_hash,
+                pinned, display, codec, orig_size)
+
+
+class Storage:
+    """Интерфейс хранилища; stale_items, signature и counts - через iterate"""
+
+    def init(self, display_preview):
+        """Создать или обновить хранилище (демон при старте).
+
+        display_preview(text) - превью для старых записей без display.
+        """
+        raise NotImplementedError
+
+    def put(self, row):
+        """Добавить строку prepare_item; вернуть id или None (повтор по хешу)"""
+        raise NotImplementedError
+
+    def put_many(self, rows, pinned_hashes=()):
+        """Добавить пачку строк, закрепив элементы с хешами pinned_hashes"""
+        pinned_hashes = set(pinned_hashes)
+        for row in rows:
+            item_id = self.put(row)
+            if item_id is not None and row[4] in pinned_hashes:
+                self.pin(item_id, 1)
+
+    def get(self, item_id):
+        """Item или None"""
+        raise NotImplementedError
+
+    def list_page(self, limit, offset=0):
+        """Страница в порядке окна истории: закреплённые, затем новые"""
+        raise NotImplementedError
+
+    def delete(self, item_id):
+        """Удалить элемент; вернуть удалённый Item (для блоба) или None"""
+        raise NotImplementedError
+
+    def delete_many(self, item_ids):
+        return [item for item in map(self.delete, item_ids) if item is not None]
+
+    def pin(self, item_id, pinned):
+        """Закрепить/открепить; False - элемента нет"""
+        raise NotImplementedError
+
+    def iterate(self):
+        """Все элементы в произвольном порядке"""
+        raise NotImplementedError
+
+    def stale_items(self, cutoff, limits):
+        """Незакреплённые элементы старше cutoff или сверх limits {префикс MIME: N}"""
+        unpinned = [item for item in self.iterate() if not item.pinned]
+        stale = {item.id: item for item in unpinned if item.timestamp < cutoff}
+        for mime_prefix, limit in limits.items():
+            matching = [item for item in unpinned if item.mime_type.startswith(mime_prefix)]
+            matching.sort(key=lambda item: item.timestamp, reverse=True)
+            stale.update((item.id, item) for item in matching[limit:])
+        return list(stale.values())
+
+    def signature(self):
+        """(количество, max id, закреплённых) - окно сравнивает для автообновления"""
+        count = max_id = pinned = 0
+        for item in self.iterate():
+            count += 1
+            max_id = max(max_id, item.id)
+            pinned += item.pinned
+        return count, max_id, pinned
+
+    def counts(self):
+        """(всего, закреплённых)"""
+        count, _, pinned = self.signature()
+        return count, pinned
+
+    # Помесячный архив (cliphistory_tiers); без него методы ничего не находят
+    supports_archive = False
+
+    def iter_cold(self, columns, where='', params=()):
+        """Строки архива (новые первыми); columns/where - по колонкам архива"""
+        return iter(())
+
+    def cold_content(self, item_id):
+        """(mime_type, содержимое) элемента из архива или None"""
+        return None
+
+    def delete_cold(self, item_id):
+        """Удалить элемент из архива; True - был в архиве"""
+        return False
+
+    def promote(self, item_id, pinned=None, timestamp=None):
+        """Поднять элемент из архива; вернуть его id в горячей истории или None"""
+        return None
+
+
+class SQLiteStorage(Storage):
+    """history.db; соединение на операцию, как и раньше - потоки демона не делят его"""
+
+    def __init__(self, db_path, debug=False):
+        self.db_path = Path(db_path)
+        self.debug = debug
+
+    def connect(self):
+        return sqlite3.connect(self.db_path)
+
+    def init(self, display_preview):
+        """Инициализация БД с миграцией"""
+        conn = self.connect()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp REAL,
+                mime_type TEXT,
+                content_path TEXT,
+                preview TEXT,
+                hash TEXT UNIQUE
+            )
+        ''')
+
+        # Миграция: добавляем pinned если нет
+        cursor.execute("PRAGMA table_info(items)")
+        columns = [col[1] for col in cursor.fetchall()]
+        if 'pinned' not in columns:
+            cursor.execute('ALTER TABLE items ADD COLUMN pinned INTEGER DEFAULT 0')
+            if self.debug:
+                print("✓ Добавлена колонка 'pinned'")
+
+        # Миграция: готовое к показу превью (заполняем для старых записей)
+        if 'display' not in columns:
+            cursor.execute('ALTER TABLE items ADD COLUMN display TEXT')
+            cursor.execute("SELECT id, preview FROM items WHERE mime_type NOT LIKE 'image/%'")
+            cursor.executemany('UPDATE items SET display = ? WHERE id = ?',
+                               [(display_preview(preview or ''), item_id)
+                                for item_id, preview in cursor.fetchall()])
+            if self.debug:
+                print("✓ Добавлена колонка 'display'")
+
+        # Миграция: кодек сжатия блоба и исходный размер
+        if 'codec' not in columns:
+            cursor.execute('ALTER TABLE items ADD COLUMN codec TEXT')
+            cursor.execute('ALTER TABLE items ADD COLUMN orig_size INTEGER')
+            if self.debug:
+                print("✓ Добавлены колонки 'codec', 'orig_size'")
+
+        conn.commit()
+        conn.close()
+
+    def _select(self, conn, where='', params=(), tail=''):
+        try:
+            return conn.execute(f'SELECT {SELECT_COLUMNS} FROM items {where} {tail}', params)
+        except sqlite3.OperationalError:
+            return conn.execute(f'SELECT {SELECT_COLUMNS_LEGACY} FROM items {where} {tail}', params)
+
+    def put(self, row):
+        conn = self.connect()
+        try:
+            with conn:
+                cursor = conn.execute(INSERT_ITEM_SQL, row)
+            return cursor.lastrowid if cursor.rowcount else None
+        finally:
+            conn.close()
+
+    def put_many(self, rows, pinned_hashes=()):
+        """Пачка в одной транзакции"""
+        conn = self.connect()
+        try:
+            with conn:
+                conn.executemany(INSERT_ITEM_SQL, rows)
+                conn.executemany('UPDATE items SET pinned = 1 WHERE hash = ?',
+                                 [(content_hash,) for content_hash in pinned_hashes])
+        finally:
+            conn.close()
+
+    def get(self, item_id):
+        conn = self.connect()
+        try:
+            row = self._select(conn, 'WHERE id = ?', (item_id,)).fetchone()
+        finally:
+            conn.close()
+        return Item(*row) if row else None
+
+    def list_page(self, limit, offset=0):
+        # Окно не создаёт БД, если демон ещё не запускался
+        if not self.db_path.exists():
+            return []
+        conn = self.connect()
+        try:
+            rows = self._select(conn, tail='ORDER BY pinned DESC, timestamp DESC LIMIT ? OFFSET ?',
+                                params=(limit, offset)).fetchall()
+        finally:
+            conn.close()
+        return [Item(*row) for row in rows]
+
+    def delete(self, item_id):
+        deleted = self.delete_many([item_id])
+        return deleted[0] if deleted else None
+
+    def delete_many(self, item_ids):
+        if not item_ids:
+            return []
+        conn = self.connect()
+        try:
+            with conn:
+                placeholders = ','.join('?' * len(item_ids))
+                items = [Item(*row) for row in
+                         self._select(conn, f'WHERE id IN ({placeholders})', list(item_ids))]
+                conn.executemany('DELETE FROM items WHERE id = ?', [(item.id,) for item in items])
+        finally:
+            conn.close()
+        return items
+
+    def pin(self, item_id, pinned):
+        conn = self.connect()
+        try:
+            with conn:
+                return conn.execute('UPDATE items SET pinned = ? WHERE id = ?', (pinned, item_id)).rowcount > 0
+        finally:
+            conn.close()
+
+    def iterate(self):
+        if not self.db_path.exists():
+            return
+        conn = self.connect()
+        try:
+            yield from (Item(*row) for row in self._select(conn))
+        finally:
+            conn.close()
+
+    def stale_items(self, cutoff, limits):
+        conn = self.connect()
+        try:
+            # Старше cutoff
+            stale = {row[0]: Item(*row) for row in
+                     self._select(conn, 'WHERE timestamp < ? AND pinned = 0', (cutoff,))}
+
+            # Сверх лимитов по типам
+            for mime_prefix, limit in limits.items():
+                stale.update((row[0], Item(*row)) for row in self._select(
+                    conn, 'WHERE mime_type LIKE ? AND pinned = 0', (f'{mime_prefix}%', limit),
+                    'ORDER BY timestamp DESC LIMIT -1 OFFSET ?'))
+        finally:
+            conn.close()
+        return list(stale.values())
+
+    def signature(self):
+        if not self.db_path.exists():
+            return 0, 0, 0
+        conn = self.connect()
+        try:
+            # Количество не ловит вставку при упоре в лимит (вставка + очистка),
+            # поэтому сигнатура - из количества, max(id) и закреплённых
+            return conn.execute(
+                'SELECT COUNT(*), COALESCE(MAX(id), 0), COALESCE(SUM(pinned), 0) FROM items').fetchone()
+        finally:
+            conn.close()
+
+    supports_archive = True
+
+    def iter_cold(self, columns, where='', params=()):
+        return tiers.iter_cold(self.db_path.parent, columns, where, params)
+
+    def cold_content(self, item_id):
+        return tiers.cold_content(self.db_path.parent, item_id)
+
+    def delete_cold(self, item_id):
+        return tiers.delete_cold(self.db_path.parent, item_id)
+
+    def promote(self, item_id, pinned=None, timestamp=None):
+        return tiers.promote(self.db_path, item_id, pinned, timestamp)
+
+
+class LogStorage(Storage):
+    """Журнал операций только на дозапись с индексом в памяти.
+
+    Операции - строки JSON: ["put", <поля Item>], ["del", id],
+    ["pin", id, pinned], ["seq", следующий id] (в начале снимка).
+    Перед каждой операцией процесс дочитывает новые строки всех
+    сегментов (запись другого процесса видна сразу); пропал сегмент,
+    на котором он остановился (сжатие) - индекс строится заново.
+    Недописанная последняя строка (kill во время записи) не читается,
+    а следующий писатель её отрезает.
+    """
+
+    SEGMENT_PREFIX = 'seg-'
+    # Новый сегмент, когда текущий вырос больше SEGMENT_BYTES
+    SEGMENT_BYTES = 4 * 1024 * 1024
+    # Сжатие: записей в журнале больше COMPACT_RATIO * живых и не меньше COMPACT_MIN_RECORDS
+    COMPACT_RATIO = 2
+    COMPACT_MIN_RECORDS = 1000
+
+    def __init__(self, directory, sync=False):
+        self.directory = Path(directory)
+        self.sync = sync
+        self.lock = threading.Lock()
+        self.items = {}
+        self.by_hash = {}
+        self.next_id = 1
+        self.records = 0
+        self.position = None  # (номер сегмента, смещение)
+        self.compactions = 0
+
+    def init(self, display_preview):
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    # --- чтение журнала ---
+
+    def _segments(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[len(self.SEGMENT_PREFIX):-4]) for name in names
+                      if name.startswith(self.SEGMENT_PREFIX) and name.endswith('.log'))
+
+    def _segment_path(self, number):
+        return self.directory / f'{self.SEGMENT_PREFIX}{number:06d}.log'
+
+    def _reset(self):
+        self.items = {}
+        self.by_hash = {}
+        self.next_id = 1
+        self.records = 0
+        self.position = None
+
+    def _apply(self, record):
+        op = record[0]
+        if op == 'put':
+            item = Item(*record[1:])
+            old = self.items.get(item.id)
+            if old is not None:
+                self.by_hash.pop(old.hash, None)
+            self.items[item.id] = item
+            self.by_hash[item.hash] = item.id
+            self.next_id = max(self.next_id, item.id + 1)
+        elif op == 'del':
+            item = self.items.pop(record[1], None)
+            if item is not None and self.by_hash.get(item.hash) == item.id:
+                del self.by_hash[item.hash]
+        elif op == 'pin':
+            item = self.items.get(record[1])
+            if item is not None:
+                self.items[item.id] = item._replace(pinned=record[2])
+        elif op == 'seq':
+            self.next_id = max(self.next_id, record[1])
+        self.records += 1
+
+    def _catch_up(self):
+        """Дочитать журнал до конца (под self.lock)"""
+        while True:
+            segments = self._segments()
+            if self.position is not None and self.position[0] not in segments:
+                self._reset()  # Сегмент удалён сжатием
+            if self.position is None:
+                if not segments:
+                    return
+                self.position = (segments[0], 0)
+            try:
+                for number in segments:
+                    if number < self.position[0]:
+                        continue
+                    offset = self.position[1] if number == self.position[0] else 0
+                    self.position = (number, self._read_segment(number, offset))
+                return
+            except FileNotFoundError:
+                self._reset()
+
+    def _read_segment(self, number, offset):
+        """Применить полные строки сегмента с offset; вернуть новое смещение"""
+        path = self._segment_path(number)
+        if os.stat(path).st_size <= offset:
+            return offset
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            self._apply(json.loads(line))
+        return offset + end
+
+    # --- запись ---
+
+    def _append(self, make_records):
+        """Дописать операции под межпроцессной блокировкой и применить их.
+
+        make_records() вызывается после того, как журнал дочитан: id и
+        проверки повторов считаются по актуальному индексу.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / 'lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._catch_up()
+            records = make_records()
+            if not records:
+                return []
+
+            number, offset = self.position or (1, 0)
+            path = self._segment_path(number)
+            if offset >= self.SEGMENT_BYTES:
+                number, offset = number + 1, 0
+                path = self._segment_path(number)
+            data = b''.join(json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+                            for record in records)
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+            try:
+                # Всё после offset - недописанная строка упавшего писателя
+                os.ftruncate(fd, offset)
+                os.lseek(fd, offset, os.SEEK_SET)
+                os.write(fd, data)
+                if self.sync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+            for record in records:
+                self._apply(record)
+            self.position = (number, offset + len(data))
+
+            if self.records >= max(self.COMPACT_MIN_RECORDS, self.COMPACT_RATIO * len(self.items)):
+                self._compact()
+            return records
+
+    def _compact(self):
+        """Переписать живые элементы в новый сегмент и удалить старые (под flock)"""
+        old_segments = self._segments()
+        number = old_segments[-1] + 1
+        records = [['seq', self.next_id]] + [['put', *item] for item in self.items.values()]
+        tmp_path = self.directory / 'compact.tmp'
+        with open(tmp_path, 'wb') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        os.replace(tmp_path, self._segment_path(number))
+        for old in old_segments:
+            self._segment_path(old).unlink(missing_ok=True)
+        self.records = len(records)
+        self.position = (number, size)
+        self.compactions += 1
+
+    # --- интерфейс ---
+
+    def put(self, row):
+        with self.lock:
+            written = self._append(lambda: [] if row[4] in self.by_hash else
+                                   [['put', *item_from_row(self.next_id, row)]])
+            return written[0][1] if written else None
+
+    def put_many(self, rows, pinned_hashes=()):
+        pinned_hashes = set(pinned_hashes)
+
+        def make_records():
+            records = []
+            seen = set(self.by_hash)
+            for row in rows:
+                if row[4] in seen:
+                    continue
+                seen.add(row[4])
+                item = item_from_row(self.next_id + len(records), row, int(row[4] in pinned_hashes))
+                records.append(['put', *item])
+            return records
+
+        with self.lock:
+            self._append(make_records)
+
+    def get(self, item_id):
+        with self.lock:
+            self._catch_up()
+            return self.items.get(item_id)
+
+    def list_page(self, limit, offset=0):
+        with self.lock:
+            self._catch_up()
+            page = heapq.nsmallest(offset + limit, self.items.values(),
+                                   key=lambda item: (-item.pinned, -item.timestamp))
+        return page[offset:]
+
+    def delete(self, item_id):
+        deleted = self.delete_many([item_id])
+        return deleted[0] if deleted else None
+
+    def delete_many(self, item_ids):
+        deleted = []
+
+        def make_records():
+            deleted[:] = [self.items[item_id] for item_id in item_ids if item_id in self.items]
+            return [['del', item.id] for item in deleted]
+
+        with self.lock:
+            self._append(make_records)
+        return deleted
+
+    def pin(self, item_id, pinned):
+        with self.lock:
+            return bool(self._append(lambda: [['pin', item_id, pinned]] if item_id in self.items else []))
+
+    def iterate(self):
+        with self.lock:
+            self._catch_up()
+            items = list(self.items.values())
+        return iter(items)
+
+    def disk_bytes(self):
+        return sum(self._segment_path(number).stat().st_size for number in self._segments())
+
+
+def storage_backend(config):
+    """'log' или 'sqlite' (по умолчанию и при неизвестном значении)"""
+    return 'log' if config.get('storage') == 'log' else 'sqlite'
+
+
+def require_sqlite(tool):
+    """Инструменты, читающие history.db напрямую (list/search/get, экспорт):
+    с другим хранилищем они увидели бы устаревшую или пустую историю"""
+    try:
+        with open(Path(__file__).resolve().parent / 'config.json') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return
+    backend = storage_backend(config)
+    if backend != 'sqlite':
+        raise RuntimeError(f'{tool} работает только с хранилищем sqlite, '
+                           f'в config.json "storage": "{backend}"')
+
+
+def open_storage(config, cache_dir):
+    """Хранилище по "storage" в config.json"""
+    if storage_backend(config) == 'log':
+        return LogStorage(Path(cache_dir) / 'log', sync=config.get('storage_sync', False))
+    return SQLiteStorage(Path(cache_dir) / 'history.db', debug=config.get('debug', False))
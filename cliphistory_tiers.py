@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+ClipHistory - горячая история и помесячный архив (archive/ГГГГ-ММ.db)
+
+history.db - горячий уровень: свежие и закреплённые элементы, с ним
+работают захват и окно истории. При "archive_months" > 0 элементы,
+которые очистка демона раньше удаляла (старше cleanup_days или сверх
+max_text_items / max_image_items), переносятся в холодный уровень -
+archive/ГГГГ-ММ.db по месяцу элемента. Содержимое блоба хранится прямо
+в архивной БД (сжатое, если это выгодно), так что месяц - один файл;
+архивы старше archive_months удаляются целиком.
+
+Перенос делает фоновый поток демона (TierMigrator) порциями по сигналу
+очистки. Элемент переносится одной транзакцией через ATTACH: он всегда
+ровно в одном уровне, даже если окно в это время закрепляет или удаляет
+его. Обратно в горячий уровень элемент поднимается при восстановлении в
+буфер или закреплении (promote).
+
+id элементов сохраняются (AUTOINCREMENT в history.db их не переиспользует),
+поэтому `cliphistory get ID` и restore работают для любого уровня.
+Чтение (list/search, окно истории, экспорт) идёт сначала по горячему
+уровню и обращается к архивам, новые месяцы первыми, только когда
+горячий исчерпан.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from cliphistory_blobs import CODEC_SUFFIXES, decompress, maybe_compress
+
+ARCHIVE_DIR = 'archive'
+
+# Элементов за одну транзакцию переноса
+MIGRATE_BATCH = 200
+
+ARCHIVE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS {db}.items (
+        id INTEGER PRIMARY KEY,
+        timestamp REAL,
+        mime_type TEXT,
+        blob_name TEXT,
+        preview TEXT,
+        hash TEXT UNIQUE,
+        display TEXT,
+        codec TEXT,
+        orig_size INTEGER,
+        content BLOB
+    )
+'''
+
+ARCHIVE_INDEX = 'CREATE INDEX IF NOT EXISTS {db}.items_timestamp ON items (timestamp)'
+
+
+def archive_dir(cache_dir):
+    return Path(cache_dir) / ARCHIVE_DIR
+
+
+def archive_paths(cache_dir):
+    """Архивы истории, новые месяцы первыми"""
+    return sorted(archive_dir(cache_dir).glob('[0-9][0-9][0-9][0-9]-[0-9][0-9].db'), reverse=True)
+
+
+def archive_month(timestamp):
+    return time.strftime('%Y-%m', time.localtime(timestamp))
+
+
+def connect(db_path):
+    """Соединение, в котором ATTACH не создаёт отсутствующие архивы"""
+    return sqlite3.connect(f'file:{db_path}', uri=True)
+
+
+def attach(conn, path, mode='rw'):
+    conn.execute('ATTACH DATABASE ? AS cold', (f'file:{path}?mode={mode}',))
+
+
+def iter_cold(cache_dir, columns, where='', params=()):
+    """Строки архивов (новые первыми); columns/where - по колонкам архива"""
+    for path in archive_paths(cache_dir):
+        try:
+            conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        except sqlite3.OperationalError:
+            continue  # Удалён очисткой архивов
+        try:
+            cursor = conn.execute(f'SELECT {columns} FROM items {where} ORDER BY timestamp DESC', params)
+        except sqlite3.OperationalError:
+            conn.close()
+            continue  # Только что создан переносом, таблицы ещё нет
+        try:
+            yield from cursor
+        finally:
+            conn.close()
+
+
+def cold_content(cache_dir, item_id):
+    """(mime_type, содержимое) элемента из архива или None"""
+    for path in archive_paths(cache_dir):
+        try:
+            conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+            try:
+                row = conn.execute('SELECT mime_type, preview, codec, content FROM items WHERE id = ?',
+                                   (item_id,)).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.OperationalError:
+            continue
+        if row is None:
+            continue
+        mime_type, preview, codec, content = row
+        if content is None:
+            return mime_type, (preview or '').encode('utf-8')
+        return mime_type, decompress(content, codec) if codec else content
+    return None
+
+
+def delete_cold(cache_dir, item_id):
+    """Удалить элемент из архива; True - был в архиве"""
+    for path in archive_paths(cache_dir):
+        try:
+            conn = sqlite3.connect(f'file:{path}?mode=rw', uri=True)
+            try:
+                with conn:
+                    deleted = conn.execute('DELETE FROM items WHERE id = ?', (item_id,)).rowcount
+            finally:
+                conn.close()
+        except sqlite3.OperationalError:
+            continue
+        if deleted:
+            return True
+    return False
+
+
+def promote(db_path, item_id, pinned=None, timestamp=None):
+    """Поднять элемент из архива в history.db; вернуть его id в горячей истории.
+
+    pinned/timestamp - новые значения (None - оставить). Элемент с тем же
+    содержимым уже в горячей истории - архивная копия удаляется, id - его.
+    """
+    cache_dir = Path(db_path).parent
+    for path in archive_paths(cache_dir):
+        conn = connect(db_path)
+        try:
+            try:
+                attach(conn, path)
+            except sqlite3.OperationalError:
+                continue
+            row = conn.execute('''
+                SELECT timestamp, mime_type, blob_name, preview, hash, display, codec, orig_size, content
+                FROM cold.items WHERE id = ?
+            ''', (item_id,)).fetchone()
+            if row is None:
+                continue
+            item_timestamp, mime_type, blob_name, preview, content_hash, display, codec, orig_size, content = row
+
+            existing = conn.execute('SELECT id FROM main.items WHERE hash = ?', (content_hash,)).fetchone()
+            content_path = None
+            if existing is None and blob_name and content is not None:
+                # Блоб возвращается в исходный каталог (images/, text/, other/) как есть
+                file_path = cache_dir / blob_name
+                if not file_path.exists():
+                    tmp_path = file_path.with_name(file_path.name + '.tmp')
+                    tmp_path.write_bytes(content)
+                    tmp_path.replace(file_path)
+                content_path = str(file_path)
+
+            with conn:
+                if not conn.execute('DELETE FROM cold.items WHERE id = ?', (item_id,)).rowcount:
+                    continue
+                if existing is not None:
+                    hot_id = existing[0]
+                    if pinned is not None:
+                        conn.execute('UPDATE main.items SET pinned = ? WHERE id = ?', (pinned, hot_id))
+                    return hot_id
+                conn.execute('''
+                    INSERT INTO main.items (id, timestamp, mime_type, content_path, preview, hash,
+                                            pinned, display, codec, orig_size)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (item_id, item_timestamp if timestamp is None else timestamp, mime_type, content_path,
+                      preview, content_hash, pinned or 0, display, codec, orig_size))
+                return item_id
+        finally:
+            conn.close()
+    return None
+
+
+class TierMigrator:
+    """Фоновый перенос вытесненных элементов в архив и очистка старых архивов"""
+
+    def __init__(self, monitor, months):
+        self.monitor = monitor
+        self.months = months
+        self.directory = archive_dir(monitor.cache_dir)
+        self.event = threading.Event()
+        self.stopped = False
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='tiers', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped = True
+        self.event.set()
+
+    def wake(self):
+        """Есть что переносить (вызывается очисткой в потоке мониторинга)"""
+        self.event.set()
+
+    def run(self):
+        while not self.stopped:
+            self.event.wait()
+            self.event.clear()
+            if self.stopped:
+                break
+            try:
+                with self.monitor.metrics.timer('archive'):
+                    moved = self.migrate()
+                    pruned = self.prune()
+                if self.monitor.config.get('debug') and (moved or pruned):
+                    print(f"🗄️  В архив: {moved}, удалено архивов: {pruned}")
+            except (OSError, sqlite3.Error) as e:
+                if self.monitor.config.get('debug'):
+                    print(f"Ошибка архивации: {e}")
+
+    def migrate(self):
+        """Перенести все вытесненные элементы; вернуть их число"""
+        moved = 0
+        self.directory.mkdir(exist_ok=True)
+        while not self.stopped:
+            conn = connect(self.monitor.db_path)
+            try:
+                stale = [item.id for item in self.monitor.stale_items()]
+                if not stale:
+                    break
+                count = self.move_batch(conn, stale[:MIGRATE_BATCH])
+            finally:
+                conn.close()
+            if not count:
+                break
+            moved += count
+        self.monitor.metrics.incr('archived', moved)
+        return moved
+
+    def move_batch(self, conn, item_ids):
+        """Перенести элементы по месяцам; файлы блобов удаляются после commit"""
+        placeholders = ','.join('?' * len(item_ids))
+        rows = conn.execute(f'''
+            SELECT id, timestamp, mime_type, content_path, preview, hash, display, codec, orig_size
+            FROM items WHERE id IN ({placeholders}) AND pinned = 0
+        ''', item_ids).fetchall()
+
+        months = {}
+        for row in rows:
+            months.setdefault(archive_month(row[1]), []).append(row)
+
+        moved = []
+        moved_images = []
+        for month, group in sorted(months.items()):
+            records = []
+            for item_id, timestamp, mime_type, content_path, preview, content_hash, display, codec, orig_size in group:
+                blob_name = content = None
+                if content_path:
+                    path = Path(content_path)
+                    try:
+                        content = path.read_bytes()
+                    except FileNotFoundError:
+                        content_path = None  # Блоб потерян - в архив уходит только превью
+                    else:
+                        blob_name = f'{path.parent.name}/{path.name}'
+                        orig_size = orig_size or len(content)
+                        # Несжатый текст и other/ в архиве сжимаются независимо от порога
+                        if codec is None and self.monitor.compression and not mime_type.startswith('image/'):
+                            codec, content = maybe_compress(content, self.monitor.compression)
+                            if codec:
+                                blob_name += CODEC_SUFFIXES[codec]
+                if mime_type.startswith('image/') and not display:
+                    # Окно показывает архивное изображение без файла - подписью
+                    display = f'[{mime_type}]'
+                records.append(((item_id, timestamp, mime_type, blob_name, preview, content_hash,
+                                 display, codec, orig_size, content), content_path))
+
+            attach(conn, self.directory / f'{month}.db', mode='rwc')
+            try:
+                conn.execute(ARCHIVE_SCHEMA.format(db='cold'))
+                conn.execute(ARCHIVE_INDEX.format(db='cold'))
+                unlink = []
+                with conn:
+                    for record, content_path in records:
+                        # Закреплён или удалён окном после выборки - остаётся как есть
+                        if not conn.execute('DELETE FROM main.items WHERE id = ? AND pinned = 0',
+                                            (record[0],)).rowcount:
+                            continue
+                        conn.execute('INSERT OR REPLACE INTO cold.items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                     record)
+                        moved.append(record[0])
+                        if record[2].startswith('image/'):
+                            moved_images.append(record[5])
+                        if content_path:
+                            unlink.append(content_path)
+            finally:
+                conn.execute('DETACH DATABASE cold')
+            for content_path in unlink:
+                Path(content_path).unlink(missing_ok=True)
+        if self.monitor.recent:
+            self.monitor.recent.discard(moved)
+        # Архивное изображение окно показывает подписью - миниатюра не нужна
+        self.monitor.remove_thumbnails(moved_images)
+        return len(moved)
+
+    def prune(self):
+        """Удалить архивы старше months месяцев; вернуть их число"""
+        now = time.localtime(self.monitor.clock())
+        oldest = now.tm_year * 12 + now.tm_mon - self.months
+        pruned = 0
+        for path in archive_paths(self.monitor.cache_dir):
+            year, month = map(int, path.stem.split('-'))
+            if year * 12 + month <= oldest:
+                path.unlink(missing_ok=True)
+                pruned += 1
+        return pruned
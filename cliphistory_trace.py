@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+ClipHistory - запись и воспроизведение трасс событий буфера обмена
+
+Трасса - gzip JSON Lines: заголовок и по строке на событие.
+Содержимое не записывается, только форма события:
+  capture - прочитано содержимое буфера: MIME, список целей (TARGETS),
+            размер и номер содержимого (один и тот же номер - одинаковый
+            хеш, т.е. повтор, который отсечёт дедупликация)
+  restore - демон сам сделал элемент содержимым буфера
+Номера выдаются по порядку появления, сами хеши в трассу не попадают.
+
+Воспроизведение прогоняет трассу через ClipboardMonitor.save_to_history
+(дедупликация, запись блобов и БД) и cleanup_old на виртуальных часах
+трассы - с исходной скоростью, ускоренно (--speed N) или без пауз
+(--speed 0). Содержимое синтезируется детерминированно по номеру и
+размеру, поэтому прогоны разных версий сравнимы между собой.
+
+Запуск:
+    python3 cliphistory_new.py --trace FILE          # запись с самого старта
+    python3 cliphistory_trace.py record start|stop|status [--path FILE]
+    python3 cliphistory_trace.py summary FILE
+    python3 cliphistory_trace.py replay FILE [--speed 10] [--json]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+
+TRACE_FORMAT = 'cliphistory-trace'
+TRACE_VERSION = 1
+
+# Сброс буфера gzip на диск не чаще раза в FLUSH_INTERVAL секунд
+FLUSH_INTERVAL = 1.0
+
+# Период cleanup_old в monitor_loop (виртуальные секунды трассы)
+CLEANUP_INTERVAL = 30
+
+
+def traces_dir():
+    """Каталог трасс по умолчанию"""
+    return Path.home() / '.cache' / 'cliphistory' / 'traces'
+
+
+class TraceRecorder:
+    """Запись событий захвата в трассу (потокобезопасно)"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.file = gzip.open(self.path, 'wt', encoding='utf-8')
+        self.started = time.time()
+        self.origin = time.monotonic()
+        self.last_flush = self.origin
+        self.content_ids = {}  # хеш -> номер содержимого
+        self.events = 0
+        self._write({'format': TRACE_FORMAT, 'version': TRACE_VERSION, 'started': self.started})
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def _content_id(self, content_hash):
+        content_id = self.content_ids.get(content_hash)
+        if content_id is None:
+            content_id = self.content_ids[content_hash] = len(self.content_ids)
+        return content_id
+
+    def _event(self, kind, mime_type, size, content_hash, **extra):
+        now = time.monotonic()
+        with self.lock:
+            if self.file is None:
+                return
+            record = {'t': round(now - self.origin, 4), 'e': kind, 'm': mime_type,
+                      'n': size, 'h': self._content_id(content_hash)}
+            record.update(extra)
+            self._write(record)
+            self.events += 1
+            # Трасса должна переживать kill демона - сбрасываем буфер регулярно
+            if now - self.last_flush >= FLUSH_INTERVAL:
+                self.file.flush()
+                self.last_flush = now
+
+    def capture(self, targets, mime_type, size, content_hash):
+        self._event('capture', mime_type, size, content_hash, targets=targets)
+
+    def restore(self, mime_type, size, content_hash):
+        self._event('restore', mime_type, size, content_hash)
+
+    def status(self):
+        return {
+            'active': self.file is not None,
+            'path': str(self.path),
+            'events': self.events,
+            'contents': len(self.content_ids),
+        }
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def read_trace(path):
+    """(заголовок, события); оборванный конец трассы (kill демона) допустим"""
+    header = None
+    events = []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # Недописанная последняя строка
+                if header is None:
+                    if record.get('format') != TRACE_FORMAT:
+                        raise ValueError(f'{path}: не трасса ClipHistory')
+                    header = record
+                else:
+                    events.append(record)
+        except (EOFError, zlib.error):
+            pass
+    if header is None:
+        raise ValueError(f'{path}: пустая трасса')
+    return header, events
+
+
+def synth_content(content_id, size):
+    """Детерминированное содержимое: один номер - одни и те же байты"""
+    head = f'{content_id:x}:'.encode()
+    return (head + b'x' * max(0, size - len(head)))[:max(size, 1)]
+
+
+def summarize(header, events):
+    """Сводка трассы: число событий, повторы, объём, распределение MIME"""
+    captures = [e for e in events if e['e'] == 'capture']
+    seen = set()
+    repeats = 0
+    previous = None
+    for event in captures:
+        if event['h'] == previous:
+            repeats += 1
+        previous = event['h']
+        seen.add(event['h'])
+    mime_types = {}
+    for event in captures:
+        mime_types[event['m']] = mime_types.get(event['m'], 0) + 1
+    duration = events[-1]['t'] if events else 0.0
+    return {
+        'started': header['started'],
+        'duration_s': duration,
+        'events': len(events),
+        'captures': len(captures),
+        'restores': len(events) - len(captures),
+        'unique_contents': len(seen),
+        'consecutive_repeats': repeats,
+        'captured_bytes': sum(e['n'] for e in captures),
+        'max_size': max((e['n'] for e in captures), default=0),
+        'mime_types': mime_types,
+    }
+
+
+class TraceReplayer:
+    """Прогон трассы через конвейер ClipboardMonitor"""
+
+    def __init__(self, path):
+        self.path = path
+        self.header, self.events = read_trace(path)
+
+    def replay(self, monitor, speed=1.0):
+        """Воспроизвести трассу; speed=0 - без пауз.
+
+        Часы монитора подменяются виртуальными часами трассы: метки
+        времени элементов и срок хранения (cleanup_days) считаются так,
+        как в исходной сессии, независимо от скорости.
+        """
+        started = self.header['started']
+        virtual_now = started
+        monitor.clock = lambda: virtual_now
+
+        captured_before = monitor.metrics.counters.get('captures', 0)
+        unchanged_before = monitor.metrics.counters.get('unchanged', 0)
+        next_cleanup = CLEANUP_INTERVAL
+        fed_bytes = 0
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+
+        for event in self.events:
+            if speed > 0:
+                delay = event['t'] / speed - (time.perf_counter() - wall_start)
+                if delay > 0:
+                    time.sleep(delay)
+            virtual_now = started + event['t']
+
+            while event['t'] >= next_cleanup:
+                with monitor.metrics.timer('cleanup'):
+                    monitor.cleanup_old()
+                next_cleanup += CLEANUP_INTERVAL
+
+            content = synth_content(event['h'], event['n'])
+            if event['e'] == 'restore':
+                # Как restore_item: своё восстановление не считается новым захватом
+                monitor.last_content_hash = hashlib.md5(content).hexdigest()
+                continue
+            fed_bytes += len(content)
+            with monitor.metrics.timer('save'):
+                monitor.save_to_history(event['m'], content)
+
+        with monitor.metrics.timer('cleanup'):
+            monitor.cleanup_old()
+        elapsed = time.perf_counter() - wall_start
+        return {
+            'events': len(self.events),
+            'speed': speed,
+            'wall_s': round(elapsed, 3),
+            'cpu_s': round(time.process_time() - cpu_start, 3),
+            'events_per_s': round(len(self.events) / elapsed, 1) if elapsed else None,
+            'fed_mb': round(fed_bytes / 1024 / 1024, 2),
+            'stored': monitor.metrics.counters.get('captures', 0) - captured_before,
+            'deduplicated': monitor.metrics.counters.get('unchanged', 0) - unchanged_before,
+        }
+
+
+def retention(monitor):
+    """Что осталось в истории после прогона"""
+    kinds = {}
+    for item in monitor.storage.iterate():
+        kind = item.mime_type.split('/')[0]
+        kind = kind if kind in ('image', 'text') else 'other'
+        kinds[kind] = kinds.get(kind, 0) + 1
+    storage = sum(p.stat().st_size for p in monitor.cache_dir.rglob('*') if p.is_file())
+    return {'items': kinds, 'storage_bytes': storage}
+
+
+def load_config(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ClipHistory - трассы событий буфера обмена')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = sub.add_parser('record', help='управление записью в работающем демоне')
+    record_parser.add_argument('action', choices=['start', 'stop', 'status'])
+    record_parser.add_argument('--path', help=f'файл трассы (по умолчанию {traces_dir()}/trace-*.jsonl.gz)')
+
+    summary_parser = sub.add_parser('summary', help='сводка трассы')
+    summary_parser.add_argument('trace')
+
+    replay_parser = sub.add_parser('replay', help='прогнать трассу через конвейер захвата')
+    replay_parser.add_argument('trace')
+    replay_parser.add_argument('--speed', type=float, default=0.0,
+                               help='1 - исходная скорость, N - в N раз быстрее, 0 - без пауз (по умолчанию)')
+    replay_parser.add_argument('--config', default=str(Path(__file__).resolve().parent / 'config.json'),
+                               help='config.json с лимитами хранения')
+    replay_parser.add_argument('--cache-dir', help='каталог истории (по умолчанию временный)')
+    replay_parser.add_argument('--json', action='store_true', help='вывод в JSON')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        from cliphistory_ipc import send_command
+
+        params = {'path': args.path} if args.path else {}
+        try:
+            response = send_command('trace', timeout=2.0, action=args.action, **params)
+        except (OSError, ValueError):
+            print("ClipHistory не запущен")
+            sys.exit(1)
+        if not response.get('ok'):
+            print(f"❌ {response.get('error')}")
+            sys.exit(1)
+        state = 'идёт' if response.get('active') else 'остановлена'
+        print(f"Запись {state}: {response.get('path') or '-'}, событий {response.get('events', 0)}")
+        return
+
+    if args.command == 'summary':
+        print(json.dumps(summarize(*read_trace(args.trace)), indent=2, ensure_ascii=False))
+        return
+
+    from cliphistory_metrics import Metrics
+    from cliphistory_new import ClipboardMonitor
+
+    config = dict(load_config(args.config), debug=False)
+    replayer = TraceReplayer(args.trace)
+    with tempfile.TemporaryDirectory(prefix='cliphistory-replay-') as tmp:
+        monitor = ClipboardMonitor(config, cache_dir=args.cache_dir or tmp)
+        monitor.metrics = Metrics(enabled=True)
+        result = replayer.replay(monitor, speed=args.speed)
+        result['retention'] = retention(monitor)
+        result['stages'] = monitor.metrics.snapshot()['stages']
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"Событий {result['events']} за {result['wall_s']} с ({result['events_per_s']} соб/с), "
+          f"CPU {result['cpu_s']} с, подано {result['fed_mb']} МБ")
+    print(f"Сохранено {result['stored']}, отсечено дедупликацией {result['deduplicated']}")
+    kinds = ', '.join(f'{kind} {count}' for kind, count in sorted(result['retention']['items'].items()))
+    print(f"В истории: {kinds or 'пусто'}, {result['retention']['storage_bytes'] / 1024:.0f} КБ")
+    for stage, s in result['stages'].items():
+        print(f"  {stage:<12} p50 {s['p50_ms']:.2f} мс, p95 {s['p95_ms']:.2f} мс, max {s['max_ms']:.2f} мс")
+
+
+if __name__ == '__main__':
+    main()
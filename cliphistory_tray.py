@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+ClipHistory - иконка демона в системном трее
+
+Загружается демоном только в обычном режиме: в --headless ни Qt,
+ни этот модуль не импортируются.
+"""
+
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+from PyQt5.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QAction, QActionGroup
+from PyQt5.QtGui import QIcon, QPixmap, QPainter
+from PyQt5.QtCore import Qt, QByteArray, QTimer
+from PyQt5.QtSvg import QSvgRenderer
+
+
+class DaemonTray:
+    """Qt приложение с иконкой в трее для ClipHistoryDaemon"""
+    
+    def __init__(self, daemon):
+        self.daemon = daemon
+        self.config = daemon.config
+        self.script_path = daemon.script_path
+        
+        self.app = None
+        self.profiling_timer = None
+        self.tray_icon = None
+        self.tray_menu = None
+    
+    def start(self):
+        """Создать QApplication и иконку; False - трей недоступен"""
+        self.app = QApplication(sys.argv)
+        self.app.setQuitOnLastWindowClosed(False)  # Не закрывать при закрытии окон
+        
+        # Таймер возвращает управление Python: доставка SIGUSR1/SIGUSR2
+        # и подключение Qt-потока к сессии cProfile
+        self.profiling_timer = QTimer()
+        self.profiling_timer.timeout.connect(self.daemon.profiling.checkpoint)
+        self.profiling_timer.start(500)
+        return self.create_tray_icon()
+    
+    def exec_(self):
+        """Event loop Qt (блокирующий)"""
+        return self.app.exec_()
+    
+    def quit(self):
+        if self.tray_icon:
+            self.tray_icon.hide()
+        if self.app:
+            self.app.quit()
+    
+    def create_tray_icon(self):
+        """Создать иконку в системном трее"""
+        if not QSystemTrayIcon.isSystemTrayAvailable():
+            return False
+        
+        # Определяем тему панели через gsettings
+        is_dark_panel = True  # По умолчанию темная
+        try:
+            result = subprocess.run(
+                ['gsettings', 'get', 'org.cinnamon.desktop.interface', 'gtk-theme'],
+                capture_output=True, text=True, timeout=1
+            )
+            if result.returncode == 0:
+                theme_name = result.stdout.strip().strip("'")
+                theme_path = Path(f'/usr/share/themes/{theme_name}/gtk-3.0/gtk.css')
+                if theme_path.exists():
+                    content = theme_path.read_text()
+                    match = re.search(r'@define-color\s*(?:theme_bg_color|bg_color)\s*#([0-9a-fA-F]{6});', content)
+                    if match:
+                        hex_color = match.group(1)
+                        r, g, b = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+                        is_dark_panel = (r + g + b) / 3 < 128
+        except:
+            pass
+        
+        # Выбираем цвет иконки в зависимости от темы панели
+        icon_color = '#ffffff' if is_dark_panel else '#2b2b2b'
+        
+        # SVG иконка с адаптивным цветом
+        svg_data = f'''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24">
+            <path fill="{icon_color}" d="M19 3H14.82C14.4 1.84 13.3 1 12 1S9.6 1.84 9.18 3H5C3.9 3 3 3.9 3 5V19C3 20.1 3.9 21 5 21H19C20.1 21 21 20.1 21 19V5C21 3.9 20.1 3 19 3M12 3C12.55 3 13 3.45 13 4S12.55 5 12 5 11 4.55 11 4 11.45 3 12 3M7 7H17V5H19V19H5V5H7V7M7 9V11H17V9H7M7 13V15H17V13H7Z" />
+        </svg>'''
+        
+        renderer = QSvgRenderer(QByteArray(svg_data.encode()))
+        pixmap = QPixmap(64, 64)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        renderer.render(painter)
+        painter.end()
+        
+        self.tray_icon = QSystemTrayIcon(QIcon(pixmap))
+        self.tray_icon.setToolTip('ClipHistory - Демон активен')
+        
+        # Меню трея (сохраняем как атрибут!)
+        self.tray_menu = QMenu()
+        
+        # Стиль темного меню
+        self.tray_menu.setStyleSheet("""
+            QMenu {
+                background-color: #2b2b2b;
+                color: #ffffff;
+                border: 1px solid #404040;
+                border-radius: 8px;
+                padding: 8px 0px;
+            }
+            QMenu::item {
+                padding: 8px 32px 8px 16px;
+                background-color: transparent;
+            }
+            QMenu::item:selected {
+                background-color: #0078d4;
+                border-radius: 4px;
+                margin: 0px 4px;
+            }
+            QMenu::item:pressed {
+                background-color: #0063b1;
+            }
+            QMenu::separator {
+                height: 1px;
+                background-color: #404040;
+                margin: 4px 8px;
+            }
+        """)
+        
+        show_action = QAction('Открыть историю', self.tray_menu)
+        show_action.triggered.connect(self.daemon.launch_ui)
+        self.tray_menu.addAction(show_action)
+        
+        self.tray_menu.addSeparator()
+        
+        # Подменю масштабирования
+        scale_menu = QMenu('Масштаб интерфейса', self.tray_menu)
+        scale_menu.setStyleSheet(self.tray_menu.styleSheet())
+        
+        # Создаем группу для радио-кнопок (взаимоисключающий выбор)
+        scale_group = QActionGroup(scale_menu)
+        scale_group.setExclusive(True)
+        
+        current_scale = self.config.get('ui_scale', 1.5)
+        
+        for scale_value in [1.0, 1.25, 1.5, 2.0]:
+            scale_action = QAction(f'{scale_value}x', scale_menu)
+            scale_action.setCheckable(True)
+            scale_action.setActionGroup(scale_group)  # Добавляем в группу
+            if abs(current_scale - scale_value) < 0.01:
+                scale_action.setChecked(True)
+            scale_action.triggered.connect(lambda checked, s=scale_value: self.change_ui_scale(s))
+            scale_menu.addAction(scale_action)
+        
+        self.tray_menu.addMenu(scale_menu)
+        
+        self.tray_menu.addSeparator()
+        
+        quit_action = QAction('Выход', self.tray_menu)
+        quit_action.triggered.connect(self.daemon.quit_daemon)
+        self.tray_menu.addAction(quit_action)
+        
+        self.tray_icon.setContextMenu(self.tray_menu)
+        self.tray_icon.activated.connect(self.on_tray_clicked)
+        self.tray_icon.show()
+        
+        print("📌 Иконка в трее создана")
+        return True
+    
+    def on_tray_clicked(self, reason):
+        """Обработка клика по трею"""
+        if reason == QSystemTrayIcon.Trigger:  # Левый клик
+            self.daemon.launch_ui()
+    
+    def change_ui_scale(self, scale):
+        """Изменить масштаб интерфейса"""
+        try:
+            # Обновляем конфигурацию
+            self.config['ui_scale'] = scale
+            
+            # Сохраняем в файл
+            config_path = self.script_path.parent / 'config.json'
+            with open(config_path, 'w') as f:
+                json.dump(self.config, f, indent=2)
+            
+            # Показываем уведомление через трей
+            if self.tray_icon:
+                self.tray_icon.showMessage(
+                    'Масштаб изменен',
+                    f'Масштаб интерфейса установлен на {scale}x.\nИзменения вступят в силу при следующем открытии окна.',
+                    QSystemTrayIcon.Information,
+                    3000
+                )
+            
+            if self.config.get('debug'):
+                print(f"✅ Масштаб изменен на {scale}x")
+        except Exception as e:
+            if self.config.get('debug'):
+                print(f"Ошибка изменения масштаба: {e}")
@@ -5,29 +5,466 @@ ClipHistory Qt UI - современный дизайн как в Windows
 
 from PyQt5.QtWidgets import (QApplication, QWidget, QListWidget, QListWidgetItem,
                              QVBoxLayout, QHBoxLayout, QLabel, QFrame, QPushButton, 
-                             QFileDialog, QSystemTrayIcon, QMenu, QAction)
-from PyQt5.QtCore import Qt, QSize, pyqtSignal, QByteArray, QTimer
-from PyQt5.QtGui import QPixmap, QIcon, QPalette, QColor, QFont, QPainter
-from PyQt5.QtSvg import QSvgRenderer
+                             QFileDialog, QSystemTrayIcon, QMenu, QAction, QAbstractItemView,
+                             QSizePolicy, QDesktopWidget)
+from PyQt5.QtCore import (Qt, QSize, pyqtSignal, QByteArray, QTimer, QObject, QRunnable, QThreadPool,
+                          QSocketNotifier)
+from PyQt5.QtGui import (QPixmap, QIcon, QPalette, QColor, QFont, QPainter, QImage, QImageReader,
+                         QPixmapCache, QFontMetrics)
 
 import subprocess
-import sqlite3
 import json
 import sys
 import os
-import shutil
+import select
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
 from pathlib import Path
-from PIL import Image
+
+from cliphistory_blobs import BlobView, export_blob
+from cliphistory_ipc import SingleInstance, notify_ui, ping, send_command, start_daemon
+from cliphistory_profiling import ProfilingHooks
+from cliphistory_storage import open_storage
+
+try:
+    from Xlib import X, XK, display
+    from Xlib.ext import xtest
+    from Xlib.protocol import event as xevent
+    XLIB_AVAILABLE = True
+except ImportError:
+    XLIB_AVAILABLE = False
+
+# SVG иконки Material Design Icons
+SVG_ICONS = {
+    'trash': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M9,3V4H4V6H5V19A2,2 0 0,0 7,21H17A2,2 0 0,0 19,19V6H20V4H15V3H9M7,6H17V19H7V6M9,8V17H11V8H9M13,8V17H15V8H13Z" /></svg>''',
+    'pin': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M16,12V4H17V2H7V4H8V12L6,14V16H11.2V22H12.8V16H18V14L16,12Z" /></svg>''',
+    'pin-off': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M2,5.27L3.28,4L20,20.72L18.73,22L12.8,16.07V22H11.2V16H6V14L8,12V11.27L2,5.27M16,12L18,14V16H17.82L8,6.18V4H7V2H17V4H16V12Z" /></svg>''',
+    'download': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M5,20H19V18H5M19,9H15V3H9V9H5L12,16L19,9Z" /></svg>''',
+    'clipboard': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M19 3H14.82C14.4 1.84 13.3 1 12 1S9.6 1.84 9.18 3H5C3.9 3 3 3.9 3 5V19C3 20.1 3.9 21 5 21H19C20.1 21 21 20.1 21 19V5C21 3.9 20.1 3 19 3M12 3C12.55 3 13 3.45 13 4S12.55 5 12 5 11 4.55 11 4 11.45 3 12 3M7 7H17V5H19V19H5V5H7V7M7 9V11H17V9H7M7 13V15H17V13H7Z" /></svg>''',
+    'close': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M19,6.41L17.59,5L12,10.59L6.41,5L5,6.41L10.59,12L5,17.59L6.41,19L12,13.41L17.59,19L19,17.59L13.41,12L19,6.41Z" /></svg>''',
+    'text': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M14,17H7V15H14M17,13H7V11H17M17,9H7V7H17M19,3H5C3.89,3 3,3.89 3,5V19A2,2 0 0,0 5,21H19A2,2 0 0,0 21,19V5C21,3.89 20.1,3 19,3Z" /></svg>''',
+    'image': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M8.5,13.5L11,16.5L14.5,12L19,18H5M21,19V5C21,3.89 20.1,3 19,3H5A2,2 0 0,0 3,5V19A2,2 0 0,0 5,21H19A2,2 0 0,0 21,19Z" /></svg>''',
+    'link': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M10.59,13.41C11,13.8 11,14.44 10.59,14.83C10.2,15.22 9.56,15.22 9.17,14.83C7.22,12.88 7.22,9.71 9.17,7.76V7.76L12.71,4.22C14.66,2.27 17.83,2.27 19.78,4.22C21.73,6.17 21.73,9.34 19.78,11.29L18.29,12.78C18.3,11.96 18.17,11.14 17.89,10.36L18.36,9.88C19.54,8.71 19.54,6.81 18.36,5.64C17.19,4.46 15.29,4.46 14.12,5.64L10.59,9.17C9.41,10.34 9.41,12.24 10.59,13.41M13.41,9.17C13.8,8.78 14.44,8.78 14.83,9.17C16.78,11.12 16.78,14.29 14.83,16.24V16.24L11.29,19.78C9.34,21.73 6.17,21.73 4.22,19.78C2.27,17.83 2.27,14.66 4.22,12.71L5.71,11.22C5.7,12.04 5.83,12.86 6.11,13.65L5.64,14.12C4.46,15.29 4.46,17.19 5.64,18.36C6.81,19.54 8.71,19.54 9.88,18.36L13.41,14.83C14.59,13.66 14.59,11.76 13.41,10.59C13,10.2 13,9.56 13.41,9.17Z" /></svg>''',
+    'link-variant': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M3.9,12C3.9,10.29 5.29,8.9 7,8.9H11V7H7A5,5 0 0,0 2,12A5,5 0 0,0 7,17H11V15.1H7C5.29,15.1 3.9,13.71 3.9,12M8,13H16V11H8V13M17,7H13V8.9H17C18.71,8.9 20.1,10.29 20.1,12C20.1,13.71 18.71,15.1 17,15.1H13V17H17A5,5 0 0,0 22,12A5,5 0 0,0 17,7Z" /></svg>''',
+    'web': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M16.36,14C16.44,13.34 16.5,12.68 16.5,12C16.5,11.32 16.44,10.66 16.36,10H19.74C19.9,10.64 20,11.31 20,12C20,12.69 19.9,13.36 19.74,14M14.59,19.56C15.19,18.45 15.65,17.25 15.97,16H18.92C17.96,17.65 16.43,18.93 14.59,19.56M14.34,14H9.66C9.56,13.34 9.5,12.68 9.5,12C9.5,11.32 9.56,10.65 9.66,10H14.34C14.43,10.65 14.5,11.32 14.5,12C14.5,12.68 14.43,13.34 14.34,14M12,19.96C11.17,18.76 10.5,17.43 10.09,16H13.91C13.5,17.43 12.83,18.76 12,19.96M8,8H5.08C6.03,6.34 7.57,5.06 9.4,4.44C8.8,5.55 8.35,6.75 8,8M5.08,16H8C8.35,17.25 8.8,18.45 9.4,19.56C7.57,18.93 6.03,17.65 5.08,16M4.26,14C4.1,13.36 4,12.69 4,12C4,11.31 4.1,10.64 4.26,10H7.64C7.56,10.66 7.5,11.32 7.5,12C7.5,12.68 7.56,13.34 7.64,14M12,4.03C12.83,5.23 13.5,6.57 13.91,8H10.09C10.5,6.57 11.17,5.23 12,4.03M18.92,8H15.97C15.65,6.75 15.19,5.55 14.59,4.44C16.43,5.07 17.96,6.34 18.92,8M12,2C6.47,2 2,6.5 2,12A10,10 0 0,0 12,22A10,10 0 0,0 22,12A10,10 0 0,0 12,2Z" /></svg>''',
+    'file': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M13,9V3.5L18.5,9M6,2C4.89,2 4,2.89 4,4V20A2,2 0 0,0 6,22H18A2,2 0 0,0 20,20V8L14,2H6Z" /></svg>'''
+}
+
+
+class IconCache:
+    """Кэш растеризованных SVG иконок на весь процесс.
+    
+    Ключ - (name, color, size, devicePixelRatio). Отрисованные иконки
+    дополнительно сохраняются PNG в ~/.cache/cliphistory/icons, поэтому
+    при следующих запусках UI QtSvg вообще не загружается. В имени PNG -
+    crc32 разметки SVG: изменённая в новой версии иконка рисуется заново.
+    """
+    
+    def __init__(self, cache_dir):
+        self.icons_dir = Path(cache_dir) / 'icons'
+        self.pixmaps = {}
+    
+    def pixmap(self, name, color, size):
+        app = QApplication.instance()
+        dpr = app.devicePixelRatio() if app else 1.0
+        key = (name, color, size, dpr)
+        pixmap = self.pixmaps.get(key)
+        if pixmap is None:
+            pixmap = self.load_or_render(name, color, size, dpr)
+            self.pixmaps[key] = pixmap
+        return pixmap
+    
+    def warm(self, specs):
+        """Растеризовать заранее список (name, color, size)"""
+        for name, color, size in specs:
+            self.pixmap(name, color, size)
+    
+    def load_or_render(self, name, color, size, dpr):
+        device_size = max(1, int(round(size * dpr)))
+        svg_crc = zlib.crc32(SVG_ICONS.get(name, '').encode())
+        disk_path = self.icons_dir / f"{name}-{color.lstrip('#')}-{device_size}-{svg_crc:08x}.png"
+        
+        pixmap = QPixmap(str(disk_path)) if disk_path.exists() else QPixmap()
+        if pixmap.isNull():
+            pixmap = self.render(name, color, device_size)
+            try:
+                self.icons_dir.mkdir(parents=True, exist_ok=True)
+                pixmap.save(str(disk_path), 'PNG')
+            except Exception:
+                pass
+        pixmap.setDevicePixelRatio(dpr)
+        return pixmap
+    
+    @staticmethod
+    def render(name, color, device_size):
+        # QtSvg нужен только при промахе обоих уровней кэша
+        from PyQt5.QtSvg import QSvgRenderer
+        
+        svg_data = SVG_ICONS.get(name, '').format(color=color)
+        renderer = QSvgRenderer(QByteArray(svg_data.encode()))
+        pixmap = QPixmap(device_size, device_size)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        renderer.render(painter)
+        painter.end()
+        return pixmap
+
+
+ICON_CACHE = IconCache(Path.home() / '.cache' / 'cliphistory')
+
+
+_FONT_METRICS = {}
+
+
+def font_metrics(family, size, weight):
+    """QFontMetrics для шрифта (создаются один раз на процесс)"""
+    key = (family, size, weight)
+    metrics = _FONT_METRICS.get(key)
+    if metrics is None:
+        metrics = QFontMetrics(QFont(family, size, weight))
+        _FONT_METRICS[key] = metrics
+    return metrics
+
+
+def wrap_preview(text, metrics, available_width, max_lines):
+    """Разбить текст на строки по ширине и оставить первые max_lines"""
+    lines = []
+    for paragraph in text.split('\n'):
+        if not paragraph.strip():
+            lines.append('')
+            if len(lines) >= max_lines:
+                break
+            continue
+        
+        words = paragraph.split(' ')
+        current_line = ''
+        
+        for word in words:
+            test_line = current_line + (' ' if current_line else '') + word
+            if metrics.horizontalAdvance(test_line) <= available_width:
+                current_line = test_line
+            else:
+                if current_line:
+                    lines.append(current_line)
+                    if len(lines) >= max_lines:
+                        break
+                # Если слово слишком длинное - берём его целиком как строку
+                current_line = word
+        
+        if len(lines) >= max_lines:
+            break
+        if current_line:
+            lines.append(current_line)
+    
+    return '\n'.join(lines[:max_lines])
+
+
+class PreviewLayoutCache:
+    """Мемоизация разбитого на строки текста превью.
+    
+    Ключ - (item, ширина, шрифт, масштаб, строк): при обновлении списка
+    и ресайзе неизменившиеся строки не измеряются повторно.
+    """
+    
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+    
+    def layout(self, item_id, text, metrics, available_width, max_lines, font_key, scale):
+        key = (item_id, available_width, font_key, scale, max_lines)
+        truncated = self.entries.get(key)
+        if truncated is not None:
+            self.entries.move_to_end(key)
+            return truncated
+        
+        truncated = wrap_preview(text, metrics, available_width, max_lines)
+        self.entries[key] = truncated
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return truncated
+
+
+PREVIEW_LAYOUT_CACHE = PreviewLayoutCache()
+
+
+def longest_increasing_subsequence(values):
+    """Индексы наибольшей строго возрастающей подпоследовательности"""
+    tails = []       # индекс последнего элемента подпоследовательности длины k+1
+    prev = [-1] * len(values)
+    for i, value in enumerate(values):
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if values[tails[mid]] < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo > 0:
+            prev[i] = tails[lo - 1]
+        if lo == len(tails):
+            tails.append(i)
+        else:
+            tails[lo] = i
+    
+    result = []
+    i = tails[-1] if tails else -1
+    while i != -1:
+        result.append(i)
+        i = prev[i]
+    return result[::-1]
+
+
+class HistoryLoaderSignals(QObject):
+    """Сигналы фоновых загрузчиков (доставляются в GUI-поток)"""
+    rows_loaded = pyqtSignal(int, list, bool)       # generation, rows, final
+    image_loaded = pyqtSignal(int, str, QImage)     # item_id, ключ миниатюры, image
+
+
+class HistoryLoader(QRunnable):
+    """Чтение истории вне GUI-потока.
+    
+    Список берётся из памяти демона (команда "recent"), без диска. Без
+    демона - из хранилища: первые first_batch строк отдаются сразу, чтобы
+    первый экран появился до того, как прочитан и подготовлен весь
+    список. Если горячей истории меньше limit, список дополняется из
+    архива (без файлов блобов).
+    """
+    
+    def __init__(self, storage, generation, signals, first_batch=0, limit=50):
+        super().__init__()
+        self.storage = storage
+        self.generation = generation
+        self.signals = signals
+        self.first_batch = first_batch
+        self.limit = limit
+    
+    @staticmethod
+    def prepare_row(row):
+        item_id, mime_type, content_path, preview, pinned, timestamp, display = row
+        # Старые записи без display показываем по урезанному preview
+        return (item_id, mime_type, content_path, preview or '', pinned, timestamp,
+                display if display is not None else (preview or '')[:1000])
+    
+    @classmethod
+    def prepare_item(cls, item):
+        return cls.prepare_row((item.id, item.mime_type, item.content_path, item.preview,
+                                item.pinned, item.timestamp, item.display))
+    
+    def load_recent(self):
+        """Строки из памяти демона или None (демон не запущен)"""
+        try:
+            response = send_command('recent', timeout=0.5, limit=self.limit)
+        except (OSError, ValueError):
+            return None
+        if not response.get('ok'):
+            return None
+        return [self.prepare_row(row) for row in response['items']]
+    
+    def load_storage(self):
+        """Строки из хранилища, первый экран - отдельной порцией"""
+        rows = []
+        if self.first_batch:
+            rows = [self.prepare_item(item) for item in self.storage.list_page(self.first_batch)]
+            self.signals.rows_loaded.emit(self.generation, rows, False)
+        return rows + [self.prepare_item(item)
+                       for item in self.storage.list_page(self.limit - len(rows), len(rows))]
+    
+    def run(self):
+        rows = []
+        try:
+            rows = self.load_recent()
+            if rows is None:
+                rows = self.load_storage()
+            
+            if len(rows) < self.limit:
+                cold = self.storage.iter_cold('id, mime_type, NULL, preview, 0, timestamp, display')
+                rows += [self.prepare_row(row) for row, _ in zip(cold, range(self.limit - len(rows)))]
+        except Exception as e:
+            print(f"Load error: {e}")
+        self.signals.rows_loaded.emit(self.generation, rows, True)
+
+
+class ThumbnailCache:
+    """Двухуровневый кэш миниатюр изображений.
+    
+    Ключ - (hash, ширина, высота, масштаб). Первый уровень - QPixmapCache
+    (LRU в памяти с лимитом в килобайтах, только GUI-поток), второй -
+    PNG-файлы уже масштабированных миниатюр в ~/.cache/cliphistory/thumbs,
+    переживающие перезапуск UI.
+    """
+    
+    def __init__(self, cache_dir, limit_kb):
+        self.thumbs_dir = Path(cache_dir) / 'thumbs'
+        self.thumbs_dir.mkdir(parents=True, exist_ok=True)
+        QPixmapCache.setCacheLimit(limit_kb)
+    
+    @staticmethod
+    def key(image_hash, width, height, scale):
+        return f"{image_hash}-{width}x{height}@{scale:g}"
+    
+    def disk_path(self, key):
+        return self.thumbs_dir / f"{key}.png"
+    
+    def find(self, key):
+        """Найти миниатюру в памяти (GUI-поток)"""
+        pixmap = QPixmapCache.find('thumb:' + key)
+        if pixmap is None or pixmap.isNull():
+            return None
+        return pixmap
+    
+    def insert(self, key, pixmap):
+        """Положить миниатюру в память (GUI-поток)"""
+        QPixmapCache.insert('thumb:' + key, pixmap)
+    
+    def remove(self, image_hash):
+        """Удалить все миниатюры изображения с диска"""
+        for path in self.thumbs_dir.glob(f"{image_hash}-*.png"):
+            try:
+                path.unlink()
+            except Exception:
+                pass
+
+
+class ThumbnailLoader(QRunnable):
+    """Получение миниатюры вне GUI-потока: с диска или из оригинала"""
+    
+    def __init__(self, item_id, image_path, key, disk_path, available_width, min_height, max_height, signals):
+        super().__init__()
+        self.item_id = item_id
+        self.image_path = image_path
+        self.key = key
+        self.disk_path = disk_path
+        self.available_width = available_width
+        self.min_height = min_height
+        self.max_height = max_height
+        self.signals = signals
+    
+    def run(self):
+        # Второй уровень кэша - уже масштабированный PNG
+        image = QImage(str(self.disk_path)) if self.disk_path.exists() else QImage()
+        if image.isNull():
+            image = self.decode_original()
+            if image.isNull():
+                return
+            try:
+                tmp_path = self.disk_path.with_suffix('.tmp')
+                if image.save(str(tmp_path), 'PNG'):
+                    os.replace(tmp_path, self.disk_path)
+            except Exception:
+                pass
+        self.signals.image_loaded.emit(self.item_id, self.key, image)
+    
+    def decode_original(self):
+        reader = QImageReader(str(self.image_path))
+        size = reader.size()
+        if not size.isValid() or size.width() <= 0:
+            return QImage()
+        
+        aspect_ratio = size.height() / size.width()
+        scaled_height = int(self.available_width * aspect_ratio)
+        # Ограничиваем высоту
+        container_height = max(self.min_height, min(scaled_height, self.max_height))
+        
+        # Декодируем сразу в нужный размер (для JPEG - без полного декодирования)
+        size.scale(self.available_width, container_height, Qt.KeepAspectRatio)
+        reader.setScaledSize(size)
+        return reader.read()
+
+
+class X11PasteEngine:
+    """Возврат фокуса и вставка Ctrl+V внутри процесса.
+    
+    Окно активируется через EWMH _NET_ACTIVE_WINDOW, после чего ждём
+    реального PropertyNotify об изменении активного окна (с таймаутом)
+    вместо фиксированных пауз, и вводим Ctrl+V через XTest. Заменяет
+    три запуска xdotool на каждую вставку.
+    """
+    
+    def __init__(self):
+        self.display = display.Display()
+        if not self.display.has_extension('XTEST'):
+            raise RuntimeError('XTEST недоступен')
+        self.root = self.display.screen().root
+        self.net_active_window = self.display.intern_atom('_NET_ACTIVE_WINDOW')
+        self.ctrl_keycode = self.display.keysym_to_keycode(XK.XK_Control_L)
+        self.v_keycode = self.display.keysym_to_keycode(XK.string_to_keysym('v'))
+        # Изменения _NET_ACTIVE_WINDOW приходят как PropertyNotify на root
+        self.root.change_attributes(event_mask=X.PropertyChangeMask)
+        self.display.flush()
+    
+    @classmethod
+    def create(cls):
+        """Движок или None, если X11/XTest недоступны (тогда используется xdotool)"""
+        if not XLIB_AVAILABLE:
+            return None
+        try:
+            return cls()
+        except Exception:
+            return None
+    
+    def active_window(self):
+        prop = self.root.get_full_property(self.net_active_window, X.AnyPropertyType)
+        if prop and len(prop.value):
+            return int(prop.value[0]) or None
+        return None
+    
+    def pointer_position(self):
+        pointer = self.root.query_pointer()
+        return pointer.root_x, pointer.root_y
+    
+    def activate(self, window_id):
+        window = self.display.create_resource_object('window', window_id)
+        # source indication = 2 (pager): WM не применяет focus stealing prevention
+        event = xevent.ClientMessage(window=window, client_type=self.net_active_window,
+                                   data=(32, [2, X.CurrentTime, 0, 0, 0]))
+        self.root.send_event(event, event_mask=X.SubstructureRedirectMask | X.SubstructureNotifyMask)
+        self.display.flush()
+    
+    def wait_active(self, window_id, timeout):
+        """Дождаться, пока window_id станет активным. True - дождались"""
+        deadline = time.monotonic() + timeout
+        while True:
+            # Сбрасываем накопившиеся события и перепроверяем свойство
+            while self.display.pending_events():
+                self.display.next_event()
+            if self.active_window() == window_id:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            select.select([self.display.fileno()], [], [], remaining)
+    
+    def send_ctrl_v(self):
+        for event_type, keycode in ((X.KeyPress, self.ctrl_keycode), (X.KeyPress, self.v_keycode),
+                                    (X.KeyRelease, self.v_keycode), (X.KeyRelease, self.ctrl_keycode)):
+            xtest.fake_input(self.display, event_type, keycode)
+        self.display.sync()
+    
+    def paste_into(self, window_id, timeout=0.5):
+        """Активировать окно и вставить. Возвращает (задержка в секундах, фокус получен)"""
+        start = time.monotonic()
+        focused = True
+        if window_id and self.active_window() != window_id:
+            self.activate(window_id)
+            focused = self.wait_active(window_id, timeout)
+        self.send_ctrl_v()
+        return time.monotonic() - start, focused
+
 
 class ClipboardItemWidget(QFrame):
     """Виджет для отдельного элемента истории"""
     
-    def __init__(self, item_id, mime_type, content_path, preview, is_dark, pinned, parent_window=None, scale=1.0, timestamp=None, text_max_lines=6, font_family='Noto Sans'):
+    def __init__(self, item_id, mime_type, content_path, preview, is_dark, pinned, parent_window=None, scale=1.0, timestamp=None, text_max_lines=6, font_family='Noto Sans', display=None):
         super().__init__()
         self.item_id = item_id
         self.mime_type = mime_type
         self.content_path = content_path
         self.preview = preview
+        # Готовый к показу текст (нормализован демоном при сохранении)
+        self.display = display
         self.is_dark = is_dark
         self.pinned = pinned
         self.parent_window = parent_window
@@ -59,16 +496,13 @@ class ClipboardItemWidget(QFrame):
         
         # Рассчитываем высоту текста на основе количества строк
         # CSS padding добавляется ВНУТРЬ, поэтому нужно учесть его дважды
-        from PyQt5.QtGui import QFontMetrics
-        font = QFont(self.font_family, self.preview_font_size, QFont.Light)
-        metrics = QFontMetrics(font)
+        metrics = font_metrics(self.font_family, self.preview_font_size, QFont.Light)
         line_height = metrics.lineSpacing()
         # Высота = строки + двойной padding (верх+низ в CSS)
         self.preview_max_height = int(line_height * self.text_max_lines + self.content_padding * 4)
         self.preview_min_height = int(52 * self.scale)
         
-        small_font = QFont(self.font_family, self.small_preview_font_size, QFont.Normal)
-        small_metrics = QFontMetrics(small_font)
+        small_metrics = font_metrics(self.font_family, self.small_preview_font_size, QFont.Normal)
         small_line_height = small_metrics.lineSpacing()
         self.small_preview_max_height = int(small_line_height * self.text_max_lines + self.content_padding * 4)
         self.small_preview_min_height = int(42 * self.scale)
@@ -90,7 +524,6 @@ class ClipboardItemWidget(QFrame):
         self.setCursor(Qt.PointingHandCursor)
         
         # Динамическая высота с ограничениями
-        from PyQt5.QtWidgets import QSizePolicy
         self.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Minimum)
         self.setMinimumHeight(self.element_min_height)
         self.setMaximumHeight(self.element_max_height)
@@ -107,9 +540,6 @@ class ClipboardItemWidget(QFrame):
         if not self.timestamp:
             return ""
         
-        import time
-        from datetime import datetime, timedelta
-        
         now = time.time()
         diff = now - self.timestamp
         
@@ -146,34 +576,8 @@ class ClipboardItemWidget(QFrame):
             return 'file'
     
     def create_svg_icon(self, svg_path, color, size=48):
-        """Создать иконку из SVG"""
-        # SVG иконки Material Design Icons
-        svg_icons = {
-            'trash': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M9,3V4H4V6H5V19A2,2 0 0,0 7,21H17A2,2 0 0,0 19,19V6H20V4H15V3H9M7,6H17V19H7V6M9,8V17H11V8H9M13,8V17H15V8H13Z" /></svg>''',
-            'pin': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M16,12V4H17V2H7V4H8V12L6,14V16H11.2V22H12.8V16H18V14L16,12Z" /></svg>''',
-            'pin-off': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M2,5.27L3.28,4L20,20.72L18.73,22L12.8,16.07V22H11.2V16H6V14L8,12V11.27L2,5.27M16,12L18,14V16H17.82L8,6.18V4H7V2H17V4H16V12Z" /></svg>''',
-            'download': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M5,20H19V18H5M19,9H15V3H9V9H5L12,16L19,9Z" /></svg>''',
-            'clipboard': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M19 3H14.82C14.4 1.84 13.3 1 12 1S9.6 1.84 9.18 3H5C3.9 3 3 3.9 3 5V19C3 20.1 3.9 21 5 21H19C20.1 21 21 20.1 21 19V5C21 3.9 20.1 3 19 3M12 3C12.55 3 13 3.45 13 4S12.55 5 12 5 11 4.55 11 4 11.45 3 12 3M7 7H17V5H19V19H5V5H7V7M7 9V11H17V9H7M7 13V15H17V13H7Z" /></svg>''',
-            'close': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M19,6.41L17.59,5L12,10.59L6.41,5L5,6.41L10.59,12L5,17.59L6.41,19L12,13.41L17.59,19L19,17.59L13.41,12L19,6.41Z" /></svg>''',
-            'text': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M14,17H7V15H14M17,13H7V11H17M17,9H7V7H17M19,3H5C3.89,3 3,3.89 3,5V19A2,2 0 0,0 5,21H19A2,2 0 0,0 21,19V5C21,3.89 20.1,3 19,3Z" /></svg>''',
-            'image': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M8.5,13.5L11,16.5L14.5,12L19,18H5M21,19V5C21,3.89 20.1,3 19,3H5A2,2 0 0,0 3,5V19A2,2 0 0,0 5,21H19A2,2 0 0,0 21,19Z" /></svg>''',
-            'link': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M10.59,13.41C11,13.8 11,14.44 10.59,14.83C10.2,15.22 9.56,15.22 9.17,14.83C7.22,12.88 7.22,9.71 9.17,7.76V7.76L12.71,4.22C14.66,2.27 17.83,2.27 19.78,4.22C21.73,6.17 21.73,9.34 19.78,11.29L18.29,12.78C18.3,11.96 18.17,11.14 17.89,10.36L18.36,9.88C19.54,8.71 19.54,6.81 18.36,5.64C17.19,4.46 15.29,4.46 14.12,5.64L10.59,9.17C9.41,10.34 9.41,12.24 10.59,13.41M13.41,9.17C13.8,8.78 14.44,8.78 14.83,9.17C16.78,11.12 16.78,14.29 14.83,16.24V16.24L11.29,19.78C9.34,21.73 6.17,21.73 4.22,19.78C2.27,17.83 2.27,14.66 4.22,12.71L5.71,11.22C5.7,12.04 5.83,12.86 6.11,13.65L5.64,14.12C4.46,15.29 4.46,17.19 5.64,18.36C6.81,19.54 8.71,19.54 9.88,18.36L13.41,14.83C14.59,13.66 14.59,11.76 13.41,10.59C13,10.2 13,9.56 13.41,9.17Z" /></svg>''',
-            'link-variant': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M3.9,12C3.9,10.29 5.29,8.9 7,8.9H11V7H7A5,5 0 0,0 2,12A5,5 0 0,0 7,17H11V15.1H7C5.29,15.1 3.9,13.71 3.9,12M8,13H16V11H8V13M17,7H13V8.9H17C18.71,8.9 20.1,10.29 20.1,12C20.1,13.71 18.71,15.1 17,15.1H13V17H17A5,5 0 0,0 22,12A5,5 0 0,0 17,7Z" /></svg>''',
-            'web': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M16.36,14C16.44,13.34 16.5,12.68 16.5,12C16.5,11.32 16.44,10.66 16.36,10H19.74C19.9,10.64 20,11.31 20,12C20,12.69 19.9,13.36 19.74,14M14.59,19.56C15.19,18.45 15.65,17.25 15.97,16H18.92C17.96,17.65 16.43,18.93 14.59,19.56M14.34,14H9.66C9.56,13.34 9.5,12.68 9.5,12C9.5,11.32 9.56,10.65 9.66,10H14.34C14.43,10.65 14.5,11.32 14.5,12C14.5,12.68 14.43,13.34 14.34,14M12,19.96C11.17,18.76 10.5,17.43 10.09,16H13.91C13.5,17.43 12.83,18.76 12,19.96M8,8H5.08C6.03,6.34 7.57,5.06 9.4,4.44C8.8,5.55 8.35,6.75 8,8M5.08,16H8C8.35,17.25 8.8,18.45 9.4,19.56C7.57,18.93 6.03,17.65 5.08,16M4.26,14C4.1,13.36 4,12.69 4,12C4,11.31 4.1,10.64 4.26,10H7.64C7.56,10.66 7.5,11.32 7.5,12C7.5,12.68 7.56,13.34 7.64,14M12,4.03C12.83,5.23 13.5,6.57 13.91,8H10.09C10.5,6.57 11.17,5.23 12,4.03M18.92,8H15.97C15.65,6.75 15.19,5.55 14.59,4.44C16.43,5.07 17.96,6.34 18.92,8M12,2C6.47,2 2,6.5 2,12A10,10 0 0,0 12,22A10,10 0 0,0 22,12A10,10 0 0,0 12,2Z" /></svg>''',
-            'file': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M13,9V3.5L18.5,9M6,2C4.89,2 4,2.89 4,4V20A2,2 0 0,0 6,22H18A2,2 0 0,0 20,20V8L14,2H6Z" /></svg>'''
-        }
-        
-        svg_data = svg_icons.get(svg_path, '').format(color=color)
-        
-        # Создаем QPixmap из SVG
-        renderer = QSvgRenderer(QByteArray(svg_data.encode()))
-        pixmap = QPixmap(size, size)
-        pixmap.fill(Qt.transparent)
-        painter = QPainter(pixmap)
-        renderer.render(painter)
-        painter.end()
-        
-        return pixmap
+        """Создать иконку из SVG (через общий кэш)"""
+        return ICON_CACHE.pixmap(svg_path, color, size)
     
     def create_thumbnail(self, image_path, max_height, max_width=None):
         """Создать миниатюру изображения с учетом пропорций"""
@@ -205,7 +609,7 @@ class ClipboardItemWidget(QFrame):
         """Настройка UI элемента"""
         mime_type = self.mime_type
         content_path = self.content_path
-        preview = self.preview
+        preview = self.display if self.display is not None else self.preview
         is_dark = self.is_dark
         
         # Контейнер для контента с относительным позиционированием
@@ -217,95 +621,32 @@ class ClipboardItemWidget(QFrame):
         
         # Для изображений - большое превью на всю ширину
         if mime_type.startswith('image/') and content_path:
-            # Загружаем изображение для расчета пропорций
-            from PyQt5.QtGui import QPixmap
-            import tempfile
-            pixmap = QPixmap(str(content_path))
-            
-            if not pixmap.isNull():
-                # Доступная ширина = content_width - margins (left+right)
-                available_width = self.parent_window.content_width - (self.element_margin * 2)
-                aspect_ratio = pixmap.height() / pixmap.width() if pixmap.width() > 0 else 1
-                scaled_height = int(available_width * aspect_ratio)
-                
-                # Ограничиваем высоту
-                container_height = max(self.element_min_height, min(scaled_height, self.image_max_height))
-                
-                # Масштабируем изображение до размера контейнера
-                scaled_pixmap = pixmap.scaled(available_width, container_height,
-                                             Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                
-                # Сохраняем масштабированное изображение во временный файл
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-                scaled_pixmap.save(temp_file.name, 'PNG')
-                temp_file.close()
-                
-                # Контейнер для изображения - используем background-image с масштабированным файлом
-                safe_path = temp_file.name.replace('\\', '/').replace('"', '\\"')
-                image_container = QFrame()
-                image_container.setFixedHeight(container_height)
-                image_container.setStyleSheet(f"""
-                    QFrame {{
-                        background-color: {'#3a3a3a' if is_dark else '#f0f0f0'};
-                        background-image: url("{safe_path}");
-                        background-repeat: no-repeat;
-                        background-position: center;
-                        background-size: contain;
-                        border-radius: {self.border_radius}px;
-                    }}
-                """)
-                
-                # Сохраняем путь для последующей очистки
-                image_container.setProperty('temp_image', temp_file.name)
-                
-                content_layout.addWidget(image_container)
-            else:
-                # Если изображение не загрузилось - пустой контейнер
-                pass
+            # Плейсхолдер: изображение декодируется в фоне (HistoryWindow.request_thumbnail)
+            # и подставляется через set_image()
+            image_container = QLabel()
+            image_container.setFixedHeight(self.element_min_height)
+            image_container.setAlignment(Qt.AlignCenter)
+            image_container.setStyleSheet(f"""
+                QLabel {{
+                    background-color: {'#3a3a3a' if is_dark else '#f0f0f0'};
+                    border-radius: {self.border_radius}px;
+                }}
+            """)
+            self.image_label = image_container
+            content_layout.addWidget(image_container)
         else:
             # Для текста - просто большой текст без иконки
             if mime_type.startswith('text/plain') or mime_type in ['UTF8_STRING', 'STRING', 'TEXT']:
                 # Рассчитываем максимальную высоту и обрезаем текст
-                from PyQt5.QtGui import QFontMetrics
-                from PyQt5.QtCore import QRect
-                
-                font = QFont(self.font_family, self.preview_font_size, QFont.Light)
-                metrics = QFontMetrics(font)
+                metrics = font_metrics(self.font_family, self.preview_font_size, QFont.Light)
                 
                 # Доступная ширина для текста
                 available_width = self.parent_window.content_width - (self.element_margin * 2) - (self.content_padding * 2)
                 
-                # Разбиваем текст на строки учитывая переносы
-                lines = []
-                for paragraph in preview.split('\n'):
-                    if not paragraph.strip():
-                        lines.append('')
-                        if len(lines) >= self.text_max_lines:
-                            break
-                        continue
-                    
-                    words = paragraph.split(' ')
-                    current_line = ''
-                    
-                    for word in words:
-                        test_line = current_line + (' ' if current_line else '') + word
-                        if metrics.horizontalAdvance(test_line) <= available_width:
-                            current_line = test_line
-                        else:
-                            if current_line:
-                                lines.append(current_line)
-                                if len(lines) >= self.text_max_lines:
-                                    break
-                            # Если слово слишком длинное - берём его целиком как строку
-                            current_line = word
-                    
-                    if len(lines) >= self.text_max_lines:
-                        break
-                    if current_line:
-                        lines.append(current_line)
-                
-                # Берём только первые N строк
-                truncated_text = '\n'.join(lines[:self.text_max_lines])
+                # Берём только первые N строк (раскладка мемоизируется)
+                truncated_text = PREVIEW_LAYOUT_CACHE.layout(
+                    self.item_id, preview, metrics, available_width, self.text_max_lines,
+                    (self.font_family, self.preview_font_size, QFont.Light), self.scale)
                 
                 line_height = metrics.lineSpacing()
                 max_height = int(line_height * self.text_max_lines + self.content_padding * 2)
@@ -349,42 +690,14 @@ class ClipboardItemWidget(QFrame):
                 text_container.setSpacing(self.buttons_spacing)
                 
                 # Рассчитываем и обрезаем текст для маленького preview
-                from PyQt5.QtGui import QFontMetrics
-                small_font = QFont(self.font_family, self.small_preview_font_size, QFont.Normal)
-                small_metrics = QFontMetrics(small_font)
+                small_metrics = font_metrics(self.font_family, self.small_preview_font_size, QFont.Normal)
                 
                 # Доступная ширина меньше из-за иконки
                 available_width = self.parent_window.content_width - (self.element_margin * 2) - self.icon_size - self.element_spacing
                 
-                # Разбиваем текст на строки учитывая переносы
-                lines = []
-                for paragraph in preview.split('\n'):
-                    if not paragraph.strip():
-                        lines.append('')
-                        if len(lines) >= self.text_max_lines:
-                            break
-                        continue
-                    
-                    words = paragraph.split(' ')
-                    current_line = ''
-                    
-                    for word in words:
-                        test_line = current_line + (' ' if current_line else '') + word
-                        if small_metrics.horizontalAdvance(test_line) <= available_width:
-                            current_line = test_line
-                        else:
-                            if current_line:
-                                lines.append(current_line)
-                                if len(lines) >= self.text_max_lines:
-                                    break
-                            current_line = word
-                    
-                    if len(lines) >= self.text_max_lines:
-                        break
-                    if current_line:
-                        lines.append(current_line)
-                
-                truncated_text = '\n'.join(lines[:self.text_max_lines])
+                truncated_text = PREVIEW_LAYOUT_CACHE.layout(
+                    self.item_id, preview, small_metrics, available_width, self.text_max_lines,
+                    (self.font_family, self.small_preview_font_size, QFont.Normal), self.scale)
                 
                 small_line_height = small_metrics.lineSpacing()
                 max_height = int(small_line_height * self.text_max_lines)
@@ -519,6 +832,21 @@ class ClipboardItemWidget(QFrame):
         if hasattr(self, 'time_overlay'):
             QTimer.singleShot(0, self.update_overlay_position)
     
+    def image_target_size(self):
+        """Доступная ширина и ограничения высоты для превью изображения"""
+        # Доступная ширина = content_width - margins (left+right)
+        available_width = self.parent_window.content_width - (self.element_margin * 2)
+        return available_width, self.element_min_height, self.image_max_height
+    
+    def set_image(self, pixmap):
+        """Подставить миниатюру из кэша вместо плейсхолдера"""
+        if pixmap.isNull():
+            return
+        # Миниатюра уже вписана в (ширина, max высота); ниже минимума - центрируется
+        self.image_label.setFixedHeight(max(self.element_min_height, pixmap.height()))
+        self.image_label.setPixmap(pixmap)
+        QTimer.singleShot(0, self.update_overlay_position)
+    
     def update_overlay_position(self):
         """Обновить позицию оверлея времени в правом нижнем углу"""
         if hasattr(self, 'time_overlay') and hasattr(self, 'time_overlay_parent'):
@@ -547,28 +875,67 @@ class ClipboardItemWidget(QFrame):
         if self.parent_window and hasattr(self.parent_window, 'toggle_pin_item'):
             self.parent_window.toggle_pin_item(self.item_id, self.pinned)
 
+    def set_pinned(self, pinned):
+        """Обновить состояние закрепления без пересоздания виджета"""
+        if bool(pinned) == bool(self.pinned):
+            return
+        self.pinned = pinned
+        icon_color = '#e0e0e0' if self.is_dark else '#333333'
+        pin_icon_name = 'pin-off' if self.pinned else 'pin'
+        self.pin_btn.setPixmap(self.create_svg_icon(pin_icon_name, icon_color, self.button_icon_size))
+
+
+class ClipboardRowHost(QWidget):
+    """Тонкая обёртка строки списка.
+
+    QListWidget удаляет item-виджет при takeItem(), поэтому строка
+    вкладывается в хост: при перемещении хост удаляется, а сама строка
+    (с уже построенным UI и декодированным изображением) переживает его.
+    """
+
+    def __init__(self, row):
+        super().__init__()
+        self.row = row
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+        layout.addWidget(row)
+
+    def detach(self):
+        """Отсоединить строку перед удалением хоста"""
+        row = self.row
+        self.layout().removeWidget(row)
+        row.setParent(None)
+        self.row = None
+        return row
+
 
 class ClipHistoryWindow(QWidget):
     """Главное окно истории"""
     
-    def __init__(self):
+    def __init__(self, instance=None):
         super().__init__()
         
         # Проверка и запуск демона если не запущен
         self.check_and_start_daemon()
         
-        # Проверка единственного экземпляра
-        self.lock_file = Path.home() / '.cache' / 'cliphistory' / '.ui.lock'
-        if not self.acquire_lock():
-            print("UI уже запущен")
-            sys.exit(0)
+        # Команды от повторных запусков и хоткея демона
+        self.instance = instance
+        if instance is not None:
+            self.instance_notifier = QSocketNotifier(instance.fileno(), QSocketNotifier.Read, self)
+            self.instance_notifier.activated.connect(self.on_instance_command)
         
         self.cache_dir = Path.home() / '.cache' / 'cliphistory'
-        self.db_path = self.cache_dir / 'history.db'
         self.config = self.load_config()
+        self.storage = open_storage(self.config, self.cache_dir)
         self.is_dark = self.is_dark_theme()
         self.drag_position = None
         self.prev_window_id = None
+        self.paste_engine = X11PasteEngine.create()
+        
+        # Профилирование по SIGUSR1/SIGUSR2 или командам "profile"/"memory"
+        self.profiling = ProfilingHooks('ui', debug=self.config.get('debug'))
+        self.profiling.install_signals()
         
         # Константы размеров
         self.scale = self.config.get('ui_scale', 1.0)
@@ -596,7 +963,20 @@ class ClipHistoryWindow(QWidget):
         # List
         self.list_spacing = int(2 * self.scale)
         self.list_item_gap = int(2 * self.scale)
-        
+
+        # Текущие строки списка: id -> QListWidgetItem
+        self.row_items = {}
+        
+        # Фоновая загрузка: запрос к БД и декодирование изображений
+        self.thread_pool = QThreadPool.globalInstance()
+        self.loader_signals = HistoryLoaderSignals()
+        self.loader_signals.rows_loaded.connect(self.on_rows_loaded)
+        self.loader_signals.image_loaded.connect(self.on_image_loaded)
+        self.load_generation = 0
+        self.loading_rows = []
+        self.thumbnail_cache = ThumbnailCache(self.cache_dir, self.config.get('thumbnail_cache_kb', 20480))
+
+        self.warm_icon_cache()
         self.init_ui()
         self.load_history()
         self.position_near_cursor()
@@ -605,55 +985,47 @@ class ClipHistoryWindow(QWidget):
     def check_and_start_daemon(self):
         """Проверка и запуск демона если не запущен"""
         try:
-            # Проверяем процесс демона
-            result = subprocess.run(
-                ['pgrep', '-f', '/usr/local/bin/cliphistory'],
-                capture_output=True,
-                timeout=1
-            )
+            if ping():
+                return
             
-            if result.returncode != 0:  # Демон не запущен
-                print("⚠️  Демон не запущен, запускаем...")
-                subprocess.Popen(
-                    ['cliphistory'],
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL
-                )
-                import time
-                time.sleep(1)  # Даем время демону запуститься
+            print("⚠️  Демон не запущен, запускаем...")
+            daemon_script = Path(__file__).resolve().parent / 'cliphistory_new.py'
+            if daemon_script.exists():
+                command = [sys.executable, str(daemon_script)]
+            else:
+                command = ['cliphistory']
+            
+            # Ждём сообщения о готовности, а не фиксированное время
+            if not start_daemon(command) and not ping():
+                print("⚠️  Демон не сообщил о готовности")
         except Exception as e:
             print(f"Ошибка проверки демона: {e}")
     
-    def acquire_lock(self):
-        """Проверка что UI не запущен"""
-        try:
-            self.lock_file.parent.mkdir(parents=True, exist_ok=True)
-            if self.lock_file.exists():
-                # Проверяем что процесс с PID из файла существует
-                try:
-                    with open(self.lock_file) as f:
-                        pid = int(f.read().strip())
-                    # Проверяем существование процесса
-                    os.kill(pid, 0)
-                    return False  # Процесс существует
-                except (ProcessLookupError, ValueError):
-                    # Процесс не существует, удаляем старый lock
-                    self.lock_file.unlink()
-            
-            # Создаем lock файл с текущим PID
-            with open(self.lock_file, 'w') as f:
-                f.write(str(os.getpid()))
-            return True
-        except Exception:
-            return True  # В случае ошибки разрешаем запуск
+    def report_ready(self):
+        """Отправить демону время от запуска процесса до показа окна"""
+        startup = process_age()
+        
+        def send():
+            try:
+                send_command('ui_ready', timeout=0.2, startup=startup)
+            except (OSError, ValueError):
+                pass
+        
+        threading.Thread(target=send, daemon=True).start()
     
-    def release_lock(self):
-        """Освободить lock"""
-        try:
-            if self.lock_file.exists():
-                self.lock_file.unlink()
-        except Exception:
-            pass
+    def on_instance_command(self):
+        """Команда от повторного запуска UI или хоткея"""
+        cmd = self.instance.read_command()
+        if cmd == 'toggle' and self.isActiveWindow():
+            self.close()
+        elif cmd in ('show', 'toggle'):
+            self.show()
+            self.raise_()
+            self.activateWindow()
+        elif cmd == 'profile':
+            self.profiling.toggle()
+        elif cmd == 'memory':
+            self.profiling.memory_snapshot()
     
     def load_config(self):
         """Загрузка конфигурации"""
@@ -668,6 +1040,7 @@ class ClipHistoryWindow(QWidget):
                 config.setdefault('window_height', 350)
                 config.setdefault('text_max_lines', 6)
                 config.setdefault('font_family', 'Noto Sans')
+                config.setdefault('thumbnail_cache_kb', 20480)
                 return config
         except Exception:
             return {
@@ -676,7 +1049,8 @@ class ClipHistoryWindow(QWidget):
                 'window_width': 320,
                 'window_height': 350,
                 'text_max_lines': 6,
-                'font_family': 'Noto Sans'
+                'font_family': 'Noto Sans',
+                'thumbnail_cache_kb': 20480
             }
     
     def is_dark_theme(self):
@@ -692,24 +1066,21 @@ class ClipHistoryWindow(QWidget):
             return True
     
     def create_svg_icon(self, svg_path, color, size):
-        """Создать иконку из SVG"""
-        svg_icons = {
-            'trash': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M9,3V4H4V6H5V19A2,2 0 0,0 7,21H17A2,2 0 0,0 19,19V6H20V4H15V3H9M7,6H17V19H7V6M9,8V17H11V8H9M13,8V17H15V8H13Z" /></svg>''',
-            'pin': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M16,12V4H17V2H7V4H8V12L6,14V16H11.2V22H12.8V16H18V14L16,12Z" /></svg>''',
-            'pin-off': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M2,5.27L3.28,4L20,20.72L18.73,22L12.8,16.07V22H11.2V16H6V14L8,12V11.27L2,5.27M16,12L18,14V16H17.82L8,6.18V4H7V2H17V4H16V12Z" /></svg>''',
-            'download': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M5,20H19V18H5M19,9H15V3H9V9H5L12,16L19,9Z" /></svg>''',
-            'clipboard': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M19 3H14.82C14.4 1.84 13.3 1 12 1S9.6 1.84 9.18 3H5C3.9 3 3 3.9 3 5V19C3 20.1 3.9 21 5 21H19C20.1 21 21 20.1 21 19V5C21 3.9 20.1 3 19 3M12 3C12.55 3 13 3.45 13 4S12.55 5 12 5 11 4.55 11 4 11.45 3 12 3M7 7H17V5H19V19H5V5H7V7M7 9V11H17V9H7M7 13V15H17V13H7Z" /></svg>''',
-            'close': '''<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path fill="{color}" d="M19,6.41L17.59,5L12,10.59L6.41,5L5,6.41L10.59,12L5,17.59L6.41,19L12,13.41L17.59,19L19,17.59L13.41,12L19,6.41Z" /></svg>'''
-        }
-        
-        svg_data = svg_icons.get(svg_path, '').format(color=color)
-        renderer = QSvgRenderer(QByteArray(svg_data.encode()))
-        pixmap = QPixmap(size, size)
-        pixmap.fill(Qt.transparent)
-        painter = QPainter(pixmap)
-        renderer.render(painter)
-        painter.end()
-        return pixmap
+        """Создать иконку из SVG (через общий кэш)"""
+        return ICON_CACHE.pixmap(svg_path, color, size)
+    
+    def warm_icon_cache(self):
+        """Заранее растеризовать иконки, которые понадобятся строкам и заголовку"""
+        button_icon_size = int(14 * self.scale)
+        type_icon_size = int(12 * self.scale)
+        colors = ('#ffffff', '#e0e0e0') if self.is_dark else ('#000000', '#333333')
+        
+        specs = [('clipboard', colors[0], self.app_icon_size),
+                 ('close', colors[0], self.close_icon_size)]
+        specs += [(name, colors[1], button_icon_size) for name in ('trash', 'pin', 'pin-off')]
+        specs += [(name, colors[0], type_icon_size)
+                  for name in ('text', 'image', 'web', 'link-variant', 'file')]
+        ICON_CACHE.warm(specs)
     
     def setup_tray_icon(self):
         """Создать иконку в системном трее"""
@@ -750,38 +1121,35 @@ class ClipHistoryWindow(QWidget):
     
     def setup_auto_refresh(self):
         """Настроить автообновление истории"""
-        self.last_item_count = 0
+        self.last_signature = None
         self.refresh_timer = QTimer(self)
         self.refresh_timer.timeout.connect(self.check_for_updates)
         self.refresh_timer.start(1000)  # Проверка каждую секунду
     
     def check_for_updates(self):
-        """Проверить новые элементы в истории"""
+        """Проверить изменения в истории"""
+        # Таймер Qt-потока: точка подключения к сессии cProfile
+        self.profiling.checkpoint()
+        
         if not self.isVisible():
             return
         
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM items')
-            current_count = cursor.fetchone()[0]
-            conn.close()
+            try:
+                # Версия кэша демона меняется с каждой вставкой, удалением и закреплением;
+                # без кэша в демоне ключа нет - как при ошибке, сравниваем хранилище
+                signature = ('recent', send_command('recent', timeout=0.2, limit=0)['version'])
+            except (OSError, ValueError, KeyError):
+                # Количество не ловит вставку при упоре в лимит (вставка + очистка),
+                # поэтому сравниваем сигнатуру из количества, max(id) и закреплённых
+                signature = self.storage.signature()
             
-            if self.last_item_count == 0:
-                self.last_item_count = current_count
-            elif current_count != self.last_item_count:
-                # Есть новые элементы - обновляем список
-                # Сохраняем позицию скролла
-                scroll_position = self.list_widget.verticalScrollBar().value()
-                
-                self.list_widget.setUpdatesEnabled(False)
-                self.list_widget.clear()
+            if self.last_signature is None:
+                self.last_signature = signature
+            elif signature != self.last_signature:
+                # Есть изменения - применяем только разницу
                 self.load_history()
-                
-                # Восстанавливаем позицию скролла
-                self.list_widget.verticalScrollBar().setValue(scroll_position)
-                self.list_widget.setUpdatesEnabled(True)
-                self.last_item_count = current_count
+                self.last_signature = signature
         except Exception:
             pass
     
@@ -1002,31 +1370,35 @@ class ClipHistoryWindow(QWidget):
     def position_near_cursor(self):
         """Позиционировать рядом с курсором с умной проверкой границ"""
         try:
-            # Сохраняем ID активного окна для возврата фокуса
-            result = subprocess.run(
-                ['xdotool', 'getactivewindow'],
-                capture_output=True, text=True, timeout=0.5
-            )
-            self.prev_window_id = result.stdout.strip()
-            
             # Получаем размер экрана
-            from PyQt5.QtWidgets import QDesktopWidget
             screen = QDesktopWidget().screenGeometry()
             screen_width = screen.width()
             screen_height = screen.height()
             
-            # Получаем позицию курсора
-            result = subprocess.run(
-                ['xdotool', 'getmouselocation', '--shell'],
-                capture_output=True, text=True, timeout=0.5
-            )
-            pos = {}
-            for line in result.stdout.strip().split('\n'):
-                if '=' in line:
-                    key, val = line.split('=')
-                    pos[key] = int(val)
-            
-            cursor_x, cursor_y = pos.get('X', screen_width // 2), pos.get('Y', screen_height // 2)
+            if self.paste_engine:
+                # Сохраняем ID активного окна для возврата фокуса и позицию курсора
+                self.prev_window_id = self.paste_engine.active_window()
+                cursor_x, cursor_y = self.paste_engine.pointer_position()
+            else:
+                # Сохраняем ID активного окна для возврата фокуса
+                result = subprocess.run(
+                    ['xdotool', 'getactivewindow'],
+                    capture_output=True, text=True, timeout=0.5
+                )
+                self.prev_window_id = result.stdout.strip()
+                
+                # Получаем позицию курсора
+                result = subprocess.run(
+                    ['xdotool', 'getmouselocation', '--shell'],
+                    capture_output=True, text=True, timeout=0.5
+                )
+                pos = {}
+                for line in result.stdout.strip().split('\n'):
+                    if '=' in line:
+                        key, val = line.split('=')
+                        pos[key] = int(val)
+                
+                cursor_x, cursor_y = pos.get('X', screen_width // 2), pos.get('Y', screen_height // 2)
             
             margin = 20  # Отступ от края экрана и от курсора
             
@@ -1056,42 +1428,160 @@ class ClipHistoryWindow(QWidget):
         except Exception:
             self.prev_window_id = None
     
-    def load_history(self):
-        """Загрузить историю"""
-        if not self.db_path.exists():
+    def create_item_widget(self, row):
+        """Создать виджет строки истории"""
+        item_id, mime_type, content_path, preview, pinned, timestamp, display = row
+        widget = ClipboardItemWidget(item_id, mime_type, content_path, preview, 
+                                    self.is_dark, pinned, parent_window=self, scale=self.scale, timestamp=timestamp,
+                                    text_max_lines=self.config.get('text_max_lines', 6),
+                                    font_family=self.config.get('font_family', 'Noto Sans'),
+                                    display=display)
+        # Устанавливаем максимальную ширину = ширина контента - скроллбар - отступ
+        # widget.setMaximumWidth(self.content_width - self.scrollbar_width - self.list_item_gap)
+        widget.setMaximumWidth(self.content_width - self.list_item_gap)
+        if hasattr(widget, 'image_label'):
+            self.request_thumbnail(widget)
+        return widget
+    
+    def request_thumbnail(self, widget):
+        """Показать миниатюру из памяти или запустить фоновую загрузку"""
+        available_width, min_height, max_height = widget.image_target_size()
+        # Изображения хранятся как <hash>.<ext>
+        key = ThumbnailCache.key(Path(widget.content_path).stem, available_width, max_height, self.scale)
+        
+        pixmap = self.thumbnail_cache.find(key)
+        if pixmap is not None:
+            widget.set_image(pixmap)
+            return
+        
+        self.thread_pool.start(ThumbnailLoader(widget.item_id, widget.content_path, key,
+                                               self.thumbnail_cache.disk_path(key), available_width,
+                                               min_height, max_height, self.loader_signals))
+    
+    def on_image_loaded(self, item_id, key, image):
+        """Миниатюра готова - кладём в кэш и подставляем в строку"""
+        pixmap = QPixmap.fromImage(image)
+        self.thumbnail_cache.insert(key, pixmap)
+        
+        item = self.row_items.get(item_id)
+        if item is None:
             return
+        host = self.list_widget.itemWidget(item)
+        if host is None or host.row is None:
+            return
+        host.row.set_image(pixmap)
+        item.setSizeHint(host.sizeHint())
+    
+    def insert_row(self, index, item, row_widget):
+        """Вставить строку в список (item может быть переиспользован)"""
+        host = ClipboardRowHost(row_widget)
+        # Динамическая высота элемента - используем sizeHint виджета
+        item.setSizeHint(host.sizeHint())
+        self.list_widget.insertItem(index, item)
+        self.list_widget.setItemWidget(item, host)
+    
+    def load_history(self):
+        """Загрузить историю (асинхронно, результат придёт в on_rows_loaded)"""
+        self.load_generation += 1
+        self.loading_rows = []
+        
+        # При первом открытии строки первого экрана отдаются отдельной порцией
+        first_batch = 0
+        if self.list_widget.count() == 0:
+            element_min_height = int(48 * self.scale)
+            first_batch = self.window_height // element_min_height + 1
+        
+        self.thread_pool.start(HistoryLoader(self.storage, self.load_generation, self.loader_signals,
+                                             first_batch=first_batch))
+    
+    def on_rows_loaded(self, generation, rows, final):
+        """Порция строк из HistoryLoader"""
+        if generation != self.load_generation:
+            return  # Устаревшая загрузка
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, mime_type, content_path, preview, COALESCE(pinned, 0) as pinned, timestamp
-            FROM items 
-            ORDER BY pinned DESC, timestamp DESC
-            LIMIT 50
-        ''')
-        items = cursor.fetchall()
-        conn.close()
-        
-        for item_id, mime_type, content_path, preview, pinned, timestamp in items:
-            widget = ClipboardItemWidget(item_id, mime_type, content_path, preview[:1000], 
-                                        self.is_dark, pinned, parent_window=self, scale=self.scale, timestamp=timestamp,
-                                        text_max_lines=self.config.get('text_max_lines', 6),
-                                        font_family=self.config.get('font_family', 'Noto Sans'))
-            # Устанавливаем максимальную ширину = ширина контента - скроллбар - отступ
-            # widget.setMaximumWidth(self.content_width - self.scrollbar_width - self.list_item_gap)
-            widget.setMaximumWidth(self.content_width - self.list_item_gap)
-            item = QListWidgetItem(self.list_widget)
-            # Динамическая высота элемента - используем sizeHint виджета
-            item.setSizeHint(widget.sizeHint())
-            item.setData(Qt.UserRole, (item_id, mime_type, content_path, preview))
+        if final:
+            self.loading_rows = rows
+        else:
+            self.loading_rows = self.loading_rows + rows
+        self.sync_history(self.loading_rows)
+    
+    def sync_history(self, rows):
+        """Привести список к новому упорядоченному набору строк.
+        
+        Вставляет, удаляет и перемещает только изменившиеся строки;
+        остальные виджеты, выделение и позиция прокрутки сохраняются.
+        """
+        new_ids = [row[0] for row in rows]
+        new_set = set(new_ids)
+        
+        # Запоминаем выделение и верхнюю видимую строку
+        selected_ids = {item.data(Qt.UserRole)[0] for item in self.list_widget.selectedItems()}
+        current = self.list_widget.currentItem()
+        current_id = current.data(Qt.UserRole)[0] if current else None
+        anchor_id = None
+        if self.list_widget.verticalScrollBar().value() > 0:
+            anchor = self.list_widget.itemAt(0, 0)
+            if anchor:
+                anchor_id = anchor.data(Qt.UserRole)[0]
+        
+        self.list_widget.setUpdatesEnabled(False)
+        try:
+            # 1. Удаляем исчезнувшие строки (с конца, чтобы не сбивать индексы)
+            for index in range(self.list_widget.count() - 1, -1, -1):
+                item_id = self.list_widget.item(index).data(Qt.UserRole)[0]
+                if item_id not in new_set:
+                    self.list_widget.takeItem(index)
+                    self.row_items.pop(item_id, None)
+            
+            # 2. Строки, которые остаются на месте: наибольшая возрастающая
+            #    подпоследовательность позиций в новом порядке
+            new_pos = {item_id: pos for pos, item_id in enumerate(new_ids)}
+            old_ids = [self.list_widget.item(i).data(Qt.UserRole)[0]
+                       for i in range(self.list_widget.count())]
+            stable = set(old_ids[i] for i in longest_increasing_subsequence(
+                [new_pos[item_id] for item_id in old_ids]))
+            
+            # 3. Вынимаем перемещаемые строки, сохраняя item и виджет строки
+            moved = {}
+            for index in range(self.list_widget.count() - 1, -1, -1):
+                item = self.list_widget.item(index)
+                item_id = item.data(Qt.UserRole)[0]
+                if item_id not in stable:
+                    row_widget = self.list_widget.itemWidget(item).detach()
+                    moved[item_id] = (self.list_widget.takeItem(index), row_widget)
+            
+            # 4. Проходим новый порядок: вставляем новые и перемещённые строки
+            for index, row in enumerate(rows):
+                item_id, mime_type, content_path, preview, pinned, timestamp, display = row
+                if item_id in stable:
+                    self.list_widget.itemWidget(self.row_items[item_id]).row.set_pinned(pinned)
+                elif item_id in moved:
+                    item, row_widget = moved[item_id]
+                    row_widget.set_pinned(pinned)
+                    self.insert_row(index, item, row_widget)
+                else:
+                    item = QListWidgetItem()
+                    item.setData(Qt.UserRole, (item_id, mime_type, content_path, preview))
+                    self.insert_row(index, item, self.create_item_widget(row))
+                    self.row_items[item_id] = item
+            
+            # Восстанавливаем выделение у перемещённых строк
+            for item_id in moved:
+                if item_id in selected_ids:
+                    self.row_items[item_id].setSelected(True)
+            if current_id in moved:
+                self.list_widget.setCurrentItem(self.row_items[current_id])
             
-            self.list_widget.addItem(item)
-            self.list_widget.setItemWidget(item, widget)
+            # Удерживаем верхнюю видимую строку на месте
+            if anchor_id in self.row_items:
+                self.list_widget.scrollToItem(self.row_items[anchor_id], QAbstractItemView.PositionAtTop)
+        finally:
+            self.list_widget.setUpdatesEnabled(True)
     
     def on_item_clicked(self, item):
         """Обработка клика"""
         item_id, mime_type, content_path, preview = item.data(Qt.UserRole)
-        self.restore_to_clipboard(mime_type, content_path, preview)
+        self.restore_to_clipboard(item_id, mime_type, content_path, preview)
         
         if self.config.get('auto_paste', True):
             # Выполняем вставку до закрытия окна
@@ -1100,38 +1590,54 @@ class ClipHistoryWindow(QWidget):
             # Если авто-вставка отключена, просто закрываем
             self.close()
     
-    def restore_to_clipboard(self, mime_type, content_path, preview):
+    def restore_to_clipboard(self, item_id, mime_type, content_path, preview):
         """Восстановить в clipboard"""
-        if content_path:
-            with open(content_path, 'rb') as f:
-                content = f.read()
-        else:
-            content = preview.encode('utf-8')
+        # Демон сам становится владельцем буфера и отдаёт данные из хранилища
+        try:
+            if send_command('restore', id=item_id).get('ok'):
+                return
+        except (OSError, ValueError):
+            pass
         
+        # Запасной путь: передаём содержимое в xclip (из mmap, без чтения в память)
         try:
-            subprocess.run(
-                ['xclip', '-selection', 'clipboard', '-t', mime_type],
-                input=content, timeout=1.0, stderr=subprocess.DEVNULL
-            )
+            if content_path:
+                with BlobView(content_path) as blob:
+                    subprocess.run(
+                        ['xclip', '-selection', 'clipboard', '-t', mime_type],
+                        input=blob.view, timeout=1.0, stderr=subprocess.DEVNULL
+                    )
+            else:
+                cold = self.storage.cold_content(item_id)
+                subprocess.run(
+                    ['xclip', '-selection', 'clipboard', '-t', mime_type],
+                    input=cold[1] if cold else preview.encode('utf-8'), timeout=1.0, stderr=subprocess.DEVNULL
+                )
         except Exception:
             pass
     
     def auto_paste(self):
         """Автовставка"""
         try:
-            import time
-            # Скрываем окно сразу
+            # Скрываем окно сразу и отдаём unmap X-серверу
             self.hide()
-            time.sleep(0.05)
+            QApplication.processEvents()
             
-            # Возвращаем фокус на предыдущее окно
-            if self.prev_window_id:
-                subprocess.run(['xdotool', 'windowactivate', self.prev_window_id], 
-                             timeout=0.5, stderr=subprocess.DEVNULL)
-                time.sleep(0.15)  # Ждем активации окна
-            
-            # Вставляем
-            subprocess.run(['xdotool', 'key', 'ctrl+v'], timeout=1.0, stderr=subprocess.DEVNULL)
+            if self.paste_engine:
+                latency, focused = self.paste_engine.paste_into(
+                    self.prev_window_id, self.config.get('paste_focus_timeout', 0.5))
+                if self.config.get('debug'):
+                    state = '' if focused else ' (фокус не подтверждён)'
+                    print(f"📋 Вставка за {latency * 1000:.1f} мс{state}")
+            else:
+                # Возвращаем фокус на предыдущее окно
+                if self.prev_window_id:
+                    subprocess.run(['xdotool', 'windowactivate', self.prev_window_id], 
+                                 timeout=0.5, stderr=subprocess.DEVNULL)
+                    time.sleep(0.15)  # Ждем активации окна
+                
+                # Вставляем
+                subprocess.run(['xdotool', 'key', 'ctrl+v'], timeout=1.0, stderr=subprocess.DEVNULL)
             
             # Закрываем окно
             self.close()
@@ -1146,7 +1652,11 @@ class ClipHistoryWindow(QWidget):
     
     def closeEvent(self, event):
         """Обработка закрытия окна"""
-        self.release_lock()
+        # Сразу освобождаем адрес: следующий хоткей запустит новое окно,
+        # а не отправит команду завершающемуся процессу
+        if self.instance is not None:
+            self.instance_notifier.setEnabled(False)
+            self.instance.release()
         event.accept()
     
     def get_resize_direction(self, pos):
@@ -1217,51 +1727,46 @@ class ClipHistoryWindow(QWidget):
     
     def delete_item_from_db(self, item_id):
         """Удалить элемент из базы и обновить UI"""
+        # Через демон: его кэш первой страницы остаётся согласованным
+        try:
+            response = send_command('delete', id=item_id)
+        except (OSError, ValueError):
+            response = None
+        if response is not None:
+            if not response.get('ok'):
+                print(f"Нельзя удалить: {response.get('error')}")
+                return
+            if response.get('content_path'):
+                self.thumbnail_cache.remove(Path(response['content_path']).stem)
+            self.load_history()
+            return
+        
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             # Проверяем не закреплен ли элемент
-            cursor.execute('SELECT pinned FROM items WHERE id = ?', (item_id,))
-            row = cursor.fetchone()
-            if row and row[0] == 1:
+            item = self.storage.get(item_id)
+            if item and item.pinned == 1:
                 print(f"Нельзя удалить закрепленный элемент {item_id}")
-                conn.close()
                 return
             
-            # Удаляем файл если есть
-            cursor.execute('SELECT content_path FROM items WHERE id = ?', (item_id,))
-            row = cursor.fetchone()
-            if row and row[0]:
+            # Удаляем из хранилища (элемента нет в горячей истории - из архива)
+            item = self.storage.delete(item_id)
+            if item is None:
+                self.storage.delete_cold(item_id)
+            elif item.content_path:
+                # Удаляем файл если есть
                 try:
-                    Path(row[0]).unlink()
+                    Path(item.content_path).unlink()
                 except Exception:
                     pass
+                self.thumbnail_cache.remove(Path(item.content_path).stem)
             
-            # Удаляем из БД
-            cursor.execute('DELETE FROM items WHERE id = ?', (item_id,))
-            conn.commit()
-            conn.close()
-            
-            # Сохраняем позицию скролла
-            scroll_position = self.list_widget.verticalScrollBar().value()
-            
-            # Обновляем список с отключением обновления
-            self.list_widget.setUpdatesEnabled(False)
-            self.list_widget.clear()
+            # Применяем к списку только разницу
             self.load_history()
-            
-            # Восстанавливаем позицию скролла
-            self.list_widget.verticalScrollBar().setValue(scroll_position)
-            self.list_widget.setUpdatesEnabled(True)
         except Exception as e:
             print(f"Delete error: {e}")
     
     def save_item_to_file(self, item_id, mime_type, content_path, preview):
         """Сохранить элемент в файл"""
-        from PyQt5.QtWidgets import QFileDialog
-        import shutil
-        
         try:
             # Определяем расширение по MIME
             ext = ''
@@ -1283,9 +1788,14 @@ class ClipHistoryWindow(QWidget):
             )
             
             if filename:
+                cold = None if content_path else self.storage.cold_content(item_id)
                 if content_path:
-                    # Копируем файл
-                    shutil.copy2(content_path, filename)
+                    # Копируем файл средствами ядра
+                    export_blob(content_path, filename)
+                elif cold:
+                    # Элемент из архива - содержимое целиком, а не превью
+                    with open(filename, 'wb') as f:
+                        f.write(cold[1])
                 else:
                     # Сохраняем текст
                     with open(filename, 'w', encoding='utf-8') as f:
@@ -1296,51 +1806,56 @@ class ClipHistoryWindow(QWidget):
     def toggle_pin_item(self, item_id, current_pinned):
         """Закрепить/открепить элемент"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             new_pinned = 0 if current_pinned else 1
             
             # Если закрепляем, проверяем лимит (90% от total)
             if new_pinned == 1:
-                cursor.execute('SELECT COUNT(*) FROM items')
-                total_items = cursor.fetchone()[0]
-                cursor.execute('SELECT COUNT(*) FROM items WHERE pinned = 1')
-                pinned_count = cursor.fetchone()[0]
+                total_items, pinned_count = self.storage.counts()
                 
                 max_pinned = int(total_items * 0.9)
                 if pinned_count >= max_pinned:
                     print(f"Нельзя закрепить больше {max_pinned} элементов (90% от {total_items})")
-                    conn.close()
                     return
             
-            # Обновляем статус
-            cursor.execute('UPDATE items SET pinned = ? WHERE id = ?', (new_pinned, item_id))
-            conn.commit()
-            conn.close()
-            
-            # Сохраняем позицию скролла
-            scroll_position = self.list_widget.verticalScrollBar().value()
+            # Обновляем статус через демон: его кэш первой страницы остаётся согласованным
+            try:
+                send_command('pin', id=item_id, pinned=new_pinned)
+            except (OSError, ValueError):
+                updated = self.storage.pin(item_id, new_pinned)
+                if not updated and new_pinned:
+                    # Элемент из архива: закреплённые живут в горячей истории
+                    self.storage.promote(item_id, pinned=1)
             
-            # Обновляем список с отключением обновления
-            self.list_widget.setUpdatesEnabled(False)
-            self.list_widget.clear()
+            # Применяем к списку только разницу
             self.load_history()
-            
-            # Восстанавливаем позицию скролла
-            self.list_widget.verticalScrollBar().setValue(scroll_position)
-            self.list_widget.setUpdatesEnabled(True)
         except Exception as e:
             print(f"Pin error: {e}")
 
+def process_age():
+    """Секунды с запуска процесса (по /proc, точность ~10 мс)"""
+    with open('/proc/self/stat') as f:
+        start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+    return time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf('SC_CLK_TCK')
+
+
 def main():
     # Включаем поддержку High DPI для раздельного масштабирования мониторов
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling, True)
     QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
     
+    # Единственный экземпляр: повторный запуск только показывает живое окно
+    instance = SingleInstance()
+    if not instance.acquire():
+        notify_ui('show')
+        print("UI уже запущен")
+        sys.exit(0)
+    
     app = QApplication(sys.argv)
-    window = ClipHistoryWindow()
+    window = ClipHistoryWindow(instance)
     window.show()
+    if window.config.get('metrics'):
+        # После первой отрисовки сообщаем демону время старта (stats: ui_startup)
+        QTimer.singleShot(0, window.report_ready)
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
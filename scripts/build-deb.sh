@@ -26,7 +26,7 @@ mkdir -p "$BUILD_DIR/DEBIAN"
 
 # Копирование файлов приложения
 echo "📋 Копирование файлов..."
-cp cliphistory_new.py "$BUILD_DIR/opt/cliphistory/"
+cp cliphistory_*.py "$BUILD_DIR/opt/cliphistory/"
 cp clipshow_qt.py "$BUILD_DIR/opt/cliphistory/"
 cp config.json "$BUILD_DIR/opt/cliphistory/"
 chmod +x "$BUILD_DIR/opt/cliphistory/cliphistory_new.py"
@@ -16,7 +16,7 @@ mkdir -p "$BUILD_DIR"
 
 # Копирование файлов
 echo "📋 Копирование файлов..."
-cp cliphistory_new.py "$BUILD_DIR/"
+cp cliphistory_*.py "$BUILD_DIR/"
 cp clipshow_qt.py "$BUILD_DIR/"
 cp config.json "$BUILD_DIR/"
 cp install.sh "$BUILD_DIR/"
@@ -71,6 +71,18 @@ sudo ./uninstall.sh
 ФАЙЛЫ:
 ------
 cliphistory_new.py     - Демон мониторинга буфера
+cliphistory_ipc.py     - Управляющий сокет демона
+cliphistory_blobs.py   - Доступ к файлам-блобам (mmap)
+cliphistory_tray.py    - Иконка демона в трее
+cliphistory_profiling.py - Профилирование по сигналу/команде
+cliphistory_metrics.py - Задержки стадий и `cliphistory stats`
+cliphistory_trace.py   - Запись и реплей трасс событий буфера
+cliphistory_cli.py     - cliphistory list/search/get/restore
+cliphistory_import.py  - Импорт из CopyQ, GPaste, clipman и дампов
+cliphistory_export.py  - Экспорт/резервная копия истории в архив
+cliphistory_tiers.py   - Горячая история и помесячный архив
+cliphistory_storage.py - Хранилище элементов (SQLite, журнал)
+cliphistory_recent.py  - Первая страница окна в памяти демона
 clipshow_qt.py         - UI для отображения истории
 config.json            - Конфигурация
 install.sh             - Скрипт установки
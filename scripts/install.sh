@@ -57,7 +57,7 @@ mkdir -p "$AUTOSTART_DIR"
 
 # Копирование файлов
 echo "📋 Копирование файлов..."
-cp cliphistory_new.py "$INSTALL_DIR/"
+cp cliphistory_*.py "$INSTALL_DIR/"
 cp clipshow_qt.py "$INSTALL_DIR/"
 cp config.json "$INSTALL_DIR/"
 
@@ -21,7 +21,7 @@ echo "⏹️  Остановка демона..."
 pkill -f cliphistory_new.py || true
 pkill -f clipshow_qt.py || true
 
-# Удаление lock файла
+# Удаление lock файла старых версий
 rm -f "$REAL_HOME/.cache/cliphistory/.ui.lock"
 
 # Удаление файлов